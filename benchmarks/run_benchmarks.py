@@ -0,0 +1,367 @@
+"""
+Time and measure the peak memory of the conversion functions on synthetic data.
+
+Run from the repository folder, e.g.
+
+    python benchmarks/run_benchmarks.py run results/base.json --regions 64 --weather-yrs 2
+    python benchmarks/run_benchmarks.py compare results/base.json results/new.json
+
+Results are saved as JSON (seconds of every repeat, median, peak memory, the number
+of output rows and a hash of the output of each function) so runs can be compared
+locally. compare fails when a function's output changed between two runs on the same
+synthetic data, so a faster version that changes results does not pass unnoticed.
+"""
+
+import copy
+import hashlib
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import conversion_functions as cf
+from synthetic_data import make_case
+
+app = typer.Typer(help=__doc__)
+
+
+def gen_build_predetermined_args(data):
+    # add the plant+pudl id to all_gen like switch_files.generator_files does
+    return (
+        cf.plant_pudl_id(data["all_gen"].copy()),
+        data["pudl_gen"],
+        data["pudl_gen_entity"],
+        data["pg_build"],
+        {},
+        data["eia_Gen"],
+        data["eia_Gen_prop"],
+        {},
+        {},
+        {},
+        data["retirement_age"],
+    )
+
+
+def gen_build_costs_args(data):
+    build_yr = {i + 1: 2000 for i in range(len(data["existing_gen"]))}
+    return (data["existing_gen"], data["newgens"], build_yr, data["all_gen"])
+
+
+def generation_projects_info_args(data):
+    return (
+        data["all_gen"],
+        data["spur_capex_mw_mile"],
+        data["retirement_age"],
+        data["cogen_tech"],
+        data["baseload_tech"],
+        data["energy_tech"],
+        data["sched_outage_tech"],
+        data["forced_outage_tech"],
+    )
+
+
+def fuel_cost_args(data):
+    return (
+        data["aeo_fuel_region_map"],
+        data["fuel_prices"],
+        data["regions"],
+        "reference",
+        [int(p) for p in data["period_list"]],
+    )
+
+
+def timeseries_args(data):
+    return (data["load_curves"], 20.2778, 283.8889, 4, 6, data["period_list"])
+
+
+def timepoints_args(data):
+    return (data["timeseries"]["timeseries"].to_list(), data["timestamp_interval"])
+
+
+def graph_timestamp_map_args(data):
+    return (data["timeseries"], data["timestamp_interval"])
+
+
+def loads_args(data):
+    return (
+        data["load_curves"],
+        data["timepoints_timestamp"],
+        data["timepoints_dict"],
+        data["period_list"],
+    )
+
+
+def variable_capacity_factors_args(data):
+    return (
+        data["all_gen_variability"],
+        data["year_hour"],
+        data["timepoints_dict"],
+        data["all_gen"],
+        data["period_list"],
+    )
+
+
+def hydro_timeseries_args(data):
+    return (data["existing_gen"], data["hydro_variability"], data["period_list"])
+
+
+def transmission_lines_args(data):
+    return (
+        data["line_loss"],
+        data["add_cap"],
+        data["tx_capex_mw_mile_dict"],
+        data["zone_dict"],
+        data["settings"],
+    )
+
+
+# (name, function, function that creates the arguments from the synthetic data)
+BENCHMARKS = [
+    (
+        "gen_build_predetermined",
+        cf.gen_build_predetermined,
+        gen_build_predetermined_args,
+    ),
+    ("gen_build_costs_table", cf.gen_build_costs_table, gen_build_costs_args),
+    (
+        "generation_projects_info",
+        cf.generation_projects_info,
+        generation_projects_info_args,
+    ),
+    ("switch_fuel_cost_table", cf.switch_fuel_cost_table, fuel_cost_args),
+    (
+        "fuel_market_tables",
+        cf.fuel_market_tables,
+        lambda d: (d["fuel_prices"], d["aeo_fuel_region_map"], d["scenarios"]),
+    ),
+    ("timeseries", cf.timeseries, timeseries_args),
+    ("timepoints_table", cf.timepoints_table, timepoints_args),
+    (
+        "hydro_timepoints_table",
+        cf.hydro_timepoints_table,
+        lambda d: (d["timepoints"],),
+    ),
+    (
+        "graph_timestamp_map_table",
+        cf.graph_timestamp_map_table,
+        graph_timestamp_map_args,
+    ),
+    ("loads_table", cf.loads_table, loads_args),
+    (
+        "variable_capacity_factors_table",
+        cf.variable_capacity_factors_table,
+        variable_capacity_factors_args,
+    ),
+    ("hydro_timeseries", cf.hydro_timeseries, hydro_timeseries_args),
+    (
+        "load_zones_table",
+        cf.load_zones_table,
+        lambda d: (d["regions"], 0),
+    ),
+    ("transmission_lines_table", cf.transmission_lines_table, transmission_lines_args),
+]
+
+
+def add_time_tables(data):
+    """
+    Add the timeseries/timepoints tables that the load and capacity factor functions
+    use (created once, outside of the timed runs).
+    """
+    data["timestamp_interval"] = ["00", "04", "08", "12", "16", "20"]
+    data["timeseries"] = cf.timeseries(*timeseries_args(data))
+    data["timepoints"] = cf.timepoints_table(*timepoints_args(data))
+    data["timepoints_timestamp"] = data["timepoints"]["timestamp"].to_list()
+    data["timepoints_dict"] = dict(
+        zip(data["timepoints"]["timestamp"], data["timepoints"]["timepoint_id"])
+    )
+    _, loads_with_year_hour = cf.loads_table(*loads_args(data))
+    data["year_hour"] = loads_with_year_hour["year_hour"].to_list()
+
+
+def num_rows(result):
+    if isinstance(result, tuple):
+        return [num_rows(r) for r in result]
+    return len(result) if hasattr(result, "__len__") else None
+
+
+def output_summary(result):
+    """
+    Row and column counts and a sha256 of the values, column names and dtypes of a
+    function's output (of each element if it returns a tuple).
+    """
+    if isinstance(result, tuple):
+        return [output_summary(r) for r in result]
+    digest = hashlib.sha256()
+    if isinstance(result, pd.DataFrame):
+        digest.update(
+            pd.util.hash_pandas_object(result, index=False).to_numpy().tobytes()
+        )
+        digest.update(
+            json.dumps(
+                [[str(c) for c in result.columns], [str(t) for t in result.dtypes]]
+            ).encode()
+        )
+        return {
+            "rows": len(result),
+            "columns": len(result.columns),
+            "hash": digest.hexdigest(),
+        }
+    digest.update(json.dumps(result, sort_keys=True, default=str).encode())
+    return {"rows": num_rows(result), "hash": digest.hexdigest()}
+
+
+def run_benchmark(func, make_args, data, repeat):
+    """
+    Time repeat runs of func (the arguments are copied before each run, outside of
+    the timing) and measure the peak memory of one more run with tracemalloc.
+    """
+    seconds = []
+    for _ in range(repeat):
+        args = copy.deepcopy(make_args(data))
+        start = time.perf_counter()
+        result = func(*args)
+        seconds.append(time.perf_counter() - start)
+
+    args = copy.deepcopy(make_args(data))
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": seconds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "peak_mb": peak / 1024**2,
+        "rows": num_rows(result),
+        "output": output_summary(result),
+        "error": None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@app.command()
+def run(
+    results_file: Path,
+    regions: int = typer.Option(26, help="Number of model regions"),
+    plants: int = typer.Option(2000, help="Number of existing plants"),
+    new_resources: int = typer.Option(8, help="New-build resources per region"),
+    weather_yrs: int = typer.Option(1, help="Number of 8760 hour years of profiles"),
+    periods: str = typer.Option("2020,2030,2040,2050", help="Comma separated periods"),
+    scenarios: int = typer.Option(3, help="Number of AEO fuel price scenarios"),
+    repeat: int = typer.Option(3, min=1, help="Timed runs of each function"),
+    only: List[str] = typer.Option(None, help="Only run these functions"),
+    seed: int = typer.Option(0),
+):
+    """Run the benchmarks and save the results as JSON"""
+    params = {
+        "num_regions": regions,
+        "num_plants": plants,
+        "num_new_resources": new_resources,
+        "weather_yrs": weather_yrs,
+        "period_list": periods.split(","),
+        "num_scenarios": scenarios,
+        "seed": seed,
+    }
+    start = time.perf_counter()
+    data = make_case(**params)
+    add_time_tables(data)
+    print(f"created synthetic data in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    for name, func, make_args in BENCHMARKS:
+        if only and name not in only:
+            continue
+        try:
+            results[name] = run_benchmark(func, make_args, data, repeat)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{name:35} failed: {results[name]['error']}")
+            continue
+        r = results[name]
+        print(f"{name:35} {r['median']:9.4f}s {r['peak_mb']:9.1f} MB")
+
+    output = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, "w") as f:
+        json.dump(output, f, indent=2)
+
+
+@app.command()
+def compare(base_file: Path, new_file: Path):
+    """Compare the median times and peak memory of two result files, and fail if the
+    output of a function changed"""
+    with open(base_file) as f:
+        base = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+    same_data = base["params"] == new["params"]
+    if not same_data:
+        print(
+            "warning: the runs used different synthetic data parameters, "
+            "outputs are not compared"
+        )
+
+    print(
+        f"{'function':35} {'base s':>9} {'new s':>9} {'speedup':>8} "
+        f"{'base MB':>9} {'new MB':>9} {'output':>8}"
+    )
+    changed = []
+    for name, b in base["results"].items():
+        n = new["results"].get(name)
+        if n is None or b.get("error") or n.get("error"):
+            print(f"{name:35} {'(missing or failed)':>9}")
+            continue
+        # result files from before outputs were recorded have no "output"
+        if not same_data or "output" not in b or "output" not in n:
+            output = "-"
+        elif b["output"] == n["output"]:
+            output = "same"
+        else:
+            output = "CHANGED"
+            changed.append(name)
+        print(
+            f"{name:35} {b['median']:9.4f} {n['median']:9.4f} "
+            f"{b['median'] / n['median']:7.1f}x "
+            f"{b['peak_mb']:9.1f} {n['peak_mb']:9.1f} {output:>8}"
+        )
+    if changed:
+        print(f"output changed: {', '.join(changed)}")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
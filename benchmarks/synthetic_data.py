@@ -0,0 +1,328 @@
+"""
+Synthetic PowerGenome/PUDL-like inputs for benchmarking conversion_functions.
+
+The frames have the columns the conversion functions use, with sizes set by the
+number of regions, existing plants, new-build resources, weather years and periods.
+Nothing is read from PUDL, PowerGenome or the network.
+"""
+
+import numpy as np
+import pandas as pd
+
+EXISTING_TECH = [
+    "Conventional Steam Coal",
+    "Natural Gas Fired Combined Cycle",
+    "Natural Gas Fired Combustion Turbine",
+    "Nuclear",
+    "Conventional Hydroelectric",
+    "Small Hydroelectric",
+    "Onshore Wind Turbine",
+    "Solar Photovoltaic",
+]
+NEW_TECH = [
+    "NaturalGas_CCAvgCF_Moderate",
+    "LandbasedWind_Class3_Moderate",
+    "UtilityPV_Class1_Moderate",
+    "Battery_*_Moderate",
+]
+FUELS = ["coal", "naturalgas", "distillate", "uranium"]
+
+
+def resource_name(technology):
+    return technology.lower().replace(" ", "_").replace("*", "x")
+
+
+def tech_dicts(technologies, rng):
+    """
+    The user defined technology dictionaries used by generation_projects_info.
+    """
+    energy = {
+        t: rng.choice(["Coal", "Naturalgas", "Uranium", "Wind"]) for t in technologies
+    }
+    return {
+        "retirement_age": {t: int(rng.integers(20, 80)) for t in technologies},
+        "cogen_tech": {t: False for t in technologies},
+        "baseload_tech": {t: "Nuclear" in t or "Coal" in t for t in technologies},
+        "energy_tech": energy,
+        "sched_outage_tech": {t: round(rng.random() * 0.1, 3) for t in technologies},
+        "forced_outage_tech": {t: round(rng.random() * 0.1, 3) for t in technologies},
+    }
+
+
+def random_dates(rng, n, first_yr, last_yr, share, month="06"):
+    years = pd.Series(rng.integers(first_yr, last_yr, n)).astype(str)
+    dates = pd.to_datetime(years + f"-{month}-01")
+    dates[rng.random(n) > share] = pd.NaT
+    return dates
+
+
+def make_generators(rng, regions, num_plants, num_new_resources, period_list):
+    """
+    Existing units (pg_build), the PUDL/EIA tables with their build and retirement
+    dates, and all_gen with existing clusters followed by new-build resources.
+    """
+    # existing units with 1-3 generators each
+    num_gens = rng.integers(1, 4, num_plants)
+    plant_id = np.repeat(np.arange(1000, 1000 + num_plants), num_gens)
+    generator_id = np.concatenate([np.arange(1, n + 1) for n in num_gens]).astype(str)
+    n = len(plant_id)
+    pg_build = pd.DataFrame(
+        {
+            "plant_id_eia": plant_id,
+            "generator_id": generator_id,
+            "unit_id_pudl": rng.integers(1, 3, n),
+            "planned_operating_year": np.where(
+                rng.random(n) < 0.1, rng.integers(2020, 2025, n), np.nan
+            ),
+            "planned_retirement_date": random_dates(rng, n, 2020, 2060, 0.2),
+            "operating_date": random_dates(rng, n, 1950, 2020, 0.95),
+            "Operating Year": np.where(
+                rng.random(n) < 0.7, rng.integers(1950, 2020, n), np.nan
+            ),
+            "retirement_year": np.where(
+                rng.random(n) < 0.2, rng.integers(2020, 2050, n), np.nan
+            ),
+        }
+    )
+    no_year = pg_build["operating_date"].isna() & pg_build["Operating Year"].isna()
+    pg_build.loc[no_year, "Operating Year"] = 1990
+
+    gen_keys = pg_build[["plant_id_eia", "generator_id"]]
+    pudl_gen = gen_keys.sample(frac=0.8, random_state=0)
+    m = len(pudl_gen)
+    pudl_gen = pudl_gen.assign(
+        operational_status="existing",
+        retirement_date=random_dates(rng, m, 2020, 2060, 0.05, "01").to_numpy(),
+        planned_retirement_date=random_dates(rng, m, 2020, 2060, 0.1, "01").to_numpy(),
+        current_planned_operating_date=random_dates(
+            rng, m, 2020, 2026, 0.1, "01"
+        ).to_numpy(),
+    )
+    pudl_gen_entity = gen_keys.assign(
+        operating_date=random_dates(rng, n, 1940, 2020, 1.0, "03").to_numpy()
+    )
+    eia_gen = gen_keys.sample(frac=0.6, random_state=1)
+    eia_gen = eia_gen.assign(
+        **{"Operating Year": rng.integers(1940, 2020, len(eia_gen))}
+    )
+    eia_gen["plant_gen_id"] = (
+        eia_gen["plant_id_eia"].astype(str) + "_" + eia_gen["generator_id"]
+    )
+    eia_gen_prop = gen_keys.sample(frac=0.05, random_state=2)
+    eia_gen_prop = eia_gen_prop.assign(
+        planned_operating_year=rng.integers(2021, 2026, len(eia_gen_prop))
+    )
+    eia_gen_prop["plant_gen_id"] = (
+        eia_gen_prop["plant_id_eia"].astype(str) + "_" + eia_gen_prop["generator_id"]
+    )
+
+    # one existing cluster per unit, then the new-build resources of each region
+    units = pg_build.drop_duplicates(["plant_id_eia", "unit_id_pudl"])
+    existing = units[["plant_id_eia", "unit_id_pudl"]].reset_index(drop=True)
+    existing["index"] = np.arange(len(existing), dtype=float)
+    existing["region"] = rng.choice(regions, len(existing))
+    existing["technology"] = rng.choice(EXISTING_TECH, len(existing))
+    existing["Existing_Cap_MW"] = rng.random(len(existing)) * 500
+
+    new_tech = np.resize(NEW_TECH, num_new_resources)
+    new = pd.DataFrame(
+        {
+            "region": np.repeat(regions, num_new_resources),
+            "technology": np.tile(new_tech, len(regions)),
+            "Existing_Cap_MW": np.nan,
+        }
+    )
+    all_gen = pd.concat([existing, new], ignore_index=True)
+    num_all = len(all_gen)
+    all_gen["plant_id_eia"] = all_gen["plant_id_eia"].astype("Int64")
+    all_gen["unit_id_pudl"] = all_gen["unit_id_pudl"].astype("Int64")
+    all_gen["Resource"] = all_gen["technology"].map(resource_name)
+    all_gen["cluster"] = all_gen.groupby(["region", "Resource"]).cumcount() + 1
+    all_gen["Cap_Size"] = rng.random(num_all) * 200
+    all_gen["capex_mw"] = rng.random(num_all) * 2e6
+    all_gen["capex_mwh"] = np.where(
+        all_gen["technology"].str.contains("Battery"), rng.random(num_all) * 3e5, np.nan
+    )
+    all_gen["Fixed_OM_Cost_per_MWyr"] = rng.random(num_all) * 5e4
+    all_gen["Heat_Rate_MMBTU_per_MWh"] = np.where(
+        rng.random(num_all) < 0.5, rng.random(num_all) * 10, 0
+    )
+    all_gen["Var_OM_Cost_per_MWh"] = rng.random(num_all) * 5
+    all_gen["spur_miles"] = np.where(
+        rng.random(num_all) < 0.5, rng.random(num_all) * 50, np.nan
+    )
+    all_gen["spur_capex"] = 0.0
+    all_gen["interconnect_capex_mw"] = 0.0
+    all_gen["Eff_Up"] = 0.92
+    all_gen["Eff_Down"] = 0.92
+
+    existing_gen = all_gen.loc[all_gen["index"].notna()]
+    new_gen = all_gen.loc[all_gen["index"].isna()]
+    newgens = pd.concat(
+        [new_gen.assign(build_year=int(p)) for p in period_list], ignore_index=True
+    )
+
+    return {
+        "all_gen": all_gen,
+        "existing_gen": existing_gen,
+        "newgens": newgens[
+            ["build_year", "capex_mw", "capex_mwh", "Fixed_OM_Cost_per_MWyr"]
+        ],
+        "pg_build": pg_build,
+        "pudl_gen": pudl_gen,
+        "pudl_gen_entity": pudl_gen_entity,
+        "eia_Gen": eia_gen,
+        "eia_Gen_prop": eia_gen_prop,
+    }
+
+
+def make_profiles(rng, regions, all_gen, num_hours):
+    """
+    Hourly load by region, hydro profiles by region and capacity factors for every
+    generator (columns named region_Resource_cluster like PowerGenome).
+    """
+    hours = pd.RangeIndex(1, num_hours + 1)
+    daily = 1 + 0.3 * np.sin(np.arange(num_hours) / 24 * 2 * np.pi)[:, None]
+    load_curves = pd.DataFrame(
+        (rng.random((num_hours, len(regions))) * 0.2 + daily) * 1000,
+        index=hours,
+        columns=regions,
+    )
+    hydro_variability = pd.DataFrame(
+        rng.random((num_hours, len(regions))), index=hours, columns=regions
+    )
+    gen_names = (
+        all_gen["region"]
+        + "_"
+        + all_gen["Resource"]
+        + "_"
+        + all_gen["cluster"].astype(str)
+    )
+    all_gen_variability = pd.DataFrame(
+        rng.random((num_hours, len(all_gen))).astype("float32"),
+        index=hours,
+        columns=gen_names,
+    )
+    return {
+        "load_curves": load_curves,
+        "hydro_variability": hydro_variability,
+        "all_gen_variability": all_gen_variability,
+    }
+
+
+def make_fuels(rng, regions, num_aeo_regions, num_scenarios, first_yr, last_yr):
+    """
+    gc.fuel_prices-like prices for every AEO region, fuel, scenario and year, and the
+    map of AEO fuel regions to model regions.
+    """
+    aeo_regions = [f"aeo_{i}" for i in range(num_aeo_regions)]
+    region_groups = np.array_split(np.array(regions, dtype=object), num_aeo_regions)
+    aeo_fuel_region_map = {a: list(g) for a, g in zip(aeo_regions, region_groups)}
+    names = ["reference", "high_resource", "low_resource", "high_price"]
+    scenarios = [
+        names[i] if i < len(names) else f"scenario_{i}" for i in range(num_scenarios)
+    ]
+    index = pd.MultiIndex.from_product(
+        [scenarios, aeo_regions, FUELS, range(first_yr, last_yr + 1)],
+        names=["scenario", "region", "fuel", "year"],
+    )
+    fuel_prices = index.to_frame(index=False)
+    fuel_prices["price"] = rng.random(len(fuel_prices)) * 10
+    fuel_prices["full_fuel_name"] = (
+        fuel_prices["region"]
+        + "."
+        + fuel_prices["fuel"]
+        + "."
+        + fuel_prices["scenario"]
+    )
+    return {
+        "fuel_prices": fuel_prices,
+        "aeo_fuel_region_map": aeo_fuel_region_map,
+        "scenarios": scenarios,
+    }
+
+
+def make_transmission(rng, regions):
+    """
+    PowerGenome-like transmission lines between neighbouring regions.
+    """
+    pairs = [(regions[i], regions[i + 1]) for i in range(len(regions) - 1)]
+    pairs += [(regions[i], regions[i + 2]) for i in range(len(regions) - 2)]
+    num_lines = len(pairs)
+    line_loss = pd.DataFrame(
+        {
+            "Network_Lines": np.arange(1, num_lines + 1),
+            "transmission_path_name": [f"{a}_to_{b}" for a, b in pairs],
+            "distance_mile": rng.random(num_lines) * 500,
+            "Line_Loss_Percentage": rng.random(num_lines) * 0.05,
+        }
+    )
+    max_flow = rng.random(num_lines) * 5000
+    add_cap = pd.DataFrame(
+        {
+            "Line_Max_Flow_MW": max_flow,
+            "Line_Min_Flow_MW": -max_flow * rng.random(num_lines),
+            "DerateCapRes_1": 0.95,
+        }
+    )
+    tx_capex_mw_mile_dict = {r: float(rng.random() * 3000 + 1000) for r in regions}
+    return {
+        "line_loss": line_loss,
+        "add_cap": add_cap,
+        "tx_capex_mw_mile_dict": tx_capex_mw_mile_dict,
+        "zone_dict": {r: i + 1 for i, r in enumerate(regions)},
+        "settings": {
+            "transmission_investment_cost": {
+                "tx": {"capex_mw_mile": tx_capex_mw_mile_dict},
+                "spur": {"capex_mw_mile": tx_capex_mw_mile_dict},
+            }
+        },
+    }
+
+
+def make_case(
+    num_regions=26,
+    num_plants=2000,
+    num_new_resources=8,
+    weather_yrs=1,
+    period_list=("2020", "2030", "2040", "2050"),
+    num_aeo_regions=9,
+    num_scenarios=3,
+    seed=0,
+):
+    """
+    Create all synthetic inputs of one case.
+    Inputs:
+        * num_regions: number of model regions (load zones)
+        * num_plants: number of existing plants (each with 1-3 generators)
+        * num_new_resources: new-build resources in each region
+        * weather_yrs: number of 8760 hour years in the profiles
+        * period_list: the planning periods
+        * num_aeo_regions, num_scenarios: size of the fuel price table
+        * seed: random seed, the same arguments always give the same data
+    Output:
+        dictionary of dataframes and dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    period_list = [str(p) for p in period_list]
+    regions = [f"p{i}" for i in range(num_regions)]
+
+    data = {"regions": regions, "period_list": period_list}
+    data.update(
+        make_generators(rng, regions, num_plants, num_new_resources, period_list)
+    )
+    data.update(make_profiles(rng, regions, data["all_gen"], 8760 * weather_yrs))
+    data.update(
+        make_fuels(
+            rng,
+            regions,
+            min(num_aeo_regions, num_regions),
+            num_scenarios,
+            int(period_list[0]),
+            int(period_list[-1]),
+        )
+    )
+    data.update(make_transmission(rng, regions))
+    data.update(tech_dicts(sorted(set(EXISTING_TECH) | set(NEW_TECH)), rng))
+    data["spur_capex_mw_mile"] = data["tx_capex_mw_mile_dict"]
+    return data
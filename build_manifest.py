@@ -0,0 +1,83 @@
+"""
+Build manifest for incremental rebuilds of case folders.
+
+Each case folder gets a build_manifest.json that records, for every group of output
+tables, a hash of the inputs the tables were built from (settings, PUDL/PowerGenome
+database fingerprints and the case rows of the scenario definitions file) and the
+files that were written. On a rerun a group is only rebuilt when its hash changed or
+one of its files is missing.
+"""
+
+import json
+import os
+import uuid
+from pathlib import Path
+
+MANIFEST_FN = "build_manifest.json"
+
+# output tables created by each group in pg_to_switch.run_case
+GENERATOR_TABLES = [
+    "generation_projects_info",
+    "gen_build_predetermined",
+    "gen_build_costs",
+]
+FUEL_TABLES = ["fuel_cost", "fuels"]
+
+
+def table_files(tables, output_format):
+    """
+    File names written for the tables with an output format ("csv", "parquet" or
+    "both").
+    """
+    suffixes = {"csv": [".csv"], "parquet": [".parquet"], "both": [".csv", ".parquet"]}
+    return [
+        f"{table}{suffix}" for table in tables for suffix in suffixes[output_format]
+    ]
+
+
+def load_manifest(case_folder):
+    """
+    Read the build manifest of a case folder (an empty manifest if there is none or
+    it can't be read).
+    """
+    path = Path(case_folder) / MANIFEST_FN
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"groups": {}}
+    if not isinstance(manifest.get("groups"), dict):
+        return {"groups": {}}
+    return manifest
+
+
+def save_manifest(case_folder, manifest):
+    """
+    Write the build manifest of a case folder (through a temporary file so an
+    interrupted run never leaves a partial manifest).
+    """
+    path = Path(case_folder) / MANIFEST_FN
+    tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_up_to_date(manifest, case_folder, group, input_hash, files):
+    """
+    Check if a group of tables was built from the same inputs and all of its files
+    are still in the case folder.
+    """
+    entry = manifest["groups"].get(group)
+    if entry is None or entry.get("input_hash") != input_hash:
+        return False
+    if not set(files).issubset(entry.get("files", [])):
+        return False
+    return all((Path(case_folder) / fn).exists() for fn in files)
+
+
+def record_build(manifest, group, input_hash, files):
+    """
+    Store the input hash and files of a group of tables that was just built.
+    """
+    manifest["groups"][group] = {"input_hash": input_hash, "files": sorted(files)}
@@ -0,0 +1,2 @@
+# Lets the tests in tests/ import the top-level modules (pg_to_switch, data_cache, ...)
+# when pytest is run from the repository root.
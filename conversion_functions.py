@@ -2,11 +2,37 @@
 Functions to convert data from PowerGenome for use with Switch
 """
 
+from datetime import date, datetime
 from statistics import mean, mode
 
 import numpy as np
 import pandas as pd
 
+# month (0-11) of each hour of a non-leap 8760 hour year
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+HOUR_MONTH = np.repeat(np.arange(12), np.array(DAYS_IN_MONTH) * 24)
+
+
+def fuel_region_frame(aeo_fuel_region_map):
+    """
+    Turn aeo_fuel_region_map ({aeo_fuel_region: [ipm regions]}) into a dataframe with
+    one row per ipm region (columns: region, load_zone), in the order of the map.
+    """
+    region_map = pd.Series(aeo_fuel_region_map, dtype=object).explode().dropna()
+    return pd.DataFrame(
+        {"region": region_map.index, "load_zone": region_map.to_numpy()}
+    )
+
+
+def filter_scenarios(fuel_prices, scenario):
+    """
+    Filter fuel_prices to one AEO scenario (str) or a list of scenarios. Returns the
+    filtered prices and whether more than one scenario was asked for.
+    """
+    if isinstance(scenario, str):
+        return fuel_prices.loc[fuel_prices["scenario"] == scenario], False
+    return fuel_prices.loc[fuel_prices["scenario"].isin(scenario)], True
+
 
 def switch_fuel_cost_table(
     aeo_fuel_region_map, fuel_prices, IPM_regions, scenario, year_list
@@ -18,6 +44,7 @@ def switch_fuel_cost_table(
         * fuel_prices: output from PowerGenome gc.fuel_prices
         * IPM_regions: from settings('model_regions')
         * scenario: filtering the fuel_prices table. Suggest using 'reference' for now.
+            Can also be a list of scenarios, the output then has a scenario column.
         * year_list: the periods - 2020, 2030, 2040, 2050.  To filter the fuel_prices year column
     Output:
         the fuel_cost_table
@@ -27,32 +54,26 @@ def switch_fuel_cost_table(
             * fuel_cost: based on fuel_prices.price
     """
 
-    ref_df = fuel_prices.copy()
-    ref_df = ref_df.loc[
-        fuel_prices["scenario"] == scenario
-    ]  # use reference scenario for now
+    ref_df, multi_scenario = filter_scenarios(fuel_prices, scenario)
     ref_df = ref_df[ref_df["year"].isin(year_list)]
-    ref_df = ref_df.drop(["full_fuel_name", "scenario"], axis=1)
-
-    # loop through aeo_fuel_regions.
-    # for each of the ipm regions in the aeo_fuel, duplicate the fuel_prices table while adding ipm column
-    fuel_cost = pd.DataFrame(columns=["year", "price", "fuel", "region", "load_zone"])
-    data = list()
-    for region in aeo_fuel_region_map.keys():
-        df = ref_df.copy()
-        df = df[df["region"] == region]
-        for ipm in aeo_fuel_region_map[region]:
-            ipm_region = ipm
-            df["load_zone"] = ipm_region
-            fuel_cost = fuel_cost.append(df)
-    #     fuel_cost = fuel_cost.append(data)
+
+    # join the prices of each aeo_fuel_region to every ipm region in it
+    region_map = fuel_region_frame(aeo_fuel_region_map)
+    region_map = region_map[region_map["load_zone"].isin(IPM_regions)]
+    fuel_cost = region_map.merge(ref_df, on="region", how="inner", sort=False)
+
     fuel_cost.rename(columns={"year": "period", "price": "fuel_cost"}, inplace=True)
-    fuel_cost = fuel_cost[["load_zone", "fuel", "period", "fuel_cost"]]
+    columns = ["load_zone", "fuel", "period", "fuel_cost"]
+    if multi_scenario:
+        columns = ["scenario"] + columns
+    fuel_cost = fuel_cost[columns]
     fuel_cost["period"] = fuel_cost["period"].astype(int)
-    fuel_cost = fuel_cost[fuel_cost["load_zone"].isin(IPM_regions)]
     fuel_cost["fuel"] = fuel_cost[
         "fuel"
     ].str.capitalize()  # align with energy_source in gen_pro_info? switch error.
+    fuel_cost[["load_zone", "fuel"]] = fuel_cost[["load_zone", "fuel"]].astype(
+        "category"
+    )
     return fuel_cost
 
 
@@ -133,6 +154,177 @@ def plant_pudl_id(df):
     return pd.concat([has_plant_id, no_plant_id], ignore_index=True)
 
 
+def id_strings(values):
+    """
+    generator_id/unit_id_pudl values as strings. Whole-number floats are written
+    without the decimal (1.0 -> "1"), so ids read as floats match the same ids read
+    as integers or text.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype(str).to_numpy(dtype=object)
+
+    def to_str(x):
+        if isinstance(x, float) and x.is_integer():
+            return str(int(x))
+        return str(x)
+
+    return values.map(to_str).to_numpy(dtype=object)
+
+
+def split_legacy_keys(keys):
+    """
+    Split "plant_id_eia_generator_id" strings such as "57943.0_6" (the keys made by
+    plant_gen_id) into plant ids and the ids after the first "_".
+    """
+    parts = pd.Series(keys, dtype=object).astype(str).str.split("_", n=1, expand=True)
+    parts = parts.reindex(columns=[0, 1])
+    return parts[0].to_numpy(dtype=object), parts[1].to_numpy(dtype=object)
+
+
+def plant_keys(plant_id_eia, other_id):
+    """
+    Composite (plant_id_eia, generator_id or unit_id_pudl) keys as a pd.MultiIndex.
+    Plant ids are numbers (57943.0, 57943 and "57943" are the same plant) and the
+    other ids are strings (see id_strings). Keys without a plant id have a NaN plant.
+    """
+    plant = pd.to_numeric(pd.Series(plant_id_eia), errors="coerce")
+    return pd.MultiIndex.from_arrays(
+        [plant.to_numpy(dtype="float64", na_value=np.nan), id_strings(other_id)]
+    )
+
+
+def generator_keys(df):
+    """
+    (plant_id_eia, generator_id) keys of each row of df, from the legacy plant_gen_id
+    strings if df does not have both columns.
+    """
+    if {"plant_id_eia", "generator_id"}.issubset(df.columns):
+        return plant_keys(df["plant_id_eia"], df["generator_id"])
+    return plant_keys(*split_legacy_keys(df["plant_gen_id"]))
+
+
+def unit_keys(df):
+    """
+    (plant_id_eia, unit_id_pudl) keys of each row of df. unit_id_pudl values that
+    already include the plant ("55168_1") are split, like plant_pudl_id uses them.
+    """
+    keys = plant_keys(df["plant_id_eia"], df["unit_id_pudl"])
+    plant = keys.get_level_values(0).to_numpy()
+    units = keys.get_level_values(1).to_numpy(dtype=object)
+    legacy = ~np.isnan(plant) & pd.Series(units).str.contains("_").to_numpy()
+    if not legacy.any():
+        return keys
+    legacy_plant, legacy_unit = split_legacy_keys(units[legacy])
+    plant = plant.copy()
+    plant[legacy] = pd.to_numeric(pd.Series(legacy_plant), errors="coerce")
+    units[legacy] = id_strings(legacy_unit)
+    return plant_keys(plant, units)
+
+
+def intern_keys(keys):
+    """
+    Give each composite key (see plant_keys) a dense integer code, so that joins
+    compare integers instead of strings.
+    Output:
+        * key_index: the unique keys that have a plant id. Codes of other tables are
+          found with key_index.get_indexer(keys)
+        * codes: position of each key in key_index (-1 if it has no plant id)
+    """
+    has_plant = ~np.isnan(keys.get_level_values(0).to_numpy())
+    key_index = keys[has_plant].unique()
+    return key_index, key_index.get_indexer(keys)
+
+
+def int_ids(values):
+    """
+    Integer ids (timepoints, generation projects, hours) as an int32 array, or int64
+    if a value does not fit in int32.
+    """
+    values = np.asarray(values)
+    info = np.iinfo(np.int32)
+    if values.size and (values.min() < info.min or values.max() > info.max):
+        return values.astype(np.int64)
+    return values.astype(np.int32)
+
+
+def to_year(values):
+    """
+    Convert a column of dates or years to a nullable integer column of years.
+    Values that can't be read as a date or a number are treated as missing.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.year
+    if values.dtype == object:
+        dates = values.map(lambda x: isinstance(x, (pd.Timestamp, datetime, date)))
+        if dates.any():
+            values = values.copy()
+            values[dates] = pd.DatetimeIndex(values[dates]).year
+    values = pd.to_numeric(values, errors="coerce")
+    return pd.Series(
+        float_to_year(values.to_numpy(dtype="float64", na_value=np.nan)),
+        index=values.index,
+    )
+
+
+def dict_to_frame(dictionary, key="plant_gen_id", column="year"):
+    """
+    Turn a {key: year} dictionary into a two column dataframe
+    """
+    return pd.DataFrame(
+        {key: list(dictionary.keys()), column: list(dictionary.values())}
+    )
+
+
+def float_to_year(values):
+    """
+    Convert a float array of years (NaN if missing) to a nullable integer array.
+    """
+    missing = np.isnan(values)
+    return pd.arrays.IntegerArray(
+        np.where(missing, 0, np.round(values)).astype("int64"), missing
+    )
+
+
+def lookup_year(key_index, key_codes, df, column, df_codes=None):
+    """
+    Look up the year in df[column] for each row of a table, using the last
+    non-missing value for each key in df.
+    Inputs:
+        * key_index: the unique (plant_id_eia, generator_id) keys of the table (from
+          intern_keys)
+        * key_codes: position in key_index of the key of each row in the table
+        * df, column: the source of the years and the column to use
+        * df_codes: position in key_index of each row of df, found from the
+          generator_keys of df if None
+    Output:
+        nullable integer array of years for each row (missing if the key is not in df)
+    """
+    years = to_year(df[column]).to_numpy(dtype="float64", na_value=np.nan)
+    if df_codes is None:
+        df_codes = key_index.get_indexer(generator_keys(df))
+    codes = df_codes
+    found = (codes >= 0) & ~np.isnan(years)
+    # reverse so that np.unique finds the last value for each key
+    codes = codes[found][::-1]
+    years = years[found][::-1]
+    codes, last = np.unique(codes, return_index=True)
+    table = np.full(len(key_index), np.nan)
+    table[codes] = years[last]
+    return float_to_year(table[key_codes])
+
+
+def coalesce_years(years, ufunc):
+    """
+    Combine year columns into one column with np.fmax (latest) or np.fmin (earliest),
+    skipping missing values. Rows without any year are NaN.
+    """
+    values = years.to_numpy(dtype="float64", na_value=np.nan)
+    if values.shape[1] == 0:
+        return pd.Series(np.nan, index=years.index)
+    return pd.Series(ufunc.reduce(values, axis=1), index=years.index)
+
+
 def gen_build_predetermined(
     all_gen,
     pudl_gen,
@@ -165,7 +357,11 @@ def gen_build_predetermined(
         6) eia_Gen: eia operable plants
         7) eia_Gen_prop: eia proposed plants
         8) plant_gen_manual, plant_gen_manual_proposed, plant_gen_manual_retired: manually found build_years
+            keyed on "plant_generator" strings ("57943_6" and "57943.0_6" both work)
         9) retirement_ages: how many years until plant retires
+    The tables are matched on (plant_id_eia, generator_id) and on
+    (plant_id_eia, unit_id_pudl), see generator_keys and unit_keys. all_gen also needs
+    the plant_pudl_id column (for gen_build_with_id).
     Output columns
         * GENERATION_PROJECT: index from all_gen
         * build_year: using pudl_gen, pudl_gen_entity, eia excel file, and pg_build to get years
@@ -178,111 +374,87 @@ def gen_build_predetermined(
     """
 
     """
-    Use dictionaries to get the build year from the various sources of information
+    Look up the build and retirement years from the various sources of information.
+    Each source becomes a year column aligned with the rows of pg_build.
     """
+    pg_build = pg_build.reset_index(drop=True)
+    # give each (plant_id_eia, generator_id) of pg_build an integer code once, the
+    # lookups then compare codes
+    key_index, key_codes = intern_keys(generator_keys(pg_build))
+    years = pd.DataFrame(index=pg_build.index)
+
+    # dates/years already in pg_build (from PowerGenome gc.units_model)
+    for c in [
+        "operating_date",
+        "planned_retirement_date",
+        "Operating Year",
+        "planned_operating_year",
+        "retirement_year",
+    ]:
+        years[c] = to_year(pg_build[c])
 
-    # create dictionaries {plant_gen_id: date} from pudl_gen
-    plant_op_date_dict = create_dict_plantgen(
-        pudl_gen, "current_planned_operating_date"
-    )
-    plant_plan_ret_date_dict = create_dict_plantgen(pudl_gen, "planned_retirement_date")
-    plant_ret_date_dict = create_dict_plantgen(pudl_gen, "retirement_date")
-
-    # create dictionaries {plant_gen_id: date} from pudl_gen_entity
-    entity_op_date_dict = create_dict_plantgen(pudl_gen_entity, "operating_date")
-
-    # create dictionaries {plant_gen_id: date} from pg_build
-    PG_pl_retire_date_dict = create_dict_plantgen(pg_build, "planned_retirement_date")
-    PG_retire_yr_dict = create_dict_plantgen(pg_build, "retirement_year")
-    PG_op_date_dict = create_dict_plantgen(pg_build, "operating_date")
-    PG_op_yr_dict = create_dict_plantgen(pg_build, "Operating Year")
-
-    #  create dictionaries {plant_gen_id: date} from eia excel file
-    eia_Gen_dict = create_dict_plantgen(eia_Gen, "Operating Year")
-    eia_Gen_prop_dict = create_dict_plantgen(eia_Gen_prop, "planned_operating_year")
-
-    """
-    Bring in dates based on dictionaries and the plant_gen_id column
-    """
     # based on pudl_gen
-    pg_build["op_date"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, plant_op_date_dict)
+    pudl_codes = key_index.get_indexer(generator_keys(pudl_gen))
+    years["op_date"] = lookup_year(
+        key_index,
+        key_codes,
+        pudl_gen,
+        "current_planned_operating_date",
+        df_codes=pudl_codes,
     )
-    pg_build["plan_retire_date"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, plant_plan_ret_date_dict)
+    years["plan_retire_date"] = lookup_year(
+        key_index, key_codes, pudl_gen, "planned_retirement_date", df_codes=pudl_codes
     )
-    pg_build["retirement_date"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, plant_ret_date_dict)
+    years["retirement_date"] = lookup_year(
+        key_index, key_codes, pudl_gen, "retirement_date", df_codes=pudl_codes
     )
 
     # based on pudl_gen_entity
-    pg_build["entity_op_date"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, entity_op_date_dict)
+    years["entity_op_date"] = lookup_year(
+        key_index, key_codes, pudl_gen_entity, "operating_date"
     )
 
     # based on pg_build
-    pg_build["PG_pl_retire"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, PG_pl_retire_date_dict)
+    years["PG_pl_retire"] = lookup_year(
+        key_index, key_codes, pg_build, "planned_retirement_date", df_codes=key_codes
     )
-    pg_build["PG_retire_yr"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, PG_retire_yr_dict)
+    years["PG_retire_yr"] = lookup_year(
+        key_index, key_codes, pg_build, "retirement_year", df_codes=key_codes
     )
-    pg_build["PG_op_date"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, PG_op_date_dict)
+    years["PG_op_date"] = lookup_year(
+        key_index, key_codes, pg_build, "operating_date", df_codes=key_codes
     )
-    pg_build["PG_op_yr"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, PG_op_yr_dict)
+    years["PG_op_yr"] = lookup_year(
+        key_index, key_codes, pg_build, "Operating Year", df_codes=key_codes
     )
 
     # based on manual_build
-    pg_build["manual_yr"] = pg_build["plant_id_eia"].apply(
-        lambda x: plant_dict(x, manual_build_yr)
-    )
+    years["manual_yr"] = to_year(pg_build["plant_id_eia"].map(manual_build_yr))
 
     # based on eia excel
-    pg_build["eia_gen_op_yr"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, eia_Gen_dict)
+    years["eia_gen_op_yr"] = lookup_year(
+        key_index, key_codes, eia_Gen, "Operating Year"
     )
-    pg_build["proposed_year"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, eia_Gen_prop_dict)
+    years["proposed_year"] = lookup_year(
+        key_index, key_codes, eia_Gen_prop, "planned_operating_year"
     )
 
     # based on eia excel manual dictionary
-    pg_build["eia_gen_manual_yr"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, plant_gen_manual)
+    years["eia_gen_manual_yr"] = lookup_year(
+        key_index, key_codes, dict_to_frame(plant_gen_manual), "year"
     )
-    pg_build["proposed_manual_year"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, plant_gen_manual_proposed)
+    years["proposed_manual_year"] = lookup_year(
+        key_index, key_codes, dict_to_frame(plant_gen_manual_proposed), "year"
     )
-    pg_build["eia_gen_retired_yr"] = pg_build["plant_gen_id"].apply(
-        lambda x: plant_dict(x, plant_gen_manual_retired)
+    years["eia_gen_retired_yr"] = lookup_year(
+        key_index, key_codes, dict_to_frame(plant_gen_manual_retired), "year"
     )
 
     """
-    Manipulating the build and retirement year data
-        - change to year instead of date, 
-        - bring all years into one column
-        - remove nans
+    Bring all build years and all retirement years into one column each
+        - the latest of the operating/planned years is the build year
+        - the earliest of the retirement years is the retirement year
     """
-
-    # the columns that have the dates as datetime
-    columns = [
-        "operating_date",
-        "op_date",
-        "plan_retire_date",
-        "retirement_date",
-        "entity_op_date",
-        "planned_retirement_date",
-        "PG_pl_retire",
-        "PG_op_date",
-    ]
-    # change those columns to just year (instead of longer date)
-    for c in columns:
-        try:
-            pg_build[c] = pd.DatetimeIndex(pg_build[c]).year
-        except:
-            pass
-
     op_columns = [
         "operating_date",
         "op_date",
@@ -297,17 +469,20 @@ def gen_build_predetermined(
         "proposed_year",
         "proposed_manual_year",
     ]
-    pg_build["build_final"] = pg_build[op_columns].max(axis=1)
+    pg_build["build_final"] = coalesce_years(years[op_columns], np.fmax)
     # get all build years into one column (includes manual dates and proposed dates)
 
-    plant_unit_tech = all_gen.dropna(subset=["plant_pudl_id"])[
-        ["plant_pudl_id", "technology"]
-    ]
-    plant_unit_tech = plant_unit_tech.drop_duplicates(subset=["plant_pudl_id"])
-    plant_unit_tech = plant_unit_tech.set_index("plant_pudl_id")["technology"]
-    pg_build["technology"] = pg_build["plant_pudl_id"].map(plant_unit_tech)
+    # (plant_id_eia, unit_id_pudl) codes connect pg_build to all_gen
+    unit_index, pg_unit_codes = intern_keys(unit_keys(pg_build))
+    all_gen_unit_codes = unit_index.get_indexer(unit_keys(all_gen))
+    found = all_gen_unit_codes >= 0
+    plant_unit_tech = pd.Series(
+        all_gen["technology"].to_numpy()[found], index=all_gen_unit_codes[found]
+    )
+    plant_unit_tech = plant_unit_tech[~plant_unit_tech.index.duplicated()]
+    pg_build["technology"] = plant_unit_tech.reindex(pg_unit_codes).to_numpy()
     pg_build["retirement_age"] = pg_build["technology"].map(retirement_ages)
-    pg_build["calc_retirement_year"] = (
+    years["calc_retirement_year"] = to_year(
         pg_build["build_final"] + pg_build["retirement_age"]
     )
     if not pg_build.query("retirement_age.isna()").empty:
@@ -323,7 +498,7 @@ def gen_build_predetermined(
         "eia_gen_retired_yr",
         "calc_retirement_year",
     ]
-    pg_build["retire_year_final"] = pg_build[ret_columns].min(axis=1)
+    pg_build["retire_year_final"] = coalesce_years(years[ret_columns], np.fmin)
 
     """
     Start creating the gen_build_predetermined table
@@ -347,32 +522,30 @@ def gen_build_predetermined(
 
     # this ignores new builds
     new_builds = gen_buildpre[gen_buildpre["index"].isna()]
-    gen_buildpre = gen_buildpre[gen_buildpre["index"].notna()]
-
-    # create dictionary to go from pg_build to gen_buildpre (build_year)
-    pg_build_buildyr = create_dict_plantpudl(pg_build, "build_final")
-    gen_buildpre["build_year"] = gen_buildpre["plant_pudl_id"].apply(
-        lambda x: plant_dict(x, pg_build_buildyr)
-    )
-
-    # create dictionary to go from pg_build to gen_buildpre (retirement_year)
-    pg_retireyr = pg_build["retire_year_final"].to_list()
-    pg_build_retireyr = create_dict_plantpudl(pg_build, "retire_year_final")
-    gen_buildpre["retirement_year"] = gen_buildpre["plant_pudl_id"].apply(
-        lambda x: plant_dict(x, pg_build_retireyr)
-    )
+    existing = gen_buildpre["index"].notna().to_numpy()
+    gen_buildpre = gen_buildpre[existing]
+
+    # go from pg_build to gen_buildpre (build_year and retirement_year)
+    # (the last pg_build row for each plant_id_eia/unit_id_pudl is used)
+    has_unit = pg_unit_codes >= 0
+    pg_build_years = pg_build.loc[has_unit, ["build_final", "retire_year_final"]]
+    pg_build_years.index = pg_unit_codes[has_unit]
+    pg_build_years = pg_build_years[~pg_build_years.index.duplicated(keep="last")]
+    positions = pg_build_years.index.get_indexer(all_gen_unit_codes[existing])
+    found = positions >= 0
+    for column, pg_column in [
+        ("build_year", "build_final"),
+        ("retirement_year", "retire_year_final"),
+    ]:
+        values = pg_build_years[pg_column].to_numpy(dtype="float64")[positions]
+        gen_buildpre[column] = np.where(found, values, np.nan)
 
     # for plants that still don't have a build year but have a retirement year.
     # Base build year off of retirement year: retirement year - retirement age (based on technology)
-    # check to see if it is na or None if you get blank build years
-    mask = gen_buildpre["build_year"] == "None"
-    nans = gen_buildpre[mask]
-
-    if not nans.empty:
-        gen_buildpre.loc[mask, "build_year"] = nans.apply(
-            lambda row: float(row.retirement_year) - retirement_ages[row.technology],
-            axis=1,
-        )
+    mask = gen_buildpre["build_year"].isna()
+    gen_buildpre.loc[mask, "build_year"] = gen_buildpre.loc[
+        mask, "retirement_year"
+    ] - gen_buildpre.loc[mask, "technology"].map(retirement_ages)
 
     # don't include new builds in gen_build_predetermined
     #     new_builds['GENERATION_PROJECT'] = range(gen_buildpre.shape[0]+1, gen_buildpre.shape[0]+1+new_builds.shape[0])
@@ -416,10 +589,7 @@ def gen_build_predetermined(
         },
         inplace=True,
     )
-    # based on REAM
-    gen_buildpre["gen_predetermined_storage_energy_mwh"] = gen_buildpre[
-        "gen_predetermined_storage_energy_mwh"
-    ].fillna(".")
+    # based on REAM, missing values are written as "." (see output_functions.DOT_COLUMNS)
 
     gen_buildpre["build_year"] = gen_buildpre["build_year"].astype(float).astype(int)
     #     gen_buildpre['GENERATION_PROJECT'] = gen_buildpre['GENERATION_PROJECT'].astype(str)
@@ -505,27 +675,28 @@ def gen_build_costs_table(existing_gen, newgens, build_yr_plantid_dict, all_gen)
         ]
     ]
 
-    gen_build_costs = existing.append(combined_new_gens, ignore_index=True)
+    gen_build_costs = pd.concat([existing, combined_new_gens], ignore_index=True)
 
     gen_build_costs["build_year"] = (
         gen_build_costs["build_year"].astype(float).astype(int)
     )
     #     gen_build_costs.drop('index', axis=1, inplace=True)
 
-    # gen_storage_energy_overnight_cost should only be for batteries
-    all_gen["GP"] = all_gen.index + 1
-    batteries = all_gen[all_gen["technology"] == "Battery_*_Moderate"]
-    batteries_id = batteries["GP"].to_list()
+    # gen_storage_energy_overnight_cost should only be for batteries (the project id is
+    # the all_gen index + 1). all_gen is not changed, other tables may be reading it.
+    batteries = all_gen.index[all_gen["technology"] == "Battery_*_Moderate"]
+    batteries_id = (batteries + 1).to_list()
     #     gen_build_costs['gen_storage_energy_overnight_cost'] = gen_build_costs.apply(
     #                 lambda row: row.gen_storage_energy_overnight_cost if row.GENERATION_PROJECT in
     #                 batteries_id else '.',  axis=1)
     gen_build_costs["GENERATION_PROJECT"] = gen_build_costs[
         "GENERATION_PROJECT"
     ].astype(int)
-    gen_build_costs.loc[
-        ~gen_build_costs["GENERATION_PROJECT"].isin(batteries_id),
-        "gen_storage_energy_overnight_cost",
-    ] = "."
+    gen_build_costs["gen_storage_energy_overnight_cost"] = (
+        gen_build_costs["gen_storage_energy_overnight_cost"]
+        .astype(object)
+        .where(gen_build_costs["GENERATION_PROJECT"].isin(batteries_id), ".")
+    )
 
     return gen_build_costs
 
@@ -633,15 +804,9 @@ def generation_projects_info(
     gen_project_info.loc[
         gen_project_info["technology"].isin(battery), "gen_storage_efficiency"
     ] = (gen_project_info[["Eff_Up", "Eff_Down"]].mean(axis=1) ** 2)
-    gen_project_info["gen_storage_efficiency"] = gen_project_info[
-        "gen_storage_efficiency"
-    ].fillna(".")
     gen_project_info.loc[
         gen_project_info["technology"].isin(battery), "gen_store_to_release_ratio"
     ] = 1
-    gen_project_info["gen_store_to_release_ratio"] = gen_project_info[
-        "gen_store_to_release_ratio"
-    ].fillna(".")
 
     # based on manually created dictionaries
     gen_project_info["gen_energy_source"] = gen_project_info["technology"].apply(
@@ -666,11 +831,11 @@ def generation_projects_info(
         "gen_can_provide_cap_reserves"
     ] = 1  # all ones in scenario 178. either 1 or 0
 
-    # these are blanks in scenario 178
-    gen_project_info["gen_self_discharge_rate"] = "."
-    gen_project_info["gen_discharge_efficiency"] = "."
-    gen_project_info["gen_land_use_rate"] = "."
-    gen_project_info["gen_storage_energy_to_power_ratio"] = "."
+    # these are blanks in scenario 178 (written as ".")
+    gen_project_info["gen_self_discharge_rate"] = np.nan
+    gen_project_info["gen_discharge_efficiency"] = np.nan
+    gen_project_info["gen_land_use_rate"] = np.nan
+    gen_project_info["gen_storage_energy_to_power_ratio"] = np.nan
 
     # retirement ages based on settings file still need to be updated
     gen_project_info["gen_max_age"] = gen_project_info["technology"].map(retirement_age)
@@ -740,13 +905,16 @@ def generation_projects_info(
     gen_project_info["gen_connect_cost_per_mw"] = gen_project_info[
         "gen_connect_cost_per_mw"
     ].fillna(0)
-    gen_project_info["gen_capacity_limit_mw"] = gen_project_info[
-        "gen_capacity_limit_mw"
-    ].fillna(".")
+    # missing gen_capacity_limit_mw and gen_storage_efficiency/gen_store_to_release_ratio
+    # (non-batteries) are written as "." (see output_functions.DOT_COLUMNS). A heat rate
+    # of 0 is ".", a missing heat rate stays empty.
+    heat_rate = gen_project_info["gen_full_load_heat_rate"]
+    gen_project_info["gen_full_load_heat_rate"] = heat_rate.astype(object).where(
+        heat_rate != 0, "."
+    )
 
-    gen_project_info["gen_full_load_heat_rate"] = gen_project_info[
-        "gen_full_load_heat_rate"
-    ].replace(0, ".")
+    categories = ["gen_tech", "gen_energy_source", "gen_load_zone"]
+    gen_project_info[categories] = gen_project_info[categories].astype("category")
 
     gen_project_info = gen_project_info[cols]
     return gen_project_info
@@ -765,7 +933,22 @@ def match_hydro_forced_outage_tech(x):
             return hydro_forced_outage_tech[key]
 
 
-def hydro_timeseries(existing_gen, hydro_variability, period_list):
+def hydro_timeseries_chunks(existing_gen, hydro_variability, period_list):
+    """
+    Create the hydro_timeseries table with the minimum and average flow of each hydro
+    project in each month, yielding one dataframe per period.
+    Inputs:
+        1) existing_gen: existing generators from PowerGenome
+        2) hydro_variability: hourly hydro profiles with one column per region. Profiles
+            can cover more than one (8760 hour) weather year, the monthly values are
+            then taken across all years.
+        3) period_list: the decade list
+    Output columns:
+        * hydro_project: GENERATION_PROJECT of the hydro plant (all_gen index + 1)
+        * timeseries: format: yyyy_M#
+        * hydro_min_flow_mw, hydro_avg_flow_mw: min/mean of the hourly capacity,
+            reduced by the forced outage rate (the _raw columns are before outages)
+    """
     # List of hydro technologies in technology column from existing gen
     hydro_list = [
         "Conventional Hydroelectric",
@@ -774,378 +957,272 @@ def hydro_timeseries(existing_gen, hydro_variability, period_list):
     ]
 
     # filter existing gen to just hydro technologies
-    # hydro_df = existing_gen.copy()
-    # hydro_df['index'] = hydro_df.index
-    # hydro_df = hydro_df[hydro_df['technology'].isin(hydro_list)]
-    # hydro_indx = hydro_df['index'].to_list()
-
-    # # get existing variability for the hydro technologies
-    # hydro_variability = existing_variability.copy()
-
-    # hydro_variability = hydro_variability.iloc[:, hydro_indx] # hydro hourly for 1 year
-
-    #### edit by RR
-    # filter existing gen to just hydro technologies
-    hydro_df = existing_gen.copy()
-    hydro_df["index"] = hydro_df.index
-    hydro_df = hydro_df[hydro_df["technology"].isin(hydro_list)]
-    hydro_indx = hydro_df["index"].to_list()
+    hydro_df = existing_gen.loc[existing_gen["technology"].isin(hydro_list)]
+    hydro_indx = hydro_df.index.to_numpy()
     hydro_region = hydro_df["region"].to_list()
 
-    # get existing variability for the hydro technologies
-    # hydro_variability = existing_variability.copy()
-    # hydro_variability = hydro_variability_new.copy()
-    # slice the hours to 8760
-    hydro_variability = hydro_variability.iloc[:8760]
-    # hydro_variability = hydro_variability.iloc[:, hydro_indx] # hydro hourly for 1 year
-    hydro_variability = hydro_variability.loc[:, hydro_region]
-    hydro_variability.columns = hydro_indx
-    ####
-
-    # get cap size for each hydro tech
-    hydro_Cap_Size = hydro_df["Cap_Size"].to_list()  # cap size for each hydro
-
-    # multiply cap size by hourly
-    for i in range(len(hydro_Cap_Size)):
-        hydro_variability.iloc[:, i] = hydro_variability.iloc[:, i].apply(
-            lambda x: x * hydro_Cap_Size[i]
-        )
-
-    hydro_transpose = hydro_variability.transpose()
-
-    month_hrs = [744, 672, 744, 720, 744, 720, 744, 744, 720, 744, 720, 744]
-    year_cumul = [
-        744,
-        1416,
-        2160,
-        2880,
-        3624,
-        4344,
-        5088,
-        5832,
-        6552,
-        7296,
-        8016,
-        8760,
-    ]  # cumulative hours by month
-
-    # split dataframe into months
-    M1_df = hydro_transpose.iloc[:, 0 : year_cumul[0]]
-    M2_df = hydro_transpose.iloc[:, year_cumul[0] : year_cumul[1]]
-    M3_df = hydro_transpose.iloc[:, year_cumul[1] : year_cumul[2]]
-    M4_df = hydro_transpose.iloc[:, year_cumul[2] : year_cumul[3]]
-    M5_df = hydro_transpose.iloc[:, year_cumul[3] : year_cumul[4]]
-    M6_df = hydro_transpose.iloc[:, year_cumul[4] : year_cumul[5]]
-    M7_df = hydro_transpose.iloc[:, year_cumul[5] : year_cumul[6]]
-    M8_df = hydro_transpose.iloc[:, year_cumul[6] : year_cumul[7]]
-    M9_df = hydro_transpose.iloc[:, year_cumul[7] : year_cumul[8]]
-    M10_df = hydro_transpose.iloc[:, year_cumul[8] : year_cumul[9]]
-    M11_df = hydro_transpose.iloc[:, year_cumul[9] : year_cumul[10]]
-    M12_df = hydro_transpose.iloc[:, year_cumul[10] : year_cumul[11]]
-
-    # get min and average for each month
-    month_df = [
-        M1_df,
-        M2_df,
-        M3_df,
-        M4_df,
-        M5_df,
-        M6_df,
-        M7_df,
-        M8_df,
-        M9_df,
-        M10_df,
-        M11_df,
-        M12_df,
-    ]
-    month_names = [
-        "M1",
-        "M2",
-        "M3",
-        "M4",
-        "M5",
-        "M6",
-        "M7",
-        "M8",
-        "M9",
-        "M10",
-        "M11",
-        "M12",
-    ]
-    df_list = list()
-    for i in range(len(month_df)):
-        df = pd.DataFrame(hydro_transpose.index, columns=["hydro_project"])
-        df["timeseries"] = month_names[i]
-        df["outage_rate"] = list(
-            map(match_hydro_forced_outage_tech, hydro_df["Resource"])
-        )
-        # df['hydro_min_flow_mw'] = month_df[i].min(axis=1).to_list()
-        # df['hydro_avg_flow_mw'] = month_df[i].mean(axis=1).to_list()
-        df["hydro_min_flow_mw_raw"] = month_df[i].min(axis=1).to_list()
-        df["hydro_min_flow_mw"] = df["hydro_min_flow_mw_raw"] * (1 - df["outage_rate"])
-        df["hydro_avg_flow_mw_raw"] = month_df[i].mean(axis=1).to_list()
-        df["hydro_avg_flow_mw"] = df["hydro_avg_flow_mw_raw"] * (1 - df["outage_rate"])
-        df_list.append(df)
-    hydro_final = pd.concat(df_list, axis=0)
-    # # get the index of existing gen for the hydro_project columnn (tie to GENERATION_PROJECTS)
-    # hydro_df['region_resource_cluster'] = hydro_df["region"]+ "_"+ hydro_df["Resource"]+ "_"+ hydro_df["cluster"].astype(str)
-    # hydro_index_dict = dict(zip(hydro_df['region_resource_cluster'].to_list(), hydro_df['index'].to_list()))
-    # hydro_final['hydro_project'] = hydro_final['hydro_project'].apply(lambda x: hydro_index_dict[x])
+    # hourly capacity of each hydro project (hours x projects)
+    hydro_cap = hydro_variability.loc[:, hydro_region].to_numpy(dtype="float64")
+    hydro_cap = hydro_cap * hydro_df["Cap_Size"].to_numpy(dtype="float64")
+    num_hrs = hydro_cap.shape[0]
+
+    # month of each hour, repeating the (non-leap) calendar for every weather year
+    hour_month = HOUR_MONTH[np.arange(num_hrs) % len(HOUR_MONTH)]
+
+    # reduce each run of hours in the same month, then combine the runs by month
+    starts = np.flatnonzero(np.r_[True, hour_month[1:] != hour_month[:-1]])
+    run_month = hour_month[starts]
+    missing = np.isnan(hydro_cap)
+    run_min = np.fmin.reduceat(hydro_cap, starts, axis=0)
+    run_sum = np.add.reduceat(np.where(missing, 0, hydro_cap), starts, axis=0)
+    run_count = np.add.reduceat(~missing, starts, axis=0)
+
+    num_projects = len(hydro_indx)
+    month_min = np.full((12, num_projects), np.nan)
+    month_sum = np.zeros((12, num_projects))
+    month_count = np.zeros((12, num_projects))
+    np.fmin.at(month_min, run_month, run_min)
+    np.add.at(month_sum, run_month, run_sum)
+    np.add.at(month_count, run_month, run_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        month_avg = month_sum / month_count
+    months = np.unique(run_month)
+
+    outage_rate = np.array(
+        list(map(match_hydro_forced_outage_tech, hydro_df["Resource"])), dtype=float
+    )
+
+    # one row per month and project
+    hydro_final = pd.DataFrame(
+        {
+            "hydro_project": np.tile(hydro_indx, len(months)),
+            "timeseries": np.repeat(
+                np.array([f"M{m + 1}" for m in months], dtype=object), num_projects
+            ),
+            "outage_rate": np.tile(outage_rate, len(months)),
+            "hydro_min_flow_mw_raw": month_min[months].ravel(),
+            "hydro_min_flow_mw": (month_min[months] * (1 - outage_rate)).ravel(),
+            "hydro_avg_flow_mw_raw": month_avg[months].ravel(),
+            "hydro_avg_flow_mw": (month_avg[months] * (1 - outage_rate)).ravel(),
+        },
+        index=np.tile(np.arange(num_projects), len(months)),
+    )
     # # generation_project starts wtih 1 not 0
-    hydro_final["hydro_project"] = hydro_final["hydro_project"].apply(lambda x: x + 1)
+    hydro_final["hydro_project"] = hydro_final["hydro_project"] + 1
 
-    timeseries_list = list()
     for decade in period_list:
         df2 = hydro_final.copy()
         df2["timeseries"] = decade + "_" + df2["timeseries"]
-        timeseries_list.append(df2)
-    hydro_final_df = pd.concat(timeseries_list, axis=0)
+        yield df2
 
-    return hydro_final_df
+
+def hydro_timeseries(existing_gen, hydro_variability, period_list):
+    """
+    Create the hydro_timeseries table for all periods (see hydro_timeseries_chunks).
+    """
+    return pd.concat(
+        hydro_timeseries_chunks(existing_gen, hydro_variability, period_list), axis=0
+    )
 
 
 def fuel_market_tables(fuel_prices, aeo_fuel_region_map, scenario):
     """
     Create regional_fuel_markets and zone_to_regional_fuel_market
     SWITCH does not seem to like this overlapping with fuel_cost. So all of this might be incorrect.
+    scenario can be one AEO scenario or a list of scenarios (the outputs then have a
+    scenario column).
     """
 
     # create initial regional fuel market.  Format: region - fuel
-    reg_fuel_mar_1 = fuel_prices.copy()
-    reg_fuel_mar_1 = reg_fuel_mar_1.loc[
-        reg_fuel_mar_1["scenario"] == scenario
-    ]  # use reference for now
-    reg_fuel_mar_1 = reg_fuel_mar_1.drop(
-        ["year", "price", "full_fuel_name", "scenario"], axis=1
-    )
-    reg_fuel_mar_1 = reg_fuel_mar_1.rename(columns={"region": "regional_fuel_market"})
-    reg_fuel_mar_1 = reg_fuel_mar_1[["regional_fuel_market", "fuel"]]
-
-    fuel_markets = reg_fuel_mar_1["regional_fuel_market"].unique()
-
-    # region to fuel
-    group = reg_fuel_mar_1.groupby("regional_fuel_market")
-    fuel_market_dict = {}
-    for region in fuel_markets:
-        df = group.get_group(region)
-        fuel = df["fuel"].to_list()
-        fuel = list(set(fuel))
-        fuel_market_dict[region] = fuel
+    reg_fuel_mar_1, multi_scenario = filter_scenarios(fuel_prices, scenario)
+    reg_fuel_mar_1 = reg_fuel_mar_1[["scenario", "region", "fuel"]].drop_duplicates()
 
     # create zone_regional_fuel_market
-    data = list()
-    for region in aeo_fuel_region_map.keys():
-        for i in range(len(aeo_fuel_region_map[region])):
-            ipm = aeo_fuel_region_map[region][i]
-            for fuel in fuel_market_dict[region]:
-                data.append([ipm, ipm + "-" + fuel])
-
-    zone_regional_fm = pd.DataFrame(data, columns=["load_zone", "regional_fuel_market"])
+    zone_regional_fm = fuel_region_frame(aeo_fuel_region_map).merge(
+        reg_fuel_mar_1, on="region", how="inner", sort=False
+    )
+    zone_regional_fm["regional_fuel_market"] = (
+        zone_regional_fm["load_zone"] + "-" + zone_regional_fm["fuel"]
+    )
 
     # use that to finish regional_fuel_markets
-    regional_fuel_markets = zone_regional_fm.copy()
-    regional_fuel_markets["fuel_list"] = regional_fuel_markets[
-        "regional_fuel_market"
-    ].str.split("-")
-    regional_fuel_markets["fuel"] = regional_fuel_markets["fuel_list"].apply(
-        lambda x: x[-1]
-    )
-    regional_fuel_markets = regional_fuel_markets[["regional_fuel_market", "fuel"]]
+    columns = ["scenario"] if multi_scenario else []
+    regional_fuel_markets = zone_regional_fm[columns + ["regional_fuel_market", "fuel"]]
+    zone_regional_fm = zone_regional_fm[columns + ["load_zone", "regional_fuel_market"]]
 
     return regional_fuel_markets, zone_regional_fm
 
 
+def select_days(day_of_year, order, num_days, taken=()):
+    """
+    Pick num_days days from a ranking of candidate days, skipping calendar days that
+    are already taken (the same day can show up once for every weather year).
+    Inputs:
+        1) day_of_year: day of the year (0-364) of each candidate day
+        2) order: candidate positions, best first
+        3) num_days: how many days to pick
+        4) taken: days of the year that can't be picked
+    Output: the picked days of the year, best first
+    """
+    ranked = day_of_year[order]
+    _, first = np.unique(ranked, return_index=True)
+    ranked = ranked[np.sort(first)]
+    ranked = ranked[~np.isin(ranked, list(taken))]
+    return ranked[:num_days]
+
+
 def timeseries(
-    load_curves, max_weight, avg_weight, ts_duration_of_tp, ts_num_tps
+    load_curves,
+    max_weight=None,
+    avg_weight=None,
+    ts_duration_of_tp=4,
+    ts_num_tps=6,
+    period_list=None,
+    num_peak_days=1,
+    num_typical_days=1,
 ):  # 20.2778, 283.8889
     """
-    Create the timeseries table based on REAM Scenario 178
+    Create the timeseries table based on REAM Scenario 178. For every calendar month the
+    days with the highest load summed across regions (peak days) and the days closest
+    to the mean daily load of the month (typical days) are selected.
     Input:
         1) load_curves: created using PowerGenome make(final_load_curves(pg_engine, scenario_settings[][]))
-        2) max_weight: the weight to apply to the days with highest values
-        3) avg_weight: the weight to apply to the days with average value
+            hourly load, can cover more than one (8760 hour) weather year
+        2) max_weight: the weight to apply to the peak days. If None, each peak day
+            stands for one day per year of the period.
+        3) avg_weight: the weight to apply to the typical days. If None, the typical
+            days share the rest of the days in the month.
         3) ts_duration_of_tp: how many hours should the timpoint last
         4) ts_num_tps: number of timpoints in the selected day
+        5) period_list: the decade list (defaults to 2020, 2030, 2040 and 2050)
+        6) num_peak_days, num_typical_days: number of peak and typical days per month
     Output columns:
         - TIMESERIES: format: yyyy_yyyy-mm-dd
         - ts_period: the period decade
         - ts_duration_of_tp: based on input value
         - ts_num_tps: based on input value. Should multiply to 24 with ts_duration_of_tp
-        - ts_scale_to_period: use the max&avg_weights for the average and max days in a month
-    """
-    hr_load_sum = pd.DataFrame(load_curves.sum(axis=1), columns=["sum_across_regions"])
-    num_hrs = len(load_curves.index)  # number of hours PG outputs data for in a year
-    hr_interval = round(num_hrs / 8760)
-    hr_int_list = list(range(1, int(24 / hr_interval) + 1))
-
-    yr_dates = [d.strftime("%Y%m%d") for d in pd.date_range("20200101", "20201231")]
-    leap_yr = "20200229"
-    yr_dates.remove(leap_yr)
-
-    # create initial date list for 2020
-    timestamp = list()
-    for d in range(len(yr_dates)):
-        for i in hr_int_list:
-            date_hr = yr_dates[d]
-            timestamp.append(date_hr)
-
-    timeseries = [x[:4] + "_" + x[:4] + "-" + x[4:6] + "-" + x[6:8] for x in timestamp]
-    ts_period = [x[:4] for x in timestamp]
-    timepoint_id = list(range(len(timestamp)))
-
-    column_list = ["timeseries", "ts_period"]
-    data = np.array([timeseries, ts_period]).T
-    initial_df = pd.DataFrame(data, columns=column_list, index=hr_load_sum.index)
-    initial_df = initial_df.join(hr_load_sum)
-
-    month_hrs = [744, 672, 744, 720, 744, 720, 744, 744, 720, 744, 720, 744]
-    year_cumul = [
-        744,
-        1416,
-        2160,
-        2880,
-        3624,
-        4344,
-        5088,
-        5832,
-        6552,
-        7296,
-        8016,
-        8760,
-    ]  # cumulative hours by month
-
-    # split dataframe into months (grouped by day)
-    M1_df = (initial_df.iloc[0 : year_cumul[0], :]).groupby("timeseries").sum()
-    M2_df = (
-        (initial_df.iloc[year_cumul[0] : year_cumul[1], :]).groupby("timeseries").sum()
-    )
-    M3_df = (
-        (initial_df.iloc[year_cumul[1] : year_cumul[2], :]).groupby("timeseries").sum()
-    )
-    M4_df = (
-        (initial_df.iloc[year_cumul[2] : year_cumul[3], :]).groupby("timeseries").sum()
-    )
-    M5_df = (
-        (initial_df.iloc[year_cumul[3] : year_cumul[4], :]).groupby("timeseries").sum()
-    )
-    M6_df = (
-        (initial_df.iloc[year_cumul[4] : year_cumul[5], :]).groupby("timeseries").sum()
-    )
-    M7_df = (
-        (initial_df.iloc[year_cumul[5] : year_cumul[6], :]).groupby("timeseries").sum()
-    )
-    M8_df = (
-        (initial_df.iloc[year_cumul[6] : year_cumul[7], :]).groupby("timeseries").sum()
-    )
-    M9_df = (
-        (initial_df.iloc[year_cumul[7] : year_cumul[8], :]).groupby("timeseries").sum()
-    )
-    M10_df = (
-        (initial_df.iloc[year_cumul[8] : year_cumul[9], :]).groupby("timeseries").sum()
-    )
-    M11_df = (
-        (initial_df.iloc[year_cumul[9] : year_cumul[10], :]).groupby("timeseries").sum()
-    )
-    M12_df = (
-        (initial_df.iloc[year_cumul[10] : year_cumul[11], :])
-        .groupby("timeseries")
-        .sum()
-    )
+        - ts_scale_to_period: use the max&avg_weights for the peak and typical days in a month
+    """
+    if period_list is None:
+        period_list = ["2020", "2030", "2040", "2050"]
+
+    # daily load summed across regions (days x hours)
+    hr_load_sum = load_curves.to_numpy(dtype="float64").sum(axis=1)
+    num_days = len(hr_load_sum) // 24
+    day_load = hr_load_sum[: num_days * 24].reshape(num_days, 24).sum(axis=1)
+
+    # calendar of each day, repeating the (non-leap) year for every weather year
+    calendar = pd.date_range("2021-01-01", periods=365, freq="D")
+    day_of_year = np.arange(num_days) % 365
+    day_month = calendar.month.to_numpy()[day_of_year]
+    num_weather_yrs = num_days / 365
+
+    selected_days = list()
+    selected_peak = list()
+    days_per_yr = list()  # days in the month of each selected day
+    num_selected = list()  # number of peak/typical days in the month
+    for month in np.unique(day_month):
+        days = np.flatnonzero(day_month == month)
+        load = day_load[days]
+        peak = select_days(
+            day_of_year[days], np.argsort(-load, kind="stable"), num_peak_days
+        )
+        close_to_mean = np.abs(load - load.mean())
+        typical = select_days(
+            day_of_year[days],
+            np.argsort(close_to_mean, kind="stable"),
+            num_typical_days,
+            taken=peak,
+        )
+        for picked, is_peak in ((np.sort(peak), True), (np.sort(typical), False)):
+            selected_days.extend(picked)
+            selected_peak.extend([is_peak] * len(picked))
+            days_per_yr.extend([len(days) / num_weather_yrs] * len(picked))
+        num_selected.extend([(len(peak), len(typical))] * (len(peak) + len(typical)))
+
+    selected_days = np.array(selected_days, dtype=int)
+    selected_peak = np.array(selected_peak, dtype=bool)
+    days_per_yr = np.array(days_per_yr)
+    num_peak, num_typical = np.array(num_selected, dtype=float).reshape(-1, 2).T
+
+    # share of a year of the period that each selected day stands for
+    with np.errstate(invalid="ignore", divide="ignore"):
+        peak_share = np.where(num_typical > 0, 1, days_per_yr / num_peak)
+        typical_share = (days_per_yr - num_peak) / num_typical
+    day_share = np.where(selected_peak, peak_share, typical_share)
+
+    period_yrs = np.array(period_list, dtype=int)
+    period_length = np.diff(period_yrs) if len(period_yrs) > 1 else np.array([10])
+    period_length = np.append(period_length, period_length[-1])
+
+    month_day = calendar.strftime("%m-%d").to_numpy()[selected_days]
+    df_list = list()
+    for period, length in zip(period_list, period_length):
+        ts_scale_to_period = day_share * length
+        if max_weight is not None:
+            ts_scale_to_period[selected_peak] = max_weight
+        if avg_weight is not None:
+            ts_scale_to_period[~selected_peak] = avg_weight
+        df = pd.DataFrame(
+            {
+                "timeseries": period + "_" + period + "-" + month_day,
+                "ts_period": period,
+                "ts_duration_of_tp": ts_duration_of_tp,
+                "ts_num_tps": ts_num_tps,
+                "ts_scale_to_period": ts_scale_to_period,
+            }
+        )
+        df_list.append(df)
+    timeseries_df = pd.concat(df_list)
 
-    month_df = [
-        M1_df,
-        M2_df,
-        M3_df,
-        M4_df,
-        M5_df,
-        M6_df,
-        M7_df,
-        M8_df,
-        M9_df,
-        M10_df,
-        M11_df,
-        M12_df,
-    ]
+    return timeseries_df
 
-    # find mean and max for each month, add date to a dataframe
-    timeseries_df = pd.DataFrame(
-        columns=["sum_across_regions", "timeseries", "close_to_mean"]
-    )
-    for df in month_df:
-        df["timeseries"] = df.index
-        mean = df["sum_across_regions"].mean()
-        df["close_to_mean"] = abs(df["sum_across_regions"] - mean)
-        df_mean = df.loc[df["close_to_mean"] == df["close_to_mean"].min()]
-        df_max = df.loc[df["sum_across_regions"] == df["sum_across_regions"].max()]
-        timeseries_df = timeseries_df.append(df_max)
-        timeseries_df = timeseries_df.append(df_mean)
-        timeseries_df["timeseries"] = timeseries_df.index
-
-    # add in other columns
-    timeseries_df["ts_period"] = "2020"
-    timeseries_df["ts_duration_of_tp"] = ts_duration_of_tp  # assuming 4 for now
-    timeseries_df["ts_num_tps"] = ts_num_tps  # assuming 6 for now
-    timeseries_df = timeseries_df.reset_index(drop=True)
-    timeseries_df = timeseries_df.drop(["sum_across_regions"], axis=1)
-
-    timeseries_df["ts_scale_to_period"] = None
-
-    for i in range(len(timeseries_df)):
-        if i % 2 == 0:
-            timeseries_df.loc[i, "ts_scale_to_period"] = max_weight
-    timeseries_df["ts_scale_to_period"].replace(
-        to_replace=[None], value=avg_weight, inplace=True
-    )
 
-    # add in addtional years (just replace 2020 with new year)
-    addtl_yrs = ["2030", "2040", "2050"]
-    addtl_df = pd.DataFrame(columns=timeseries_df.columns)
-    for y in addtl_yrs:
-        df = timeseries_df.copy()
-        df["ts_period"] = y
-        col1 = df["timeseries"].to_list()
-        col1 = [y + "_" + y + x[9:] for x in col1]
-        df["timeseries"] = col1
-        addtl_df = addtl_df.append(df)
-    timeseries_df = timeseries_df.append(addtl_df)
-    timeseries_df = timeseries_df[
-        [
-            "timeseries",
-            "ts_period",
-            "ts_duration_of_tp",
-            "ts_num_tps",
-            "ts_scale_to_period",
-        ]
-    ]
-    return timeseries_df
+def timestamp_cross_join(day_stamps, timestamp_interval):
+    """
+    Combine every day with every interval of the day (interval-major order, the same
+    order as appending all days for each interval).
+    Inputs:
+        1) day_stamps: day part of the timestamp, format: yyyymmdd
+        2) timestamp_interval: the hour (or hour and minute) part of the timestamp
+    Output:
+        * timestamp: object array of yyyymmdd + interval strings
+        * day_pos: position in day_stamps of each timestamp
+    """
+    day_stamps = np.asarray(day_stamps, dtype=object)
+    intervals = np.asarray(timestamp_interval, dtype=object)
+    day_pos = np.tile(np.arange(len(day_stamps)), len(intervals))
+    timestamp = day_stamps[day_pos] + np.repeat(intervals, len(day_stamps))
+    return timestamp, day_pos
 
 
-def timepoints_table(timeseries_dates, timestamp_interval):
+def timepoints_table(timeseries_dates, timestamp_interval, int_timestamp=False):
     """
     Create the timepoints SWICH input file based on REAM Scenario 178
     Inputs:
         1) timeseries_dates: timeseries dates from the timeseries table
         2) timestamp_interval: based on ts_duration_of_tp and ts_num_tps from the timeseries table.
                 Should be between 0 and 24.
+        3) int_timestamp: also add the timestamp as an integer (timestamp_int column)
     Output columns:
         * timepoints_id: ID
         * timestamp: timeseries formatted yyymmddtt where tt is in the timestamp_inverval list
         * timeseries: the timesries date from the timeseries table
     """
-    timepoint_id = list(range(1, len(timeseries_dates) + 1))
-    timestamp = [x[:4] + x[10:12] + x[13:] for x in timeseries_dates]
-
-    column_list = ["timepoint_id", "timestamp", "timeseries"]
-    timepoints_df = pd.DataFrame(columns=column_list)
-    for i in timestamp_interval:
-        timestamp_interval = [x + i for x in timestamp]
-        df_data = np.array([timepoint_id, timestamp_interval, timeseries_dates]).T
-        df = pd.DataFrame(df_data, columns=column_list)
-        timepoints_df = timepoints_df.append(df)
-
-    timepoints_df["timepoint_id"] = range(
-        1, len(timepoints_df["timeseries"].to_list()) + 1
+    timeseries_dates = np.asarray(timeseries_dates, dtype=object)
+    day_stamps = [x[:4] + x[10:12] + x[13:] for x in timeseries_dates]
+    timestamp, day_pos = timestamp_cross_join(day_stamps, timestamp_interval)
+
+    timepoints_df = pd.DataFrame(
+        {
+            "timepoint_id": np.arange(1, len(timestamp) + 1),
+            "timestamp": timestamp,
+            "timeseries": timeseries_dates[day_pos],
+        },
+        index=day_pos,
     )
+    if int_timestamp:
+        timepoints_df["timestamp_int"] = timestamp.astype(np.int64)
 
     return timepoints_df
 
@@ -1188,49 +1265,106 @@ def hydro_timepoints_table(timepoints_df):
     return hydro_timepoints
 
 
-def graph_timestamp_map_table(timeseries_df, timestamp_interval):
+def graph_timestamp_map_table(timeseries_df, timestamp_interval, int_timestamp=False):
     """
     Create the graph_timestamp_map table based on REAM Scenario 178
     Input:
         1) timeseries_df: the SWITCH timeseries table
         2) timestamp_interval:based on ts_duration_of_tp and ts_num_tps from the timeseries table.
                 Should be between 0 and 24.
+        3) int_timestamp: also add the timestamp as an integer (timestamp_int column)
     Output columns:
         * timestamp: dates based on the timeseries table
         * time_row: the period decade year based on the timestamp
         * time_column: format: yyyymmdd. Using 2012 because that is the year data is based on.
     """
 
-    timeseries_df_copy = timeseries_df.copy()
-    timeseries_df_copy = timeseries_df_copy[["timeseries", "ts_period"]]
+    timeseries = timeseries_df["timeseries"].to_numpy(dtype=object)
+    ts_period = timeseries_df["ts_period"].to_numpy()
     # reformat timeseries for timestamp
-    timeseries_df_copy["timestamp"] = timeseries_df_copy["timeseries"].apply(
-        lambda x: x[5:9] + x[10:12] + x[13:]
-    )
+    day_stamps = [x[5:9] + x[10:12] + x[13:] for x in timeseries]
+    # using 2012 for financial year
+    time_column = np.array([str(2012) + x[10:12] + x[13:15] for x in timeseries])
 
     # add in intervals to the timestamp
+    timestamp, day_pos = timestamp_cross_join(day_stamps, timestamp_interval)
     graph_timeseries_map = pd.DataFrame(
-        columns=["timeseries", "ts_period", "timestamp"]
+        {
+            "timestamp": timestamp,
+            "time_row": ts_period[day_pos],
+            "time_column": time_column[day_pos].astype(object),
+        },
+        index=timeseries_df.index[day_pos],
     )
-    for x in timestamp_interval:
-        df = timeseries_df_copy[["timeseries", "ts_period"]]
-        df["timestamp"] = timeseries_df_copy["timestamp"] + x
-        graph_timeseries_map = graph_timeseries_map.append(df)
+    if int_timestamp:
+        graph_timeseries_map["timestamp_int"] = timestamp.astype(np.int64)
 
-    # using 2012 for financial year
-    graph_timeseries_map["time_column"] = graph_timeseries_map["timeseries"].apply(
-        lambda x: str(2012) + x[10:12] + x[13:15]
-    )
+    return graph_timeseries_map
 
-    graph_timeseries_map = graph_timeseries_map.drop(["timeseries"], axis=1)
-    graph_timeseries_map = graph_timeseries_map.rename(
-        columns={"ts_period": "time_row"}
-    )
-    graph_timeseries_map = graph_timeseries_map[
-        ["timestamp", "time_row", "time_column"]
-    ]
 
-    return graph_timeseries_map
+def loads_table_chunks(
+    load_curves,
+    timepoints_timestamp,
+    timepoints_dict,
+    period_list,
+    chunk_rows=500000,
+):
+    """
+    Create the loads table in chunks of about chunk_rows rows (one block of load zones
+    of one period at a time).
+    Inputs:
+        load_curves: from powergenome
+        timepoints_timestamp: the timestamps in timepoints
+        timepoints_dict: to go from timestamp to timepoint
+        period_list: the decade list
+        chunk_rows: the number of rows to aim for in each chunk
+    Output columns
+        * year_hour: hour of the year from load_curves
+        * LOAD_ZONE: the IPM regions (categorical)
+        * zone_demand_mw: based on load_curves
+        * timestamp: from timepoints, as an integer (yyyymmddhh)
+        * TIMEPOINT: from timepoints (int32)
+    """
+
+    hours = load_curves.index.to_numpy()
+    if np.issubdtype(hours.dtype, np.integer):
+        hours = int_ids(hours)
+    zones = load_curves.columns.to_numpy()
+    demand = load_curves.to_numpy()  # hours x zones
+
+    # convert hour of the year to the timestamp format (without the year)
+    start = pd.to_datetime("2021-01-01 0:00")  # use 2021 due to 2020 being a leap year
+    hour_suffix = (start + pd.to_timedelta(hours, unit="H")).strftime("%m%d%H")
+
+    # for each period find the hours that have a timepoint, then take those hours
+    # from every load zone
+    for p in period_list:
+        timestamp = pd.Series(p + hour_suffix)
+        keep = timestamp.isin(timepoints_timestamp).to_numpy()
+        hour_idx = np.flatnonzero(keep)
+        timepoint = int_ids(timestamp[keep].map(timepoints_dict))
+        timestamp = timestamp[keep].to_numpy().astype(np.int64)
+
+        n_hours = len(hour_idx)
+        zones_per_chunk = max(1, chunk_rows // max(n_hours, 1))
+        for z in range(0, max(len(zones), 1), zones_per_chunk):
+            n_zones = len(zones[z : z + zones_per_chunk])
+            zone_codes = np.arange(z, z + n_zones, dtype=np.int32)
+            df = pd.DataFrame(
+                {
+                    "year_hour": np.tile(hours[hour_idx], n_zones),
+                    # all chunks have every zone as a category, so they concatenate
+                    # into one categorical column
+                    "LOAD_ZONE": pd.Categorical.from_codes(
+                        np.repeat(zone_codes, n_hours), categories=zones
+                    ),
+                    "zone_demand_mw": demand[hour_idx, z : z + n_zones].T.ravel(),
+                    "timestamp": np.tile(timestamp, n_zones),
+                    "TIMEPOINT": np.tile(timepoint, n_zones),
+                },
+                index=np.tile(hour_idx, n_zones),
+            )
+            yield df
 
 
 def loads_table(load_curves, timepoints_timestamp, timepoints_dict, period_list):
@@ -1249,110 +1383,44 @@ def loads_table(load_curves, timepoints_timestamp, timepoints_dict, period_list)
         loads_with_hour_year: include hour year so it is easier to do variable_capacity_factors
     """
 
-    loads_initial = pd.DataFrame(columns=["year_hour", "LOAD_ZONE", "zone_demand_mw"])
-    hours = load_curves.index.to_list()
-    cols = load_curves.columns.to_list()
-
-    # add load zone for each hour of the year, adding in the load_curve values for each hour
-    for c in cols:
-        df = pd.DataFrame()
-        df["year_hour"] = hours
-        df["LOAD_ZONE"] = c
-        df["zone_demand_mw"] = load_curves[c].to_list()
-        loads_initial = loads_initial.append(df)
-
-    # convert timepoints to date of the year
-    start = pd.to_datetime("2021-01-01 0:00")  # use 2021 due to 2020 being a leap year
-    loads_initial["date"] = loads_initial["year_hour"].apply(
-        lambda x: start + pd.to_timedelta(x, unit="H")
-    )
-    # reformat to timestamp format
-    loads_initial["reformat"] = loads_initial["date"].apply(
-        lambda x: x.strftime("%Y%m%d%H")
+    loads = pd.concat(
+        loads_table_chunks(
+            load_curves, timepoints_timestamp, timepoints_dict, period_list
+        )
     )
-    loads_initial["reformat"] = loads_initial["reformat"].astype(str)
-    # create timestamp
-    date_list = loads_initial["reformat"].to_list()
-
-    # loop through for each period
-    df_list = list()
-    for p in period_list:
-        df = loads_initial.copy()
-        updated_dates = [p + x[4:] for x in date_list]
-        df["timestamp"] = updated_dates
-        df_list.append(df)
-    loads = pd.concat(df_list)
 
-    # filter to correct timestamps for timepoints
-    loads = loads[loads["timestamp"].isin(timepoints_timestamp)]
-    loads["TIMEPOINT"] = loads["timestamp"].apply(lambda x: timepoints_dict[x])
     loads_with_year_hour = loads[["timestamp", "TIMEPOINT", "year_hour"]]
     loads = loads[["LOAD_ZONE", "TIMEPOINT", "zone_demand_mw"]]
 
     return loads, loads_with_year_hour
 
 
-def variable_capacity_factors_table(
-    all_gen_variability, year_hour, timepoints_dict, all_gen
+def variable_capacity_factors_chunks(
+    all_gen_variability,
+    year_hour,
+    timepoints_dict,
+    all_gen,
+    period_list=None,
+    chunk_rows=500000,
 ):
     """
+    Create the variable_capacity_factors table in chunks of about chunk_rows rows (one
+    block of hours of one period at a time).
     Inputs
         all_gen_variability: from powergenome
         year_hour: the hour of the year that has a timepoint (based on loads)
         timepoints_dict: convert timestamp to timepoint
         all_gen: from powergenome
+        period_list: the decade list (defaults to 2020, 2030, 2040 and 2050)
+        chunk_rows: the number of rows to aim for in each chunk
     Output:
-        GENERATION_PROJECT: based on all_gen index
+        GENERATION_PROJECT: based on all_gen index (int32)
             the plants here should only be the ones with gen_is_variable =True
-        timepoint: based on timepoints
+        timepoint: based on timepoints (int32)
         gen_max_capacity_factor: based on all_gen_variability
     """
-
-    v_capacity_factors = all_gen_variability.copy().transpose()
-    v_capacity_factors["GENERATION_PROJECT"] = v_capacity_factors.index
-    v_c_f = v_capacity_factors.melt(
-        id_vars="GENERATION_PROJECT",
-        var_name="year_hour",
-        value_name="gen_max_capacity_factor",
-    )
-    # reduce variability to just the hours of the year that have a timepoint
-    v_c_f = v_c_f[v_c_f["year_hour"].isin(year_hour)]
-
-    mod_vcf = v_c_f.copy()
-    # get the dates from hour of the year
-    start = pd.to_datetime("2021-01-01 0:00")  # 2020 is a leap year
-    mod_vcf["date"] = mod_vcf["year_hour"].apply(
-        lambda x: start + pd.to_timedelta(x, unit="H")
-    )
-    mod_vcf["reformat"] = mod_vcf["date"].apply(lambda x: x.strftime("%Y%m%d%H"))
-    mod_vcf["reformat"] = mod_vcf["reformat"].astype(str)
-    date_list = mod_vcf["reformat"].to_list()
-    # change 2021 to correct period year/decade
-    # to get the timestamp
-    updated_dates20 = ["2020" + x[4:] for x in date_list]
-    updated_dates30 = ["2030" + x[4:] for x in date_list]
-    updated_dates40 = ["2040" + x[4:] for x in date_list]
-    updated_dates50 = ["2050" + x[4:] for x in date_list]
-    mod_vcf1 = mod_vcf.copy()
-    mod_vcf2 = mod_vcf.copy()
-    mod_vcf3 = mod_vcf.copy()
-    mod_vcf4 = mod_vcf.copy()
-    mod_vcf1["timestamp"] = updated_dates20
-    mod_vcf2["timestamp"] = updated_dates30
-    mod_vcf3["timestamp"] = updated_dates40
-    mod_vcf4["timestamp"] = updated_dates50
-    # go from timestamp to timepoint
-    mod_vcf1["timepoint"] = mod_vcf1["timestamp"].apply(lambda x: timepoints_dict[x])
-    mod_vcf2["timepoint"] = mod_vcf2["timestamp"].apply(lambda x: timepoints_dict[x])
-    mod_vcf3["timepoint"] = mod_vcf3["timestamp"].apply(lambda x: timepoints_dict[x])
-    mod_vcf4["timepoint"] = mod_vcf4["timestamp"].apply(lambda x: timepoints_dict[x])
-    # get final columns
-    mod_vcf1.drop(["year_hour", "date", "reformat", "timestamp"], axis=1, inplace=True)
-    mod_vcf2.drop(["year_hour", "date", "reformat", "timestamp"], axis=1, inplace=True)
-    mod_vcf3.drop(["year_hour", "date", "reformat", "timestamp"], axis=1, inplace=True)
-    mod_vcf4.drop(["year_hour", "date", "reformat", "timestamp"], axis=1, inplace=True)
-    # bring all decades together
-    var_cap_fac = pd.concat([mod_vcf1, mod_vcf2, mod_vcf3, mod_vcf4], ignore_index=True)
+    if period_list is None:
+        period_list = ["2020", "2030", "2040", "2050"]
 
     # only get all_gen plants that are wind or solar
     technology = all_gen["technology"].to_list()
@@ -1361,37 +1429,73 @@ def variable_capacity_factors_table(
         return [n for n in list1 if any(m in n for m in list2)]
 
     wind_solar = set(Filter(technology, ["Wind", "Solar"]))
-    all_gen.loc[all_gen["technology"].isin(wind_solar), "gen_is_variable"] = True
-    all_gen = all_gen[all_gen["gen_is_variable"] == True]
+    is_variable = all_gen["technology"].isin(wind_solar)
+    if "gen_is_variable" in all_gen.columns:
+        is_variable = is_variable | (all_gen["gen_is_variable"] == True)
+    variable_gen = all_gen.loc[is_variable]
 
     # get the correct GENERATION_PROJECT instead of region_resource_cluster from variability table
-    all_gen = all_gen.copy()
-    all_gen["region_resource_cluster"] = (
-        all_gen["region"]
+    region_resource_cluster = (
+        variable_gen["region"]
         + "_"
-        + all_gen["Resource"]
+        + variable_gen["Resource"]
         + "_"
-        + all_gen["cluster"].astype(str)
-    )
-    all_gen["gen_id"] = all_gen.index
-    all_gen_convert = dict(
-        zip(all_gen["region_resource_cluster"].to_list(), all_gen["gen_id"].to_list())
-    )
+        + variable_gen["cluster"].astype(str)
+    )
+    all_gen_convert = pd.Series(variable_gen.index, index=region_resource_cluster)
+    all_gen_convert = all_gen_convert[~all_gen_convert.index.duplicated(keep="last")]
+
+    # reduce variability to the variable generators and the hours of the year that
+    # have a timepoint before reshaping
+    gen_cols = np.flatnonzero(all_gen_variability.columns.isin(all_gen_convert.index))
+    hours = all_gen_variability.index
+    hour_rows = np.flatnonzero(hours.isin(year_hour))
+    cap_factors = all_gen_variability.to_numpy()[np.ix_(hour_rows, gen_cols)]
+    gen_project = int_ids(
+        all_gen_convert[all_gen_variability.columns[gen_cols]].to_numpy() + 1
+    )  # switch error - can't be 0?
+
+    # get the dates from hour of the year
+    start = pd.to_datetime("2021-01-01 0:00")  # 2020 is a leap year
+    hour_suffix = (
+        start + pd.to_timedelta(hours[hour_rows].to_numpy(), unit="H")
+    ).strftime("%m%d%H")
+
+    # one block per period, ordered by hour and then generator
+    n_gens = len(gen_cols)
+    hours_per_chunk = max(1, chunk_rows // max(n_gens, 1))
+    for p in period_list:
+        timestamp = pd.Series(p + hour_suffix)
+        timepoint = timestamp.map(timepoints_dict)
+        if timepoint.isna().any():
+            raise KeyError(timestamp[timepoint.isna()].iloc[0])
+        timepoint = int_ids(timepoint)
+        for h in range(0, max(len(hour_rows), 1), hours_per_chunk):
+            chunk_hours = slice(h, h + hours_per_chunk)
+            n_hours = len(timepoint[chunk_hours])
+            df = pd.DataFrame(
+                {
+                    "GENERATION_PROJECT": np.tile(gen_project, n_hours),
+                    "timepoint": np.repeat(timepoint[chunk_hours], n_gens),
+                    "gen_max_capacity_factor": cap_factors[chunk_hours].ravel(),
+                }
+            )
+            yield df
 
-    reg_res_cl = all_gen["region_resource_cluster"].to_list()
-    var_cap_fac = var_cap_fac[var_cap_fac["GENERATION_PROJECT"].isin(reg_res_cl)]
 
-    var_cap_fac["GENERATION_PROJECT"] = var_cap_fac["GENERATION_PROJECT"].apply(
-        lambda x: all_gen_convert[x]
+def variable_capacity_factors_table(
+    all_gen_variability, year_hour, timepoints_dict, all_gen, period_list=None
+):
+    """
+    Create the variable_capacity_factors table for all periods (see
+    variable_capacity_factors_chunks).
+    """
+    var_cap_fac = pd.concat(
+        variable_capacity_factors_chunks(
+            all_gen_variability, year_hour, timepoints_dict, all_gen, period_list
+        ),
+        ignore_index=True,
     )
-    # filter to final columns
-    var_cap_fac = var_cap_fac[
-        ["GENERATION_PROJECT", "timepoint", "gen_max_capacity_factor"]
-    ]
-    var_cap_fac["GENERATION_PROJECT"] = (
-        var_cap_fac["GENERATION_PROJECT"] + 1
-    )  # switch error - can't be 0?
-    #     vcf['GENERATION_PROJECT'] = vcf['GENERATION_PROJECT'].astype(str)
 
     return var_cap_fac
 
@@ -1564,12 +1668,18 @@ def balancing_areas(
             * Load_zone: IPM region
             * balancing_area
     """
+    from pudl_access import plant_ids, read_pudl_table
+
     # get table from PUDL that has  balancing_authority_code_eia
-    plants_entity_eia = pd.read_sql_table("plants_entity_eia", pudl_engine)
     # dataframe with only balancing_authority_code_eia and plant_id_eia
-    plants_entity_eia = plants_entity_eia[
-        ["balancing_authority_code_eia", "plant_id_eia"]
-    ]
+    # only the plants in all_gen are looked up
+    entity_columns = ["balancing_authority_code_eia", "plant_id_eia"]
+    plants_entity_eia = read_pudl_table(
+        pudl_engine,
+        "plants_entity_eia",
+        entity_columns,
+        plant_ids=plant_ids(all_gen),
+    )
     # create a dictionary that has plant_id_eia as key and the balancing authority as value
     plants_entity_eia_dict = plants_entity_eia.set_index("plant_id_eia").T.to_dict(
         "list"
@@ -0,0 +1,349 @@
+"""
+Local on-disk cache for tables pulled from PUDL and frames built by PowerGenome.
+
+PUDL tables are stored as Parquet files in a cache folder. Each file is keyed on
+a fingerprint of the PUDL database file (path, modification time and size) and the
+query parameters, so any change to the database or the query creates a new entry.
+Generator frames from GeneratorClusters are kept in memory for the current run and
+pickled to the same folder, keyed on the settings that affect generator clustering.
+Other inputs that are slow to parse (e.g. the EIA-860 workbooks, see eia860.py) are
+stored with cached_frame under a hash of their source file.
+The least recently used files are removed once the folder grows past a size limit.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from urllib.parse import unquote
+
+# pandas is imported inside the functions that use it, so that importing this
+# module (e.g. for the pg_to_switch CLI) stays fast
+
+DEFAULT_CACHE_FOLDER = Path(
+    os.environ.get("PG_TO_SWITCH_CACHE", Path.home() / ".cache" / "pg_to_switch")
+)
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024**3
+
+CACHE_SUFFIXES = (".parquet", ".pkl")
+
+# Settings that only change policies, demand, transmission, time reduction or output
+# files. Cases that differ only in these keys share the same generator frames. Fuel
+# settings (aeo_fuel_*, eia_series_*, eia_aeo_year, carbon_tax, fuel_emission_factors)
+# stay in the hash, since create_all_generators labels and prices fuels with them.
+NON_GENERATOR_SETTINGS = {
+    "case_id_description_fn",
+    "scenario_definitions_fn",
+    "demand_segments_fn",
+    "emission_policies_fn",
+    "genx_settings_folder",
+    "reserves_fn",
+    "reduce_time_domain",
+    "include_peak_day",
+    "demand_weight_factor",
+    "avg_distribution_loss",
+    "tx_expansion_per_period",
+    "cap_res_network_derate_default",
+    "regional_capacity_reserves",
+    "MinCapReq",
+    "default_load_year",
+    "regular_load_growth_start_year",
+    "growth_scenario",
+    "historical_load_region_maps",
+    "future_load_region_map",
+    "alt_growth_rate",
+    "regional_load_fn",
+    "regional_load_includes_demand_response",
+}
+NON_GENERATOR_SETTINGS_PREFIXES = ("time_domain_",)
+
+_generator_frames = {}
+_file_hashes = {}
+
+_cache_settings = {
+    "folder": DEFAULT_CACHE_FOLDER,
+    "enabled": True,
+    "max_bytes": DEFAULT_CACHE_MAX_BYTES,
+}
+
+
+def configure_cache(folder=None, enabled=True, max_bytes=None):
+    """
+    Set the cache folder, turn the cache on/off, and set the size limit in bytes.
+    Arguments that are None keep their default values.
+    """
+    _cache_settings["folder"] = Path(folder) if folder else DEFAULT_CACHE_FOLDER
+    _cache_settings["enabled"] = enabled
+    _cache_settings["max_bytes"] = max_bytes or DEFAULT_CACHE_MAX_BYTES
+
+
+def cache_config():
+    """
+    Return the current cache settings as a dictionary that can be passed back to
+    configure_cache (e.g. in a worker process).
+    """
+    return dict(_cache_settings)
+
+
+def sqlite_fingerprint(engine):
+    """
+    Identify the contents of a sqlite database file by its path, modification time
+    and size. Returns None if the engine is not backed by a sqlite file.
+    """
+    url = engine.url
+    if not url.drivername.startswith("sqlite") or not url.database:
+        return None
+    database = url.database
+    if database.startswith("file:"):
+        # uri filename, e.g. from pudl_access.read_only_engine
+        database = unquote(database[len("file:") :])
+    path = Path(database)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return {
+        "path": str(path.resolve()),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def cache_key(*parts):
+    """
+    Create a stable hash from json-serializable parts (dict keys are sorted).
+    """
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _cache_files(folder, name=None):
+    pattern = f"{name}-*" if name else "*"
+    return [
+        p
+        for p in Path(folder).glob(pattern)
+        if p.suffix in CACHE_SUFFIXES and p.is_file()
+    ]
+
+
+def evict_cache(folder=None, max_bytes=None):
+    """
+    Remove the least recently used cache files until the folder is below max_bytes.
+    """
+    folder = Path(folder or _cache_settings["folder"])
+    max_bytes = max_bytes or _cache_settings["max_bytes"]
+    files = []
+    for p in _cache_files(folder):
+        try:
+            stat = p.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, p))
+    total = sum(size for _, size, _ in files)
+    for _, size, p in sorted(files, key=lambda f: f[0]):
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+
+
+def clear_cache(folder=None, name=None):
+    """
+    Delete cached tables. If name is given only entries for that table are removed.
+    """
+    folder = Path(folder or _cache_settings["folder"])
+    if name in (None, "generator_frames"):
+        _generator_frames.clear()
+    if not folder.exists():
+        return
+    for p in _cache_files(folder, name):
+        p.unlink(missing_ok=True)
+
+
+def cached_sql_frame(engine, name, params, read_func):
+    """
+    Return a PUDL table pull from the local cache, running read_func and storing the
+    result on a cache miss.
+    Inputs:
+        * engine: the sqlalchemy engine that read_func queries
+        * name: name of the table/query, used as the file name prefix
+        * params: json-serializable query parameters (e.g. data_years, columns)
+        * read_func: function without arguments that returns the dataframe
+    Output:
+        the dataframe from read_func (or its cached copy)
+    """
+    fingerprint = sqlite_fingerprint(engine)
+    if fingerprint is None:
+        return read_func()
+    return cached_frame(name, cache_key(name, fingerprint, params), read_func)
+
+
+def file_hash(path, chunk_size=1024**2):
+    """
+    sha256 of the contents of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_frame(name, key, read_func):
+    """
+    Return a dataframe from the Parquet file of name and key in the cache folder,
+    running read_func and storing the result on a cache miss.
+    Inputs:
+        * name: used as the file name prefix
+        * key: hash of everything the dataframe depends on (e.g. from cache_key)
+        * read_func: function without arguments that returns the dataframe
+    Output:
+        the dataframe from read_func (or its cached copy)
+    """
+    import pandas as pd
+
+    if not _cache_settings["enabled"]:
+        return read_func()
+
+    folder = Path(_cache_settings["folder"])
+    path = folder / f"{name}-{key[:24]}.parquet"
+    if path.exists():
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # mark as recently used for eviction
+            return df
+        except (ImportError, OSError, TypeError, ValueError):
+            pass
+
+    df = read_func()
+    # write to a temporary file first so parallel runs never see partial files
+    tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    try:
+        folder.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(tmp_path, index=True)
+        os.replace(tmp_path, path)
+        evict_cache(folder)
+    except (ImportError, OSError, TypeError, ValueError):
+        # no parquet engine installed or the frame can't be stored; run uncached
+        tmp_path.unlink(missing_ok=True)
+    return df
+
+
+def _setting_strings(value):
+    if isinstance(value, (str, Path)):
+        yield str(value)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _setting_strings(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _setting_strings(v)
+
+
+def _cached_file_hash(path):
+    # hashes are kept for the rest of the run, keyed on the file's mtime and size
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        _file_hashes[key] = file_hash(path)
+    return _file_hashes[key]
+
+
+def input_file_hashes(settings):
+    """
+    Hash the files that settings refer to. Setting values (also inside lists and
+    dictionaries) that name an existing file or folder, either absolute or relative to
+    settings["input_folder"], are included. Folders are hashed file by file.
+    Output:
+        dictionary of {file path: sha256}
+    """
+    input_folder = Path(settings.get("input_folder") or ".").resolve()
+    files = set()
+    for key, value in settings.items():
+        if key == "input_folder":
+            continue
+        for text in _setting_strings(value):
+            try:
+                path = (input_folder / text).resolve()
+                if path == input_folder or not path.exists():
+                    continue
+            except (OSError, ValueError):
+                # not a usable path (e.g. a long description)
+                continue
+            if path.is_dir():
+                files.update(p for p in path.rglob("*") if p.is_file())
+            else:
+                files.add(path)
+    return {str(p): _cached_file_hash(p) for p in sorted(files)}
+
+
+def generator_settings_hash(settings, pudl_engine, pg_engine):
+    """
+    Hash the settings that affect GeneratorClusters (everything except policy,
+    demand, transmission and output settings), the contents of the input files that
+    these settings refer to, and the fingerprints of the PUDL and PowerGenome (ATB
+    costs, heat rates) databases.
+    """
+    generator_settings = {
+        key: value
+        for key, value in settings.items()
+        if key not in NON_GENERATOR_SETTINGS
+        and not key.startswith(NON_GENERATOR_SETTINGS_PREFIXES)
+    }
+    return cache_key(
+        generator_settings,
+        sqlite_fingerprint(pudl_engine),
+        sqlite_fingerprint(pg_engine),
+        input_file_hashes(generator_settings),
+    )
+
+
+def _copy_frames(frames):
+    return {name: df.copy() for name, df in frames.items()}
+
+
+def load_generator_frames(key):
+    """
+    Return copies of the generator frames stored under key (from memory first, then
+    from disk), or None if they have not been built yet.
+    """
+    import pandas as pd
+
+    if not _cache_settings["enabled"]:
+        return None
+    if key in _generator_frames:
+        return _copy_frames(_generator_frames[key])
+
+    path = Path(_cache_settings["folder"]) / f"generator_frames-{key[:24]}.pkl"
+    if not path.exists():
+        return None
+    try:
+        frames = pd.read_pickle(path)
+        os.utime(path)  # mark as recently used for eviction
+    except (OSError, EOFError, ValueError, AttributeError, ImportError):
+        return None
+    _generator_frames[key] = frames
+    return _copy_frames(frames)
+
+
+def store_generator_frames(key, frames):
+    """
+    Keep generator frames in memory for the rest of the run and pickle them to the
+    cache folder for later runs.
+    """
+    import pandas as pd
+
+    if not _cache_settings["enabled"]:
+        return
+    _generator_frames[key] = _copy_frames(frames)
+
+    folder = Path(_cache_settings["folder"])
+    path = folder / f"generator_frames-{key[:24]}.pkl"
+    tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    try:
+        folder.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle(frames, tmp_path)
+        os.replace(tmp_path, path)
+        evict_cache(folder)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,129 @@
+"""
+Generator tables of the EIA-860 workbooks (3_1_Generator_Y<year>.xlsx).
+
+Parsing a workbook with openpyxl takes tens of seconds. read_generator_sheet converts
+a sheet once into a typed Parquet file in the local cache (see data_cache), keyed on
+the sha256 of the workbook and the sheet layout, and keeps only the columns that
+gen_build_predetermined uses. Later runs load the Parquet file. A new or updated
+workbook (e.g. another EIA-860 year) has a different hash and is converted on its
+first use. The cache can be filled ahead of a run with
+
+    python eia860.py 3_1_Generator_Y2020.xlsx 3_1_Generator_Y2021.xlsx
+
+Form EIA-860 Detailed Data with Previous Form Data (EIA-860A/860B),
+https://www.eia.gov/electricity/data/eia860/
+"""
+
+from pathlib import Path
+from typing import List
+
+import typer
+
+from data_cache import cache_key, cached_frame, file_hash
+from instrumentation import stage
+
+# The sheets of a generator workbook (by position, the first row is a title) and the
+# columns kept from each one, renamed to the names used by gen_build_predetermined.
+# Years are stored as nullable integers and generator ids as strings.
+GENERATOR_SHEETS = {
+    "operable": {
+        "sheet_name": 0,
+        "header": 1,
+        "columns": {
+            "Plant Code": "plant_id_eia",
+            "Generator ID": "generator_id",
+            "Operating Year": "Operating Year",
+        },
+        "years": ["Operating Year"],
+    },
+    "proposed": {
+        "sheet_name": 1,
+        "header": 1,
+        "columns": {
+            "Plant Code": "plant_id_eia",
+            "Generator ID": "generator_id",
+            "Effective Year": "planned_operating_year",
+        },
+        "years": ["planned_operating_year"],
+    },
+}
+
+
+def generator_workbook(year, folder="."):
+    """
+    Path of the EIA-860 generator workbook of a year, as it is named in the EIA zip
+    file.
+    """
+    return Path(folder) / f"3_1_Generator_Y{year}.xlsx"
+
+
+def _parse_sheet(workbook, sheet):
+    import pandas as pd
+
+    from conversion_functions import id_strings, to_year
+
+    layout = GENERATOR_SHEETS[sheet]
+    df = pd.read_excel(
+        workbook,
+        sheet_name=layout["sheet_name"],
+        header=layout["header"],
+        usecols=list(layout["columns"]),
+    ).rename(columns=layout["columns"])
+    df = df[list(layout["columns"].values())]
+    # notes at the bottom of the sheet have no plant
+    df["plant_id_eia"] = pd.to_numeric(df["plant_id_eia"], errors="coerce")
+    df = df.loc[df["plant_id_eia"].notna()].reset_index(drop=True)
+    df["plant_id_eia"] = df["plant_id_eia"].astype("int64")
+    df["generator_id"] = id_strings(df["generator_id"])
+    for c in layout["years"]:
+        df[c] = to_year(df[c])
+    return df
+
+
+def read_generator_sheet(workbook, sheet):
+    """
+    Read a sheet of an EIA-860 generator workbook through the local cache.
+    Inputs:
+        * workbook: path of the 3_1_Generator_Y<year>.xlsx file
+        * sheet: "operable" or "proposed" (see GENERATOR_SHEETS)
+    Output:
+        dataframe with plant_id_eia, generator_id and the year column of the sheet
+    """
+    if sheet not in GENERATOR_SHEETS:
+        raise ValueError(
+            f"unknown sheet '{sheet}', the sheets are: {', '.join(GENERATOR_SHEETS)}"
+        )
+    workbook = Path(workbook)
+    with stage(f"read eia860 {sheet}") as record:
+        record["cached"] = True
+
+        def parse():
+            record["cached"] = False
+            return _parse_sheet(workbook, sheet)
+
+        key = cache_key(file_hash(workbook), sheet, GENERATOR_SHEETS[sheet])
+        df = cached_frame(f"eia860_{sheet}", key, parse)
+        record["rows"] = len(df)
+    return df
+
+
+def main(
+    workbooks: List[Path] = typer.Argument(
+        ..., help="EIA-860 generator workbooks (3_1_Generator_Y<year>.xlsx)"
+    ),
+):
+    """Convert the sheets of EIA-860 generator workbooks into the local cache
+
+    Parameters
+    ----------
+    workbooks : List[Path]
+        Paths of the workbooks. Sheets that are already cached are not read again.
+    """
+    for workbook in workbooks:
+        for sheet in GENERATOR_SHEETS:
+            df = read_generator_sheet(workbook, sheet)
+            print(f"{workbook.name} {sheet}: {len(df)} generators")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,274 @@
+"""
+Lightweight timing and memory records for the named stages of a run.
+
+Each stage records wall time, CPU time, the process peak RSS (and how much it grew
+during the stage), the tracemalloc peak when tracing is turned on, and optionally the
+number of output rows. Recording a stage costs a few microseconds, so this is always
+on. Frequent small operations (e.g. database statements) are summed per name with
+count_stage instead of creating a record each. Records are kept per process; worker
+processes return theirs with the case status.
+
+Stages can run at the same time on several threads (e.g. the pipeline stages of a case
+with --table-jobs). CPU time is measured per thread, and a stage includes the CPU time
+of the stages that other threads ran inside it (see inherit_stages). The tracemalloc
+peak covers the whole process, so it is left empty for stages that overlapped a stage
+on another thread (these records have "concurrent" set).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+RUN_MANIFEST_FN = "run_manifest.json"
+
+_stages = []
+# {(case_id, name): record} of the stages summed by count_stage
+_counted = {}
+_lock = threading.Lock()
+_local = threading.local()
+_current = {"case_id": None}
+# {id(record): record} of the stages that are running on any thread
+_open = {}
+
+
+def max_rss_mb():
+    """
+    Peak resident set size of this process in MB (None if it can't be measured).
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+@contextmanager
+def case(case_id):
+    """
+    Attribute the stages recorded inside the block to case_id.
+    """
+    previous = _current["case_id"]
+    _current["case_id"] = case_id
+    try:
+        yield
+    finally:
+        _current["case_id"] = previous
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def open_stages():
+    """
+    The stages running on this thread, outermost first, to pass to inherit_stages in
+    another thread.
+    """
+    return list(_stack())
+
+
+@contextmanager
+def inherit_stages(parents):
+    """
+    Treat the stages recorded inside the block (on a worker thread) as running inside
+    parents, the open_stages of the thread that started the work. They are then not
+    counted as overlapping their parents, and their CPU time is added to the parents.
+    """
+    previous = getattr(_local, "stack", None)
+    _local.stack = list(parents)
+    try:
+        yield
+    finally:
+        _local.stack = previous
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Record the time and memory of the code inside the block as a named stage. The
+    yielded record is a dictionary; set record["rows"] to store an output row count.
+    """
+    record = {
+        "case_id": _current["case_id"],
+        "stage": name,
+        "pid": os.getpid(),
+        "rows": rows,
+    }
+    parents = _stack()
+    entry = {
+        "record": record,
+        "thread": threading.get_ident(),
+        "traced": 0,
+        "thread_cpu": 0.0,
+    }
+    ancestors = {id(p["record"]) for p in parents}
+    tracing = tracemalloc.is_tracing()
+    with _lock:
+        overlapping = [r for key, r in _open.items() if key not in ancestors]
+        for r in overlapping:
+            r["concurrent"] = True
+        record["concurrent"] = bool(overlapping)
+        _open[id(record)] = record
+        if tracing:
+            traced_start, peak = tracemalloc.get_traced_memory()
+            if parents:
+                # keep the peak of the enclosing stage before resetting it
+                parents[-1]["traced"] = max(parents[-1]["traced"], peak)
+            # the peak is process wide, other running stages still need theirs
+            if not overlapping:
+                tracemalloc.reset_peak()
+    parents.append(entry)
+    rss_start = max_rss_mb()
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.thread_time() - cpu_start + entry["thread_cpu"]
+        rss_end = max_rss_mb()
+        record["max_rss_mb"] = rss_end
+        record["rss_growth_mb"] = rss_end - rss_start if rss_end is not None else None
+        parents.pop()
+        with _lock:
+            del _open[id(record)]
+            if parents and parents[-1]["thread"] != entry["thread"]:
+                # the parent's own CPU time is measured on its thread
+                parents[-1]["thread_cpu"] += record["cpu_s"]
+            record["traced_peak_mb"] = None
+            if tracing and tracemalloc.is_tracing():
+                # nested stages reset the peak, so keep the largest peak seen inside
+                peak = max(tracemalloc.get_traced_memory()[1], entry["traced"])
+                if not record["concurrent"]:
+                    record["traced_peak_mb"] = (peak - traced_start) / 1024**2
+                if parents:
+                    parents[-1]["traced"] = max(parents[-1]["traced"], peak)
+            _stages.append(record)
+
+
+def add_stage(name, wall_s, cpu_s, rows=None, **info):
+    """
+    Record a stage that was timed elsewhere (e.g. a database query that is spread
+    over several calls). Memory fields are left empty.
+    """
+    record = {
+        "case_id": _current["case_id"],
+        "stage": name,
+        "pid": os.getpid(),
+        "rows": rows,
+        **info,
+        "wall_s": wall_s,
+        "cpu_s": cpu_s,
+        "max_rss_mb": None,
+        "rss_growth_mb": None,
+        "traced_peak_mb": None,
+    }
+    with _lock:
+        _stages.append(record)
+    return record
+
+
+def count_stage(name, wall_s, cpu_s, rows=0):
+    """
+    Add one call to the totals of a stage that is summed instead of recorded each
+    time. pop_stages returns one record per case and name, with the number of calls
+    and the total wall time, CPU time and rows.
+    """
+    key = (_current["case_id"], name)
+    with _lock:
+        record = _counted.get(key)
+        if record is None:
+            record = _counted[key] = {
+                "case_id": key[0],
+                "stage": name,
+                "pid": os.getpid(),
+                "rows": 0,
+                "calls": 0,
+                "wall_s": 0.0,
+                "cpu_s": 0.0,
+                "max_rss_mb": None,
+                "rss_growth_mb": None,
+                "traced_peak_mb": None,
+            }
+        record["calls"] += 1
+        record["wall_s"] += wall_s
+        record["cpu_s"] += cpu_s
+        record["rows"] += rows
+
+
+def pop_stages():
+    """
+    Return the stages recorded in this process since the last call (followed by the
+    totals of the counted stages) and forget them.
+    """
+    with _lock:
+        stages = list(_stages) + list(_counted.values())
+        _stages.clear()
+        _counted.clear()
+    return stages
+
+
+def write_run_manifest(out_folder, cases, stages, **info):
+    """
+    Write run_manifest.json to out_folder with the run info, the status of each case
+    and all stage records.
+    """
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        **info,
+        "cases": cases,
+        "stages": stages,
+    }
+    path = Path(out_folder) / RUN_MANIFEST_FN
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    return path
+
+
+def summarize_stages(stages):
+    """
+    Total wall/CPU time, largest RSS growth and rows of each stage name across cases,
+    in the order the stages were first seen.
+    """
+    summary = {}
+    for r in stages:
+        s = summary.setdefault(
+            r["stage"],
+            {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rss_growth_mb": 0.0, "rows": 0},
+        )
+        s["calls"] += r.get("calls", 1)
+        s["wall_s"] += r["wall_s"]
+        s["cpu_s"] += r["cpu_s"]
+        s["rss_growth_mb"] = max(s["rss_growth_mb"], r["rss_growth_mb"] or 0)
+        s["rows"] += r["rows"] or 0
+    return summary
+
+
+def print_summary(stages):
+    """
+    Print a table of summarize_stages, slowest stage first.
+    """
+    summary = summarize_stages(stages)
+    print(
+        f"{'stage':32} {'calls':>5} {'wall s':>9} {'cpu s':>9} "
+        f"{'rss+ MB':>9} {'rows':>10}"
+    )
+    for name, s in sorted(summary.items(), key=lambda x: -x[1]["wall_s"]):
+        print(
+            f"{name:32} {s['calls']:5d} {s['wall_s']:9.2f} {s['cpu_s']:9.2f} "
+            f"{s['rss_growth_mb']:9.1f} {s['rows']:10d}"
+        )
@@ -0,0 +1,138 @@
+"""
+Functions to write the SWITCH input tables
+"""
+
+from pathlib import Path
+
+from instrumentation import stage
+
+OUTPUT_FORMATS = ("csv", "parquet", "both")
+PARQUET_COMPRESSION = "zstd"
+
+# Columns of each table where SWITCH expects "." for every missing value. The frames
+# keep these columns numeric (with NaN); "." is only filled in when writing csv files.
+# Columns where only some rows are "." (gen_storage_energy_overnight_cost of
+# non-batteries, a gen_full_load_heat_rate of 0) hold "." in the frame instead, and
+# their other missing values are written as empty fields.
+DOT_COLUMNS = {
+    "gen_build_predetermined": ["gen_predetermined_storage_energy_mwh"],
+    "generation_projects_info": [
+        "gen_capacity_limit_mw",
+        "gen_storage_efficiency",
+        "gen_store_to_release_ratio",
+        "gen_self_discharge_rate",
+        "gen_discharge_efficiency",
+        "gen_land_use_rate",
+        "gen_storage_energy_to_power_ratio",
+    ],
+}
+
+
+def write_csv_chunks(chunks, path, columns=None):
+    """
+    Write dataframe chunks to one csv file, appending each chunk as it is created so
+    only one chunk has to be in memory. The file is the same as writing the
+    concatenated chunks with to_csv(index=False).
+    Inputs:
+        * chunks: iterable of dataframes with the same columns
+        * path: the csv file to write
+        * columns: only write these columns (all columns if None)
+    Output:
+        the number of rows written
+    """
+    num_rows = 0
+    header = True
+    with open(Path(path), "w", newline="") as f:
+        for df in chunks:
+            df.to_csv(f, index=False, columns=columns, header=header)
+            header = False
+            num_rows += len(df)
+    return num_rows
+
+
+def fill_dots(df, columns):
+    """
+    Return df with the missing values of columns replaced by "." (df itself if none of
+    the columns are in it).
+    """
+    columns = [c for c in columns if c in df.columns]
+    if not columns:
+        return df
+    df = df.copy()
+    for col in columns:
+        values = df[col].astype(object)
+        df[col] = values.where(values.notna(), ".")
+    return df
+
+
+def parquet_frame(df):
+    """
+    Make a dataframe that can be stored as parquet. Object columns that mix strings
+    and numbers are stored as strings.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind not in ("string", "empty", "boolean", "bytes"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def write_table(df, out_folder, name, output_format="csv"):
+    """
+    Write a SWITCH input table to out_folder as name.csv and/or name.parquet.
+    Missing values in the DOT_COLUMNS of the table are written as "." in csv files
+    and as nulls in parquet files.
+    Inputs:
+        * df: the table
+        * out_folder: the case folder
+        * name: the table name without a file extension (e.g. "fuel_cost")
+        * output_format: "csv", "parquet" or "both"
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"output_format must be one of {OUTPUT_FORMATS}, not '{output_format}'"
+        )
+    out_folder = Path(out_folder)
+    with stage(f"write {name}", rows=len(df)):
+        if output_format in ("csv", "both"):
+            fill_dots(df, DOT_COLUMNS.get(name, [])).to_csv(
+                out_folder / f"{name}.csv", index=False
+            )
+        if output_format in ("parquet", "both"):
+            parquet_frame(df).to_parquet(
+                out_folder / f"{name}.parquet",
+                index=False,
+                compression=PARQUET_COMPRESSION,
+            )
+
+
+def read_case_folder(case_folder, tables=None):
+    """
+    Load the SWITCH input tables of a case folder. Parquet files are used when they
+    exist, otherwise the csv files are parsed.
+    Inputs:
+        * case_folder: folder with the files of one case
+        * tables: table names to load (all tables in the folder if None)
+    Output:
+        dictionary of {table name: dataframe}
+    """
+    import pandas as pd
+
+    case_folder = Path(case_folder)
+    if tables is None:
+        tables = sorted(
+            {p.stem for p in case_folder.iterdir() if p.suffix in (".csv", ".parquet")}
+        )
+
+    frames = {}
+    for name in tables:
+        parquet_path = case_folder / f"{name}.parquet"
+        if parquet_path.exists():
+            frames[name] = pd.read_parquet(parquet_path)
+        else:
+            frames[name] = pd.read_csv(case_folder / f"{name}.csv")
+    return frames
@@ -1,54 +1,74 @@
-import sys
-import pandas as pd
-import numpy as np
-from datetime import datetime as dt
+"""
+Create inputs for the Switch model from PowerGenome data.
+
+Only the standard library, typer and the light helper modules are imported when the
+CLI starts, so --help and argument errors are fast. pandas, sqlalchemy, PowerGenome
+and the conversion modules are imported by the stages that use them; run with
+--import-profile to see how long each of them takes to import.
+"""
+
+from __future__ import annotations
 
-from powergenome.resource_clusters import ResourceGroup
+import copy
+import importlib
+import sys
+import time
+import traceback
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-import sqlalchemy as sa
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
 import typer
 
-import pandas as pd
-from powergenome.fuels import fuel_cost_table
-from powergenome.generators import GeneratorClusters
-from powergenome.util import (
-    build_scenario_settings,
-    init_pudl_connection,
-    load_settings,
-    check_settings,
+from build_manifest import (
+    FUEL_TABLES,
+    GENERATOR_TABLES,
+    is_up_to_date,
+    load_manifest,
+    record_build,
+    save_manifest,
+    table_files,
 )
-from powergenome.eia_opendata import fetch_fuel_prices
-import geopandas as gpd
-from powergenome.generators import *
-from powergenome.external_data import (
-    make_demand_response_profiles,
-    make_generator_variability,
+from data_cache import (
+    cache_config,
+    cache_key,
+    clear_cache,
+    configure_cache,
+    generator_settings_hash,
+    load_generator_frames,
+    sqlite_fingerprint,
+    store_generator_frames,
 )
-from powergenome.GenX import add_misc_gen_values
-
-from conversion_functions import (
-    switch_fuel_cost_table,
-    switch_fuels,
-    create_dict_plantgen,
-    create_dict_plantpudl,
-    plant_dict,
-    plant_gen_id,
-    plant_pudl_id,
-    gen_build_predetermined,
-    gen_build_costs_table,
-    generation_projects_info,
-    hydro_timeseries,
-    load_zones_table,
-    fuel_market_tables,
-    timeseries,
-    timepoints_table,
-    hydro_timepoints_table,
-    graph_timestamp_map_table,
-    loads_table,
-    variable_capacity_factors_table,
-    transmission_lines_table,
-    balancing_areas,
+from output_functions import OUTPUT_FORMATS
+from instrumentation import (
+    case,
+    inherit_stages,
+    open_stages,
+    pop_stages,
+    print_summary,
+    stage,
+    write_run_manifest,
 )
+from pipeline import pipeline_stage, run_pipeline
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import sqlalchemy as sa
+    from powergenome.generators import GeneratorClusters
+
+# Modules that take a noticeable time to import, in the order a run needs them.
+# They are imported inside the functions that use them.
+HEAVY_MODULES = [
+    "pandas",
+    "sqlalchemy",
+    "powergenome.util",
+    "powergenome.generators",
+    "powergenome.GenX",
+    "conversion_functions",
+    "switch_files",
+    "snapshots",
+]
 
 if not sys.warnoptions:
     import warnings
@@ -56,350 +76,738 @@ if not sys.warnoptions:
     warnings.simplefilter("ignore")
 
 
-def fuel_files(
-    fuel_prices: pd.DataFrame,
-    planning_years: List[int],
-    regions: List[str],
-    fuel_region_map: Dict[str, List[str]],
-    fuel_emission_factors: Dict[str, float],
-    out_folder: Path,
-):
+# Attributes that the per-year copies of GeneratorClusters share. These are the db
+# connections, whose connection pools can be used from several threads.
+SHARED_CLUSTER_ATTRIBUTES = ("pudl_engine", "pudl_out", "pg_engine")
 
-    fuel_cost = switch_fuel_cost_table(
-        fuel_region_map,
-        fuel_prices,
-        regions,
-        scenario="reference",
-        year_list=planning_years,
-    )
 
-    fuels_table = switch_fuels(fuel_prices, fuel_emission_factors)
-    fuels_table.loc[len(fuels_table.index)] = [
-        "Fuel",
-        0,
-        0,
-    ]  # adding in a dummy fuel for regional_fuel_market
+def year_clusters(gc: GeneratorClusters, settings: dict) -> GeneratorClusters:
+    """Copy of `gc` with the settings of a planning year
 
-    fuel_cost.to_csv(out_folder / "fuel_cost.csv", index=False)
-    fuels_table.to_csv(out_folder / "fuels.csv", index=False)
+    Everything except the db connections in `SHARED_CLUSTER_ATTRIBUTES` is deep
+    copied, so planning years never share the frames or cluster builders that
+    `create_new_generators` creates or changes.
+    """
+    memo = {
+        id(value): value
+        for value in (getattr(gc, name, None) for name in SHARED_CLUSTER_ATTRIBUTES)
+        if value is not None
+    }
+    memo[id(gc.settings)] = settings
+    return copy.deepcopy(gc, memo)
 
 
-def gen_projects_info_file(
-    complete_gens: pd.DataFrame, settings: dict, out_folder: Path
-):
+def new_generators_for_year(gc: GeneratorClusters, settings: dict) -> pd.DataFrame:
+    """New-build options of one planning year, with a "build_year" column"""
+    new_gen = year_clusters(gc, settings).create_new_generators()
+    new_gen["build_year"] = settings["model_year"]
+    return new_gen
 
-    if settings.get("cogen_tech"):
-        cogen_tech = settings["cogen_tech"]
-    else:
-        cogen_tech = {
-            "Onshore Wind Turbine": False,
-            "Biomass": False,
-            "Conventional Hydroelectric": False,
-            "Conventional Steam Coal": False,
-            "Natural Gas Fired Combined Cycle": False,
-            "Natural Gas Fired Combustion Turbine": False,
-            "Natural Gas Steam Turbine": False,
-            "Nuclear": False,
-            "Solar Photovoltaic": False,
-            "Hydroelectric Pumped Storage": False,
-            "Offshore Wind Turbine": False,
-            "Small Hydroelectric": False,
-            "NaturalGas_CCCCSAvgCF_Conservative": False,
-            "NaturalGas_CCAvgCF_Moderate": False,
-            "NaturalGas_CTAvgCF_Moderate": False,
-            "Battery_*_Moderate": False,
-            "NaturalGas_CCS100_Moderate": False,
-            "heat_load_shifting": False,
-        }
-    if settings.get("baseload_tech"):
-        baseload_tech = settings.get("baseload_tech")
-    else:
-        baseload_tech = {
-            "Onshore Wind Turbine": False,
-            "Biomass": False,
-            "Conventional Hydroelectric": False,
-            "Conventional Steam Coal": True,
-            "Natural Gas Fired Combined Cycle": False,
-            "Natural Gas Fired Combustion Turbine": False,
-            "Natural Gas Steam Turbine": False,
-            "Nuclear": True,
-            "Solar Photovoltaic": False,
-            "Hydroelectric Pumped Storage": False,
-            "Offshore Wind Turbine": False,
-            "Small Hydroelectric": False,
-            "NaturalGas_CCCCSAvgCF_Conservative": False,
-            "NaturalGas_CCAvgCF_Moderate": False,
-            "NaturalGas_CTAvgCF_Moderate": False,
-            "Battery_*_Moderate": False,
-            "NaturalGas_CCS100_Moderate": False,
-            "heat_load_shifting": False,
-        }
-    if settings.get("energy_tech"):
-        energy_tech = settings["energy_tech"]
-    else:
-        energy_tech = {
-            "Onshore Wind Turbine": "Wind",
-            "Biomass": "Bio Solid",
-            "Conventional Hydroelectric": "Water",
-            "Conventional Steam Coal": "Coal",
-            "Natural Gas Fired Combined Cycle": "Naturalgas",
-            "Natural Gas Fired Combustion Turbine": "Naturalgas",
-            "Natural Gas Steam Turbine": "Naturalgas",
-            "Nuclear": "Uranium",
-            "Solar Photovoltaic": "Solar",
-            "Hydroelectric Pumped Storage": "Water",
-            "Offshore Wind Turbine": "Wind",
-            "Small Hydroelectric": "Water",
-            "NaturalGas_CCCCSAvgCF_Conservative": "Naturalgas",
-            "NaturalGas_CCAvgCF_Moderate": "Naturalgas",
-            "NaturalGas_CTAvgCF_Moderate": "Naturalgas",
-            "Battery_*_Moderate": "Electricity",
-            "NaturalGas_CCS100_Moderate": "Naturalgas",
-            "heat_load_shifting": False,
-        }
-    if settings.get("forced_outage_tech"):
-        forced_outage_tech = settings["forced_outage_tech"]
-    else:
-        forced_outage_tech = {
-            "Onshore Wind Turbine": 0.0,
-            "Biomass": 0.04,
-            "Conventional Hydroelectric": 0.05,
-            "Conventional Steam Coal": 0.04,
-            "Natural Gas Fired Combined Cycle": 0.4,
-            "Natural Gas Fired Combustion Turbine": 0.4,
-            "Natural Gas Steam Turbine": 0.4,
-            "Nuclear": 0.04,
-            "Solar Photovoltaic": 0.0,
-            "Hydroelectric Pumped Storage": 0.05,
-            "Offshore Wind Turbine": 0.05,
-            "Small Hydroelectric": 0.05,
-            "NaturalGas_CCCCSAvgCF_Conservative": 0.4,
-            "NaturalGas_CCAvgCF_Moderate": 0.4,
-            "NaturalGas_CTAvgCF_Moderate": 0.4,
-            "Battery_*_Moderate": 0.02,
-            "NaturalGas_CCS100_Moderate": 0.4,
-            "heat_load_shifting": False,
-        }
-    if settings.get("sched_outage_tech"):
-        sched_outage_tech = settings["sched_outage_tech"]
-    else:
-        sched_outage_tech = {
-            "Onshore Wind Turbine": 0.0,
-            "Biomass": 0.06,
-            "Conventional Hydroelectric": 0.05,
-            "Conventional Steam Coal": 0.06,
-            "Natural Gas Fired Combined Cycle": 0.6,
-            "Natural Gas Fired Combustion Turbine": 0.6,
-            "Natural Gas Steam Turbine": 0.6,
-            "Nuclear": 0.06,
-            "Solar Photovoltaic": 0.0,
-            "Hydroelectric Pumped Storage": 0.05,
-            "Offshore Wind Turbine": 0.01,
-            "Small Hydroelectric": 0.05,
-            "NaturalGas_CCCCSAvgCF_Conservative": 0.6,
-            "NaturalGas_CCAvgCF_Moderate": 0.6,
-            "NaturalGas_CTAvgCF_Moderate": 0.6,
-            "Battery_*_Moderate": 0.01,
-            "NaturalGas_CCS100_Moderate": 0.6,
-            "heat_load_shifting": False,
-        }
 
-    gen_project_info = generation_projects_info(
-        complete_gens,
-        settings.get("transmission_investment_cost")["spur"]["capex_mw_mile"],
-        settings.get("retirement_ages"),
-        cogen_tech,
-        baseload_tech,
-        energy_tech,
-        sched_outage_tech,
-        forced_outage_tech,
-    )
+def create_new_generators_by_year(
+    gc: GeneratorClusters, settings_list: List[dict], year_jobs: int = 1
+) -> pd.DataFrame:
+    """Create the new-build generator options for every planning year
 
-    # Do I need to set full load heat rate to "." for non-fuel energy generators?
-    gen_project_info.to_csv(out_folder / "generation_projects_info.csv", index=False)
+    Parameters
+    ----------
+    gc : GeneratorClusters
+        Generator clusters for the case
+    settings_list : List[dict]
+        Settings for each planning year of the case, in order
+    year_jobs : int, optional
+        Number of planning years to build concurrently on threads, by default 1.
+        Each year runs on its own copy of `gc` (see `year_clusters`).
+
+    Returns
+    -------
+    pd.DataFrame
+        New-build options for all years with a "build_year" column, concatenated in
+        the order of `settings_list`. `gc.settings` is left as the settings of the
+        final year.
+    """
+    import pandas as pd
+
+    parents = open_stages()
+
+    def build(settings):
+        # the years running on other threads are recorded inside the caller's stages
+        with inherit_stages(parents), stage(
+            f"new_generators {settings['model_year']}"
+        ) as record:
+            new_gen = new_generators_for_year(gc, settings)
+            record["rows"] = len(new_gen)
+        return new_gen
+
+    if year_jobs > 1 and len(settings_list) > 1:
+        with ThreadPoolExecutor(max_workers=year_jobs) as executor:
+            df_list = list(executor.map(build, settings_list))
+    else:
+        df_list = [build(settings) for settings in settings_list]
+    gc.settings = settings_list[-1]
+    return pd.concat(df_list, ignore_index=True)
 
 
-def gen_prebuild_newbuild_info_files(
-    gc: GeneratorClusters,
-    pudl_engine: sa.engine,
-    settings_list: List[dict],
-    out_folder: Path,
-):
-    out_folder.mkdir(parents=True, exist_ok=True)
-    settings = settings_list[0]
+def generator_frames(gc: GeneratorClusters) -> Dict[str, pd.DataFrame]:
+    """Build the existing/all generator frames that the Switch tables are based on
+
+    Parameters
+    ----------
+    gc : GeneratorClusters
+        Generator clusters created with the first planning year settings of a case
+
+    Returns
+    -------
+    Dict[str, pd.DataFrame]
+        "all_gen" from `create_all_generators` along with the "units_model",
+        "operating_860m" and "proposed_gens" attributes it creates
+    """
     all_gen = gc.create_all_generators()
-    all_gen["plant_id_eia"] = all_gen["plant_id_eia"].astype("Int64")
-    existing_gen = all_gen.loc[
-        all_gen["plant_id_eia"].notna(), :
-    ]  # gc.create_region_technology_clusters()
+    return {
+        "all_gen": all_gen,
+        "units_model": gc.units_model,
+        "operating_860m": gc.operating_860m,
+        "proposed_gens": gc.proposed_gens,
+    }
+
+
+def case_generator_frames(
+    run: dict, settings: dict
+) -> Tuple[GeneratorClusters, Dict[str, pd.DataFrame]]:
+    """Create GeneratorClusters for a case, reusing generator frames from the cache
+
+    Cases with the same generator-related settings (see
+    `data_cache.generator_settings_hash`) share one set of frames. When the frames
+    are cached, GeneratorClusters is created without loading the existing fleet.
+    """
+    from powergenome.generators import GeneratorClusters
+
+    key = generator_settings_hash(settings, run["pudl_engine"], run["pg_engine"])
+    frames = load_generator_frames(key)
+    with stage("generator_clusters"):
+        gc = GeneratorClusters(
+            run["pudl_engine"],
+            run["pudl_out"],
+            run["pg_engine"],
+            settings,
+            current_gens=frames is None,
+        )
+    if frames is None:
+        with stage("create_all_generators") as record:
+            frames = generator_frames(gc)
+            record["rows"] = len(frames["all_gen"])
+        store_generator_frames(key, frames)
+    return gc, frames
+
+
+def pudl_generator_tables(
+    pudl_engine: sa.engine, units_model: pd.DataFrame, data_years
+) -> Dict[str, pd.DataFrame]:
+    """Read the PUDL generator tables for the plants of units_model
+
+    Parameters
+    ----------
+    pudl_engine : sa.engine
+        Connection to the PUDL database
+    units_model : pd.DataFrame
+        The units_model of GeneratorClusters. The PUDL tables are only matched
+        against its generators.
+    data_years : list or int
+        The "data_years" setting
+
+    Returns
+    -------
+    Dict[str, pd.DataFrame]
+        The "generators_eia860" (for the data years) and "generators_entity_eia"
+        tables
+    """
+    from pudl_access import plant_ids, read_pudl_table
 
-    data_years = gc.settings.get("data_years", [])
     if not isinstance(data_years, list):
         data_years = [data_years]
     data_years = [str(y) for y in data_years]
-    s = f"""
-        SELECT
+    year_params = {f"year{i}": y for i, y in enumerate(data_years)}
+    year_list = ", ".join(f":{name}" for name in year_params) or "NULL"
+    fleet_ids = plant_ids(units_model)
+    generators_eia860 = read_pudl_table(
+        pudl_engine,
+        "generators_eia860",
+        [
             "plant_id_eia",
             "generator_id",
             "operational_status",
             "retirement_date",
             "planned_retirement_date",
-            "current_planned_operating_date"
-        FROM generators_eia860
-        WHERE strftime('%Y',report_date) in ({','.join('?'*len(data_years))})
-    """
-    # generators_eia860 = pd.read_sql_table("generators_eia860", pudl_engine)
-    generators_eia860 = pd.read_sql_query(
-        s,
-        pudl_engine,
-        params=data_years,
+            "current_planned_operating_date",
+        ],
+        plant_ids=fleet_ids,
+        where=f"strftime('%Y', report_date) IN ({year_list})",
+        params=year_params,
         parse_dates=[
             "planned_retirement_date",
             "retirement_date",
             "current_planned_operating_date",
         ],
     )
+    generators_entity_eia = read_pudl_table(
+        pudl_engine,
+        "generators_entity_eia",
+        ["plant_id_eia", "generator_id", "operating_date"],
+        plant_ids=fleet_ids,
+        parse_dates=["operating_date"],
+    )
+    return {
+        "generators_eia860": generators_eia860,
+        "generators_entity_eia": generators_entity_eia,
+    }
 
-    generators_entity_eia = pd.read_sql_table("generators_entity_eia", pudl_engine)
-    # create copies of PUDL tables and filter to relevant columns
-    pudl_gen = generators_eia860.copy()
-    pudl_gen = pudl_gen[
-        [
-            "plant_id_eia",
-            "generator_id",
-            "operational_status",
-            "retirement_date",
-            "planned_retirement_date",
-            "current_planned_operating_date",
-        ]
-    ]  #'utility_id_eia',
 
-    pudl_gen_entity = generators_entity_eia.copy()
-    pudl_gen_entity = pudl_gen_entity[
-        ["plant_id_eia", "generator_id", "operating_date"]
-    ]
+def load_run_settings(settings_file: str):
+    """Load settings and the scenario definitions for a run
 
-    eia_Gen = gc.operating_860m
-    eia_Gen = eia_Gen[
-        [
-            "utility_id_eia",
-            "utility_name",
-            "plant_id_eia",
-            "plant_name",
-            "generator_id",
-            "Operating Year",
-            "Planned Retirement Year",
-        ]
-    ]
-    eia_Gen = eia_Gen.loc[eia_Gen["plant_id_eia"].notna(), :]
+    Parameters
+    ----------
+    settings_file : str
+        The path to a YAML file or folder of YAML files with settings parameters
 
-    # create identifier to connect to powergenome data
-    eia_Gen["plant_gen_id"] = (
-        eia_Gen["plant_id_eia"].astype(str) + "_" + eia_Gen["generator_id"]
-    )
+    Returns
+    -------
+    Tuple[dict, pd.DataFrame]
+        The settings dictionary (with an absolute "input_folder") and the
+        scenario definitions table
+    """
+    import pandas as pd
+    from powergenome.util import load_settings
 
-    eia_Gen_prop = gc.proposed_gens.reset_index()
-    eia_Gen_prop = eia_Gen_prop[
-        [
-            # "utility_id_eia",
-            # "utility_name",
-            "plant_id_eia",
-            # "plant_name",
-            "generator_id",
-            "planned_operating_year",
-        ]
-    ]
-    eia_Gen_prop = eia_Gen_prop.loc[eia_Gen_prop["plant_id_eia"].notna(), :]
-    eia_Gen_prop["plant_gen_id"] = (
-        eia_Gen_prop["plant_id_eia"].astype(str) + "_" + eia_Gen_prop["generator_id"]
+    cwd = Path.cwd()
+    settings = load_settings(path=settings_file)
+    input_folder = cwd / settings["input_folder"]
+    settings["input_folder"] = input_folder
+    scenario_definitions = pd.read_csv(
+        input_folder / settings["scenario_definitions_fn"]
     )
+    return settings, scenario_definitions
 
-    # create copies of potential_build_yr (powergenome)
-    pg_build = gc.units_model.copy()
-    pg_build = pg_build[
-        [
-            "plant_id_eia",
-            "generator_id",
-            "unit_id_pudl",
-            "planned_operating_year",
-            "planned_retirement_date",
-            "operating_date",
-            "Operating Year",
-            "retirement_year",
-        ]
-    ]
 
-    retirement_ages = settings.get("retirement_ages")
-
-    # add in the plant+generator ids to pg_build and pudl tables (plant_id_eia + generator_id)
-    pudl_gen = plant_gen_id(pudl_gen)
-    pudl_gen_entity = plant_gen_id(pudl_gen_entity)
-    pg_build = plant_gen_id(pg_build)
-
-    # add in the plant+pudl id to the all_gen and pg_build tables (plant_id_eia + unit_pudl_id)
-    pg_build = plant_pudl_id(pg_build)
-    all_gen = plant_pudl_id(all_gen)
-
-    gen_buildpre, gen_build_with_id = gen_build_predetermined(
-        all_gen,
-        pudl_gen,
-        pudl_gen_entity,
-        pg_build,
-        {},  # manual_build_yr,
-        eia_Gen,
-        eia_Gen_prop,
-        {},  # plant_gen_manual,
-        {},  # plant_gen_manual_proposed,
-        {},  # plant_gen_manual_retired,
-        retirement_ages,
+def init_run(settings_file: str):
+    """Load settings, create db connections, and build dictionary of settings across
+    cases/years
+
+    Returns
+    -------
+    dict
+        Everything a single case needs: "settings", "scenario_definitions",
+        "scenario_settings", "pudl_engine", "pudl_out" and "pg_engine"
+    """
+    from powergenome.util import (
+        build_scenario_settings,
+        init_pudl_connection,
+        check_settings,
     )
 
-    retired = gen_build_with_id.loc[
-        gen_build_with_id["retirement_year"] < settings["model_year"], :
+    from pudl_access import read_only_engine
+
+    with stage("load_settings"):
+        settings, scenario_definitions = load_run_settings(settings_file)
+    with stage("pudl_connection"):
+        pudl_engine, pudl_out, pg_engine = init_pudl_connection(
+            freq="AS",
+            start_year=min(settings.get("data_years")),
+            end_year=max(settings.get("data_years")),
+        )
+        # pooled read-only connections with sqlite pragmas and per-query timing
+        pudl_engine = read_only_engine(pudl_engine)
+    with stage("scenario_settings"):
+        check_settings(settings, pg_engine)
+        scenario_settings = build_scenario_settings(settings, scenario_definitions)
+
+    return {
+        "settings": settings,
+        "scenario_definitions": scenario_definitions,
+        "scenario_settings": scenario_settings,
+        "pudl_engine": pudl_engine,
+        "pudl_out": pudl_out,
+        "pg_engine": pg_engine,
+    }
+
+
+def case_input_hashes(
+    case_id: str, run: dict, settings_list: List[dict]
+) -> Dict[str, str]:
+    """Hash the inputs of each group of output tables for a case
+
+    The generator tables depend on the generator-related settings of every planning
+    year (see `data_cache.generator_settings_hash`). The fuel tables depend on all
+    case settings, since fuel prices are created by GeneratorClusters. Both include
+    the PUDL/PowerGenome database fingerprints and the case rows of the scenario
+    definitions file.
+    """
+    scenario_rows = (
+        run["scenario_definitions"].query("case_id == @case_id").to_dict("records")
+    )
+    fingerprints = [
+        sqlite_fingerprint(run["pudl_engine"]),
+        sqlite_fingerprint(run["pg_engine"]),
     ]
-    retired_ids = retired["GENERATION_PROJECT"].to_list()
+    return {
+        "generators": cache_key(
+            "generators",
+            [
+                generator_settings_hash(s, run["pudl_engine"], run["pg_engine"])
+                for s in settings_list
+            ],
+            scenario_rows,
+            fingerprints,
+        ),
+        "fuels": cache_key(
+            "fuels", run["settings"], settings_list, scenario_rows, fingerprints
+        ),
+    }
+
+
+# The tables of a case as pipeline stages (see pipeline.py). run_case evaluates the
+# stages that its out-of-date tables need, each once. Stages that use the case
+# GeneratorClusters object after it is created share a lock, since
+# create_new_generators changes its settings.
+CASE_STAGES = {}
+
+
+@pipeline_stage(CASE_STAGES)
+def case_clusters(
+    run: dict, settings_list: List[dict], groups: List[str]
+) -> Tuple[GeneratorClusters, Dict[str, pd.DataFrame]]:
+    """GeneratorClusters of the first planning year and the frames from
+    `case_generator_frames`, which are None when only the fuel tables are built
+    """
+    from powergenome.generators import GeneratorClusters
+
+    if "generators" in groups:
+        return case_generator_frames(run, settings_list[0])
+    with stage("generator_clusters"):
+        gc = GeneratorClusters(
+            run["pudl_engine"],
+            run["pudl_out"],
+            run["pg_engine"],
+            settings_list[0],
+            current_gens=False,
+        )
+    return gc, None
+
+
+@pipeline_stage(CASE_STAGES)
+def pudl_queries(
+    case_clusters: tuple, run: dict, settings_list: List[dict]
+) -> Dict[str, pd.DataFrame]:
+    _, gen_frames = case_clusters
+    return pudl_generator_tables(
+        run["pudl_engine"],
+        gen_frames["units_model"],
+        settings_list[0].get("data_years", []),
+    )
+
+
+@pipeline_stage(CASE_STAGES, lock="generator_clusters")
+def create_new_generators(
+    case_clusters: tuple, settings_list: List[dict], year_jobs: int
+) -> pd.DataFrame:
+    gc, _ = case_clusters
+    return create_new_generators_by_year(gc, settings_list, year_jobs)
 
-    # newbuild options
-    df_list = []
-    for settings in settings_list:
-        gc.settings = settings
-        new_gen = gc.create_new_generators()
-        new_gen["build_year"] = settings["model_year"]
-        df_list.append(new_gen)
 
-    newgens = pd.concat(df_list, ignore_index=True)
+@pipeline_stage(CASE_STAGES, lock="generator_clusters")
+def misc_gen_values(case_clusters: tuple, create_new_generators: pd.DataFrame):
+    from powergenome.GenX import add_misc_gen_values
 
-    build_yr_list = gen_build_with_id["build_year"].to_list()
-    # using gen_build_with_id because it has plants that were removed for the final gen_build_pred. (ie. build year=2020)
-    gen_project = gen_build_with_id["GENERATION_PROJECT"].to_list()
-    build_yr_plantid_dict = dict(zip(gen_project, build_yr_list))
+    from switch_files import complete_generators
 
-    gen_build_costs = gen_build_costs_table(
-        existing_gen, newgens, build_yr_plantid_dict, all_gen
+    gc, gen_frames = case_clusters
+    return add_misc_gen_values(
+        complete_generators(gen_frames["all_gen"], create_new_generators),
+        gc.settings,
     )
 
-    gen_build_costs.drop(
-        gen_build_costs[gen_build_costs["GENERATION_PROJECT"].isin(retired_ids)].index,
-        inplace=True,
+
+@pipeline_stage(CASE_STAGES)
+def case_generator_inputs(
+    case_clusters: tuple,
+    pudl_queries: Dict[str, pd.DataFrame],
+    create_new_generators: pd.DataFrame,
+    misc_gen_values: pd.DataFrame,
+) -> Dict[str, pd.DataFrame]:
+    """The frames in `switch_files.GENERATOR_FRAMES`, which is everything
+    `switch_files.generator_files` needs
+    """
+    _, gen_frames = case_clusters
+    return {
+        **gen_frames,
+        **pudl_queries,
+        "new_generators": create_new_generators,
+        "complete_gens": misc_gen_values,
+    }
+
+
+@pipeline_stage(CASE_STAGES, tables=["gen_build_predetermined", "gen_build_costs"])
+def gen_build_tables(
+    case_generator_inputs: Dict[str, pd.DataFrame],
+    settings_list: List[dict],
+    case_folder: Path,
+    output_format: str,
+):
+    from switch_files import gen_build_files
+
+    gen_build_files(case_generator_inputs, settings_list, case_folder, output_format)
+
+
+@pipeline_stage(CASE_STAGES, tables=["generation_projects_info"])
+def generation_projects_info(
+    misc_gen_values: pd.DataFrame,
+    settings_list: List[dict],
+    case_folder: Path,
+    output_format: str,
+):
+    from switch_files import gen_projects_info_file
+
+    gen_projects_info_file(
+        misc_gen_values, settings_list[-1], case_folder, output_format
     )
-    # drop retired plants
-    gen_buildpre.drop(
-        gen_buildpre[gen_buildpre["GENERATION_PROJECT"].isin(retired_ids)].index,
-        inplace=True,
+
+
+@pipeline_stage(CASE_STAGES, tables=FUEL_TABLES)
+def fuel_tables(
+    case_clusters: tuple,
+    run: dict,
+    case_years: List[int],
+    case_folder: Path,
+    output_format: str,
+):
+    from switch_files import fuel_files
+
+    gc, _ = case_clusters
+    settings = run["settings"]
+    fuel_files(
+        fuel_prices=gc.fuel_prices,
+        planning_years=case_years,
+        regions=settings["model_regions"],
+        fuel_region_map=settings["aeo_fuel_region_map"],
+        fuel_emission_factors=settings["fuel_emission_factors"],
+        out_folder=case_folder,
+        output_format=output_format,
     )
 
-    # Create a complete list of existing and new-build options
-    complete_gens = pd.concat([existing_gen, newgens]).drop_duplicates(
-        subset=["Resource"]
+
+def run_case(
+    case_id: str,
+    run: dict,
+    out_folder: Path,
+    year_jobs: int = 1,
+    output_format: str = "csv",
+    rebuild: bool = False,
+    record_folder: Path = None,
+    table_jobs: int = 1,
+) -> List[str]:
+    """Create all of the Switch input files for a single case
+
+    Groups of tables whose inputs have not changed since the last run (see
+    `build_manifest`) are not created again. The tables of the other groups are
+    built by the stages in `CASE_STAGES`.
+
+    Parameters
+    ----------
+    case_id : str
+        The case_id from the scenario definitions file
+    run : dict
+        Settings and db connections created by `init_run`
+    out_folder : Path
+        The results folder. Files are saved in a subfolder named after the case.
+    year_jobs : int, optional
+        Number of planning years to create new-build options for concurrently
+    output_format : str, optional
+        Write the tables as "csv", "parquet" or "both"
+    rebuild : bool, optional
+        Create all tables even if their inputs have not changed
+    record_folder : Path, optional
+        Also save the PowerGenome/PUDL frames and settings of the case to a subfolder
+        named after the case, for `replay.py`. All tables are created.
+    table_jobs : int, optional
+        Number of threads that run independent stages (e.g. the fuel tables, PUDL
+        queries and new-build generators) concurrently
+
+    Returns
+    -------
+    List[str]
+        The groups of tables ("generators", "fuels") that were created
+    """
+    from snapshots import save_snapshot
+
+    settings = run["settings"]
+    scenario_definitions = run["scenario_definitions"]
+    scenario_settings = run["scenario_settings"]
+
+    case_folder = out_folder / case_id
+    case_folder.mkdir(parents=True, exist_ok=True)
+
+    settings_list = []
+    case_years = []
+    for year in scenario_definitions.query("case_id == @case_id")["year"]:
+        case_years.append(year)
+        settings_list.append(scenario_settings[year][case_id])
+
+    manifest = load_manifest(case_folder)
+    input_hashes = case_input_hashes(case_id, run, settings_list)
+    group_tables = {"generators": GENERATOR_TABLES, "fuels": FUEL_TABLES}
+    group_files = {
+        group: table_files(tables, output_format)
+        for group, tables in group_tables.items()
+    }
+    snapshot_folder = None
+    if record_folder is not None:
+        # every group has to be built to have all of its frames
+        rebuild = True
+        snapshot_folder = record_folder / case_id
+        save_snapshot(
+            snapshot_folder,
+            {},
+            {
+                "case_id": case_id,
+                "case_years": case_years,
+                "settings": settings,
+                "settings_list": settings_list,
+            },
+        )
+    stale = [
+        group
+        for group, files in group_files.items()
+        if rebuild
+        or not is_up_to_date(manifest, case_folder, group, input_hashes[group], files)
+    ]
+
+    # GeneratorClusters is only created when a group has to be built
+    if not stale:
+        return stale
+    values = run_pipeline(
+        CASE_STAGES,
+        [table for group in stale for table in group_tables[group]],
+        {
+            "run": run,
+            "settings_list": settings_list,
+            "case_years": case_years,
+            "groups": stale,
+            "year_jobs": year_jobs,
+            "case_folder": case_folder,
+            "output_format": output_format,
+        },
+        jobs=table_jobs,
+        name="case_tables",
     )
-    complete_gens = add_misc_gen_values(complete_gens, gc.settings)
-    gen_projects_info_file(complete_gens, gc.settings, out_folder)
+    if snapshot_folder is not None:
+        gc, _ = values["case_clusters"]
+        with stage("record_snapshot"):
+            save_snapshot(
+                snapshot_folder,
+                {**values["case_generator_inputs"], "fuel_prices": gc.fuel_prices},
+            )
+    for group in stale:
+        record_build(manifest, group, input_hashes[group], group_files[group])
+    save_manifest(case_folder, manifest)
+
+    return stale
+
+
+# Each worker process opens its own PUDL/PowerGenome engines once and reuses them
+# for every case it is handed.
+_worker_run = None
+
+
+def _init_worker(settings_file: str, cache_settings: dict, trace_memory: bool):
+    global _worker_run
+    configure_cache(**cache_settings)
+    if trace_memory:
+        tracemalloc.start()
+    _worker_run = init_run(settings_file)
+
+
+def _run_case_in_worker(
+    case_id: str,
+    out_folder: Path,
+    year_jobs: int,
+    output_format: str,
+    rebuild: bool,
+    record_folder: Path,
+    table_jobs: int,
+) -> dict:
+    start = time.perf_counter()
+    try:
+        with case(case_id):
+            built = run_case(
+                case_id,
+                _worker_run,
+                out_folder,
+                year_jobs,
+                output_format,
+                rebuild,
+                record_folder,
+                table_jobs,
+            )
+    except Exception:
+        return {
+            "case_id": case_id,
+            "status": "failed",
+            "seconds": time.perf_counter() - start,
+            "built": [],
+            "error": traceback.format_exc(),
+            "stages": pop_stages(),
+        }
+    return {
+        "case_id": case_id,
+        "status": "ok",
+        "seconds": time.perf_counter() - start,
+        "built": built,
+        "error": None,
+        "stages": pop_stages(),
+    }
 
-    gen_buildpre.to_csv(out_folder / "gen_build_predetermined.csv", index=False)
-    gen_build_costs.to_csv(out_folder / "gen_build_costs.csv", index=False)
 
+def built_message(built: List[str]) -> str:
+    return f"built {', '.join(built)}" if built else "up to date"
 
-def main(settings_file: str, results_folder: str):
+
+def import_profile(modules: List[str] = HEAVY_MODULES) -> Dict[str, float]:
+    """Import modules one at a time and time each import
+
+    Each import is also recorded as an "import <module>" stage. Modules that were
+    already imported (or that an earlier module imported) take no time.
+
+    Returns
+    -------
+    Dict[str, float]
+        Seconds to import each module, or None if it is not installed
+    """
+    profile = {}
+    for name in modules:
+        with stage(f"import {name}") as record:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                record["error"] = "not installed"
+        profile[name] = None if "error" in record else record["wall_s"]
+    return profile
+
+
+def print_import_profile(profile: Dict[str, float]):
+    print(f"{'module':32} {'import s':>9}")
+    for name, seconds in profile.items():
+        print(f"{name:32} {'not installed' if seconds is None else f'{seconds:9.2f}'}")
+    print(f"{'total':32} {sum(s for s in profile.values() if s):9.2f}")
+
+
+def run_cases_parallel(
+    case_ids: List[str],
+    settings_file: str,
+    out_folder: Path,
+    jobs: int,
+    year_jobs: int = 1,
+    output_format: str = "csv",
+    rebuild: bool = False,
+    trace_memory: bool = False,
+    record_folder: Path = None,
+    table_jobs: int = 1,
+) -> List[dict]:
+    """Run whole cases on a pool of worker processes
+
+    Each worker creates its own db connections and writes into its own case folder.
+    Status and timing for each case are printed as cases finish and returned in
+    the original case order, along with the stage records of each case (see
+    `instrumentation`).
+    """
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(settings_file, cache_config(), trace_memory),
+    ) as executor:
+        futures = [
+            executor.submit(
+                _run_case_in_worker,
+                case_id,
+                out_folder,
+                year_jobs,
+                output_format,
+                rebuild,
+                record_folder,
+                table_jobs,
+            )
+            for case_id in case_ids
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["case_id"]] = result
+            print(
+                f"case {result['case_id']} {result['status']} "
+                f"in {result['seconds']:.1f}s ({built_message(result['built'])})"
+            )
+            if result["error"]:
+                print(result["error"])
+
+    return [results[case_id] for case_id in case_ids]
+
+
+def main(
+    settings_file: str,
+    results_folder: str,
+    jobs: int = typer.Option(
+        1, "--jobs", "-j", min=1, help="Number of cases to run in parallel processes"
+    ),
+    year_jobs: int = typer.Option(
+        1,
+        "--year-jobs",
+        min=1,
+        help="Number of planning years to create new-build options for concurrently",
+    ),
+    table_jobs: int = typer.Option(
+        1,
+        "--table-jobs",
+        min=1,
+        help="Number of threads that build the tables of each case concurrently",
+    ),
+    cache_dir: str = typer.Option(
+        None, help="Folder for the local cache of PUDL tables"
+    ),
+    no_cache: bool = typer.Option(
+        False,
+        "--no-cache",
+        help="Always read PUDL tables and build generators from the database",
+    ),
+    clear_pudl_cache: bool = typer.Option(
+        False,
+        "--clear-cache",
+        help="Delete cached PUDL tables and generator frames before running",
+    ),
+    output_format: str = typer.Option(
+        "csv",
+        "--output-format",
+        help="Write the tables as csv, parquet or both",
+    ),
+    rebuild: bool = typer.Option(
+        False,
+        "--rebuild",
+        help="Create all tables, even those whose inputs have not changed",
+    ),
+    trace_memory: bool = typer.Option(
+        False,
+        "--trace-memory",
+        help="Also record python memory peaks of each stage with tracemalloc (slower)",
+    ),
+    record: str = typer.Option(
+        None,
+        "--record",
+        help="Save the PowerGenome/PUDL frames of each case to this folder for replay.py",
+    ),
+    profile_imports: bool = typer.Option(
+        False,
+        "--import-profile",
+        help="Print how long pandas, PowerGenome, etc take to import before running",
+    ),
+):
     """Create inputs for the Switch model using PowerGenome data
 
     Parameters
@@ -408,50 +816,138 @@ def main(settings_file: str, results_folder: str):
         The path to a YAML file or folder of YAML files with settings parameters
     results_folder : str
         The folder where results will be saved
+    jobs : int
+        The number of worker processes. Each worker runs whole cases with its own
+        db connections. By default cases are run one after another.
+    year_jobs : int
+        The number of threads used to create new-build generators for the planning
+        years of each case. Each year works on its own copy of GeneratorClusters.
+        The work is mostly pandas code that holds the GIL, so more threads only help
+        when the years spend time waiting on the databases; use --jobs to run cases
+        on several cores.
+    table_jobs : int
+        The number of threads used to run independent table stages of each case
+        (e.g. the fuel tables alongside the PUDL queries and new-build generators).
+        The stage records in run_manifest.json include the critical path of each
+        case ("case_tables" stage).
+    cache_dir : str
+        Folder for cached PUDL tables and generator frames. Defaults to
+        $PG_TO_SWITCH_CACHE or ~/.cache/pg_to_switch.
+    no_cache : bool
+        Skip the PUDL table and generator frame caches.
+    clear_pudl_cache : bool
+        Remove all cached PUDL tables and generator frames before running.
+    output_format : str
+        "csv", "parquet" (typed, compressed files that can be loaded with
+        `output_functions.read_case_folder`) or "both".
+    rebuild : bool
+        Ignore the build manifest in each case folder and create every table.
+    trace_memory : bool
+        Record tracemalloc peaks for each stage in addition to time and RSS. Stage
+        records are always written to run_manifest.json in the results folder.
+    record : str
+        Folder where the PowerGenome/PUDL frames and settings of each case are saved.
+        `replay.py` creates the generator and fuel files from them without
+        PowerGenome. Recording creates every table, like `rebuild`.
+    profile_imports : bool
+        Import the modules in `HEAVY_MODULES` one at a time before the run and print
+        the time of each. The times are also saved in run_manifest.json. Use
+        `python -X importtime pg_to_switch.py ...` for a full profile.
     """
+    if output_format not in OUTPUT_FORMATS:
+        raise typer.BadParameter(
+            f"must be one of {', '.join(OUTPUT_FORMATS)}", param_hint="--output-format"
+        )
     cwd = Path.cwd()
     out_folder = cwd / results_folder
     out_folder.mkdir(exist_ok=True)
-
-    # Load settings, create db connections, and build dictionary of settings across
-    # cases/years
-    settings = load_settings(path=settings_file)
-    pudl_engine, pudl_out, pg_engine = init_pudl_connection(
-        freq="AS",
-        start_year=min(settings.get("data_years")),
-        end_year=max(settings.get("data_years")),
-    )
-    check_settings(settings, pg_engine)
-    input_folder = cwd / settings["input_folder"]
-    settings["input_folder"] = input_folder
-    scenario_definitions = pd.read_csv(
-        input_folder / settings["scenario_definitions_fn"]
-    )
-    scenario_settings = build_scenario_settings(settings, scenario_definitions)
-
-    # Should switch the case_id/year layers in scenario settings dictionary.
-    # Run through the different cases and save files in a new folder for each.
-    for case_id in scenario_definitions["case_id"].unique():
-        print(f"starting case {case_id}")
-        case_folder = out_folder / case_id
-        case_folder.mkdir(parents=True, exist_ok=True)
-
-        settings_list = []
-        case_years = []
-        for year in scenario_definitions.query("case_id == @case_id")["year"]:
-            case_years.append(year)
-            settings_list.append(scenario_settings[year][case_id])
-
-        gc = GeneratorClusters(pudl_engine, pudl_out, pg_engine, settings_list[0])
-        gen_prebuild_newbuild_info_files(gc, pudl_engine, settings_list, case_folder)
-        fuel_files(
-            fuel_prices=gc.fuel_prices,
-            planning_years=case_years,
-            regions=settings["model_regions"],
-            fuel_region_map=settings["aeo_fuel_region_map"],
-            fuel_emission_factors=settings["fuel_emission_factors"],
-            out_folder=case_folder,
+    record_folder = cwd / record if record else None
+
+    configure_cache(folder=cache_dir, enabled=not no_cache)
+    if clear_pudl_cache:
+        clear_cache()
+
+    if trace_memory:
+        tracemalloc.start()
+    if profile_imports:
+        print_import_profile(import_profile())
+    run_info = {
+        "settings_file": str(settings_file),
+        "jobs": jobs,
+        "year_jobs": year_jobs,
+        "table_jobs": table_jobs,
+        "output_format": output_format,
+        "record": str(record_folder) if record_folder else None,
+    }
+
+    if jobs > 1:
+        _, scenario_definitions = load_run_settings(settings_file)
+        case_ids = list(scenario_definitions["case_id"].unique())
+        results = run_cases_parallel(
+            case_ids,
+            settings_file,
+            out_folder,
+            jobs,
+            year_jobs,
+            output_format,
+            rebuild,
+            trace_memory,
+            record_folder,
+            table_jobs,
+        )
+        # stages of this process (settings, import profile) come first
+        stages = pop_stages() + [r for result in results for r in result.pop("stages")]
+        write_run_manifest(out_folder, results, stages, **run_info)
+        print_summary(stages)
+        failed = [r["case_id"] for r in results if r["status"] != "ok"]
+        total = sum(r["seconds"] for r in results)
+        print(
+            f"finished {len(results) - len(failed)} of {len(results)} cases "
+            f"({total:.1f}s of case time on {jobs} workers)"
         )
+        if failed:
+            print(f"failed cases: {failed}")
+            raise typer.Exit(code=1)
+        return
+
+    results = []
+    try:
+        run = init_run(settings_file)
+        scenario_definitions = run["scenario_definitions"]
+
+        # Should switch the case_id/year layers in scenario settings dictionary.
+        # Run through the different cases and save files in a new folder for each.
+        for case_id in scenario_definitions["case_id"].unique():
+            print(f"starting case {case_id}")
+            start = time.perf_counter()
+            result = {
+                "case_id": case_id,
+                "status": "failed",
+                "seconds": None,
+                "built": [],
+            }
+            results.append(result)
+            with case(case_id):
+                built = run_case(
+                    case_id,
+                    run,
+                    out_folder,
+                    year_jobs,
+                    output_format,
+                    rebuild,
+                    record_folder,
+                    table_jobs,
+                )
+            result.update(status="ok", seconds=time.perf_counter() - start, built=built)
+            print(
+                f"case {case_id} ok in {result['seconds']:.1f}s "
+                f"({built_message(built)})"
+            )
+    finally:
+        # also record the stages of a run that stopped with an error
+        stages = pop_stages()
+        write_run_manifest(out_folder, results, stages, **run_info)
+        print_summary(stages)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+"""
+A small pipeline of named stages that are only evaluated when a requested table needs
+them.
+
+Stages are registered in a dictionary with the pipeline_stage decorator. The
+parameters of a stage function name the stages (or run inputs such as out_folder)
+it depends on, and its return value becomes available to later stages under the
+stage name. Stages that write files list the tables they write, e.g.
+
+    STAGES = {}
+
+    @pipeline_stage(STAGES)
+    def load_curves(connections, scenario_settings):
+        ...
+
+    @pipeline_stage(STAGES, tables=["timeseries"])
+    def timeseries_table(timeseries_df, out_folder):
+        timeseries_df.to_csv(out_folder / "timeseries.csv", index=False)
+
+run_pipeline(STAGES, ["timeseries"], {"out_folder": ...}) then evaluates only the
+stages that timeseries.csv depends on, each once, recording each as an
+instrumentation stage.
+
+With jobs > 1, stages whose dependencies are ready run concurrently on a thread pool,
+so independent tables are built side by side and the run takes about as long as its
+slowest chain of stages (the critical path) instead of the sum of all stages. Stages
+that change shared state (e.g. a GeneratorClusters object) are given the same lock
+name and never run at the same time.
+"""
+
+import inspect
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from instrumentation import inherit_stages, open_stages, stage
+
+
+def pipeline_stage(stages, tables=(), name=None, lock=None):
+    """
+    Decorator that registers a function as a stage in the stages dictionary. The
+    function's parameters are its dependencies.
+    Inputs:
+        * stages: dictionary of stages to add to
+        * tables: names of the tables (files) the stage writes
+        * name: stage name (the function name if None)
+        * lock: stages with the same lock name are never run concurrently
+    """
+
+    def register(func):
+        stage_name = name or func.__name__
+        if stage_name in stages:
+            raise ValueError(f"stage '{stage_name}' is already defined")
+        stages[stage_name] = {
+            "func": func,
+            "requires": list(inspect.signature(func).parameters),
+            "tables": list(tables),
+            "lock": lock,
+        }
+        return func
+
+    return register
+
+
+def table_stages(stages):
+    """
+    Dictionary of {table name: name of the stage that writes it}.
+    """
+    return {table: name for name, s in stages.items() for table in s["tables"]}
+
+
+def required_stages(stages, tables=None, inputs=()):
+    """
+    The stages needed to write tables, each after the stages it depends on.
+    Inputs:
+        * stages: dictionary of stages
+        * tables: table names (all tables if None)
+        * inputs: names of values given to the run, which are not stages
+    Output:
+        list of stage names in the order they can be evaluated
+    """
+    writers = table_stages(stages)
+    if tables is None:
+        tables = list(writers)
+    unknown = [t for t in tables if t not in writers]
+    if unknown:
+        raise ValueError(
+            f"unknown tables {unknown}, the tables are: {', '.join(sorted(writers))}"
+        )
+
+    order = []
+    state = {}  # "visiting" while a stage's dependencies are added, then "done"
+
+    def visit(name, path):
+        if name in inputs or state.get(name) == "done":
+            return
+        if name not in stages:
+            raise ValueError(f"stage '{path[-1]}' depends on unknown stage '{name}'")
+        if state.get(name) == "visiting":
+            raise ValueError(f"circular stage dependencies: {' -> '.join(path)}")
+        state[name] = "visiting"
+        for dep in stages[name]["requires"]:
+            visit(dep, path + [dep])
+        state[name] = "done"
+        order.append(name)
+
+    for table in tables:
+        visit(writers[table], [writers[table]])
+    return order
+
+
+def critical_path(stages, seconds):
+    """
+    Longest chain of dependent stages.
+    Inputs:
+        * stages: dictionary of stages
+        * seconds: dictionary of {stage name: wall time} of the evaluated stages, in
+          the order they can be evaluated (see required_stages)
+    Output:
+        (total seconds, list of stage names from the first stage to the last)
+    """
+    finish = {}
+    previous = {}
+    for name in seconds:
+        deps = [d for d in stages[name]["requires"] if d in finish]
+        slowest = max(deps, key=finish.get, default=None)
+        previous[name] = slowest
+        finish[name] = seconds[name] + (finish[slowest] if slowest else 0.0)
+    if not finish:
+        return 0.0, []
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return total, path[::-1]
+
+
+def _evaluate(name, func, kwargs):
+    with stage(name) as record:
+        value = func(**kwargs)
+        if hasattr(value, "shape"):
+            record["rows"] = value.shape[0]
+    return value, record["wall_s"]
+
+
+def _evaluate_inside(parents, name, func, kwargs):
+    # runs on a worker thread, recorded inside the stages of the main thread
+    with inherit_stages(parents):
+        return _evaluate(name, func, kwargs)
+
+
+def run_pipeline(stages, tables=None, inputs=None, jobs=1, name="pipeline"):
+    """
+    Evaluate the stages needed to write tables.
+    Inputs:
+        * stages: dictionary of stages
+        * tables: table names to write (all tables if None)
+        * inputs: dictionary of values that stages can depend on (e.g. out_folder)
+        * jobs: number of stages to run concurrently on a thread pool
+        * name: name of the instrumentation stage that covers the whole run
+    Output:
+        dictionary with the inputs and the value of every evaluated stage
+    """
+    values = dict(inputs or {})
+    order = required_stages(stages, tables, values)
+    seconds = {}
+    with stage(name) as record:
+        if jobs <= 1:
+            for stage_name in order:
+                s = stages[stage_name]
+                kwargs = {dep: values[dep] for dep in s["requires"]}
+                values[stage_name], seconds[stage_name] = _evaluate(
+                    stage_name, s["func"], kwargs
+                )
+        else:
+            _run_concurrently(stages, order, values, seconds, jobs)
+        record["jobs"] = jobs
+        record["stages"] = len(order)
+        record["critical_path_s"], record["critical_path"] = critical_path(
+            stages, {n: seconds[n] for n in order}
+        )
+    return values
+
+
+def _run_concurrently(stages, order, values, seconds, jobs):
+    # The main thread starts every stage whose dependencies are done (in order, so
+    # ties go to the stage the sequential run would start first) and whose lock is
+    # free, then waits for any running stage to finish.
+    pending = list(order)
+    running = {}
+    locks = set()
+    parents = open_stages()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for stage_name in list(pending):
+                if len(running) >= jobs:
+                    break
+                s = stages[stage_name]
+                if s["lock"] in locks or any(d not in values for d in s["requires"]):
+                    continue
+                pending.remove(stage_name)
+                if s["lock"] is not None:
+                    locks.add(s["lock"])
+                kwargs = {dep: values[dep] for dep in s["requires"]}
+                future = executor.submit(
+                    _evaluate_inside, parents, stage_name, s["func"], kwargs
+                )
+                running[future] = stage_name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage_name = running.pop(future)
+                locks.discard(stages[stage_name]["lock"])
+                # an error stops the run once the running stages have finished
+                values[stage_name], wall_s = future.result()
+                seconds[stage_name] = wall_s
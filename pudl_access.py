@@ -0,0 +1,282 @@
+"""
+Read-only access to the PUDL database for the converter.
+
+read_only_engine opens the PUDL sqlite file read-only with the SQLITE_PRAGMAS below
+(memory-mapped reads, a larger page cache, temp tables in memory), in a connection
+pool that can be shared by the threads of a process. Each process gets its own
+engine. The time spent executing the statements on it and fetching their rows is
+summed per table into "sql <table>" stages (PRAGMA statements are not counted).
+
+The PUDL tables hold every plant in the US, while a study only joins them against the
+few thousand plants of its own fleet. read_pudl_table selects the listed columns and
+filters rows in SQL with `plant_id_eia IN (...)`. Large id sets are written to a
+temporary table in batches and joined instead of being inlined in the query. Each read
+is recorded as a "read <table>" stage with the rows and bytes that were returned.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+from data_cache import cached_sql_frame, sqlite_fingerprint
+from instrumentation import count_stage, stage
+
+# Id sets up to this size are inlined as query parameters (sqlite allows 999 before
+# version 3.32), larger sets are inserted into a temporary table.
+MAX_IN_IDS = 500
+ID_BATCH_SIZE = 5000
+
+# Set on every new PUDL connection. query_only also blocks temporary tables, so
+# read_pudl_table turns it off while it uses one (the file is still opened with
+# mode=ro).
+SQLITE_PRAGMAS = {
+    "query_only": "ON",
+    "mmap_size": 2 * 1024**3,
+    "cache_size": -256 * 1024,  # in KiB when negative
+    "temp_store": "MEMORY",
+}
+POOL_SIZE = 8
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+# table name of a statement, used to name its stage
+_TABLE_RE = re.compile(
+    r"\b(?:FROM|INTO|TABLE(?:\s+IF(?:\s+NOT)?\s+EXISTS)?)\s+[\"\[`]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def _query_name(sql):
+    match = _TABLE_RE.search(sql)
+    if match:
+        return f"sql {match.group(1)}"
+    words = sql.split(None, 1)
+    return f"sql {words[0].lower()}" if words else "sql"
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that counts each statement in the "sql <table>" stage of its table (see
+    instrumentation.count_stage), covering the execute call and all fetches until the
+    next statement or close. PRAGMA statements are not counted.
+    """
+
+    _query = None
+
+    def _start(self, sql):
+        self._finish()
+        if sql.lstrip()[:6].upper() == "PRAGMA":
+            return
+        self._query = sql
+        self._wall = 0.0
+        self._cpu = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        if self._query is not None:
+            count_stage(_query_name(self._query), self._wall, self._cpu, self._rows)
+            self._query = None
+
+    def _timed(self, func, *args):
+        wall = time.perf_counter()
+        # the connection pool is shared by threads, count only this thread's CPU
+        cpu = time.thread_time()
+        try:
+            return func(*args)
+        finally:
+            if self._query is not None:
+                self._wall += time.perf_counter() - wall
+                self._cpu += time.thread_time() - cpu
+
+    def execute(self, sql, *args):
+        self._start(sql)
+        return self._timed(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        self._start(sql)
+        return self._timed(super().executemany, sql, *args)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and self._query is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._timed(super().fetchmany, *args)
+        if self._query is not None:
+            self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._query is not None:
+            self._rows += len(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        return super().close()
+
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = sqlite3.Connection.cursor(dbapi_connection)
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def read_only_engine(engine):
+    """
+    Return the shared read-only engine of this process for the sqlite file that
+    engine (e.g. the pudl_engine from init_pudl_connection) connects to. Engines that
+    are not backed by a sqlite file are returned unchanged.
+    """
+    import sqlalchemy as sa
+
+    fingerprint = sqlite_fingerprint(engine)
+    if fingerprint is None:
+        return engine
+    path = fingerprint["path"]
+    # engines (and their pooled connections) can't be shared with forked processes
+    key = (os.getpid(), path)
+    with _engines_lock:
+        if key not in _engines:
+            ro_engine = sa.create_engine(
+                f"sqlite:///file:{quote(path)}?mode=ro&uri=true",
+                poolclass=sa.pool.QueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=0,
+                pool_timeout=600,
+                connect_args={
+                    "check_same_thread": False,
+                    "factory": _TimedConnection,
+                },
+            )
+            sa.event.listen(ro_engine, "connect", _set_pragmas)
+            _engines[key] = ro_engine
+        return _engines[key]
+
+
+def plant_ids(*frames):
+    """
+    Sorted unique plant_id_eia values (as int) of one or more dataframes, skipping
+    missing ids and frames without a plant_id_eia column.
+    """
+    ids = set()
+    for df in frames:
+        if "plant_id_eia" in df.columns:
+            ids.update(int(i) for i in df["plant_id_eia"].dropna().unique())
+    return sorted(ids)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _set_query_only(conn, value):
+    # returns the previous setting, None for other databases or to leave it unchanged
+    import sqlalchemy as sa
+
+    if conn.dialect.name != "sqlite":
+        return None
+    previous = conn.execute(sa.text("PRAGMA query_only")).scalar()
+    if value is not None:
+        conn.execute(sa.text(f"PRAGMA query_only = {int(bool(value))}"))
+    return previous
+
+
+def _read_query(engine, table, columns, ids, where, params, parse_dates):
+    import pandas as pd
+    import sqlalchemy as sa
+
+    params = dict(params or {})
+    conditions = [f"({where})"] if where else []
+    query = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(table)}"
+    with engine.connect() as conn:
+        id_table = None
+        if ids is not None and len(ids) <= MAX_IN_IDS:
+            names = [f"plant_id_{i}" for i in range(len(ids))]
+            params.update(zip(names, ids))
+            in_list = ", ".join(f":{n}" for n in names) or "NULL"
+            conditions.append(f'"plant_id_eia" IN ({in_list})')
+        elif ids is not None:
+            # temporary tables belong to the connection, so the name can be reused
+            id_table = "plant_id_filter"
+            query_only = _set_query_only(conn, False)
+            conn.execute(
+                sa.text(f"CREATE TEMP TABLE {id_table} (id INTEGER PRIMARY KEY)")
+            )
+            insert = sa.text(f"INSERT INTO {id_table} (id) VALUES (:id)")
+            for start in range(0, len(ids), ID_BATCH_SIZE):
+                batch = ids[start : start + ID_BATCH_SIZE]
+                conn.execute(insert, [{"id": i} for i in batch])
+            conditions.append(f'"plant_id_eia" IN (SELECT id FROM {id_table})')
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        try:
+            return pd.read_sql_query(
+                sa.text(query), conn, params=params, parse_dates=parse_dates
+            )
+        finally:
+            if id_table is not None:
+                conn.execute(sa.text(f"DROP TABLE IF EXISTS {id_table}"))
+                _set_query_only(conn, query_only)
+
+
+def read_pudl_table(
+    engine,
+    table,
+    columns,
+    plant_ids=None,
+    where=None,
+    params=None,
+    parse_dates=None,
+    dtype=None,
+):
+    """
+    Read columns of a PUDL table, optionally only for some plants. Results are kept
+    in the local PUDL cache (see data_cache.cached_sql_frame).
+    Inputs:
+        * engine: sqlalchemy engine of the PUDL database
+        * table: name of the table
+        * columns: list of columns to read
+        * plant_ids: only read rows with these plant_id_eia values (all rows if None)
+        * where: extra SQL condition, with named parameters (e.g. ":year0")
+        * params: dictionary of values for the named parameters in where
+        * parse_dates: columns to parse as datetimes
+        * dtype: dictionary of {column: dtype} to convert after reading
+    Output:
+        dataframe with the columns in the order given
+    """
+    ids = None if plant_ids is None else sorted({int(i) for i in plant_ids})
+    query_params = {
+        "columns": list(columns),
+        "where": where,
+        "params": params,
+        "parse_dates": parse_dates,
+        "plant_ids": ids,
+    }
+    with stage(f"read {table}") as record:
+        record["cached"] = True
+
+        def read():
+            record["cached"] = False
+            return _read_query(engine, table, columns, ids, where, params, parse_dates)
+
+        df = cached_sql_frame(engine, table, query_params, read)
+        if dtype:
+            df = df.astype(dtype)
+        record["rows"] = len(df)
+        record["bytes"] = int(df.memory_usage(deep=True).sum())
+        record["plants"] = None if ids is None else len(ids)
+    return df
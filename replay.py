@@ -0,0 +1,135 @@
+"""
+Create the SWITCH generator and fuel files of each case from the snapshots saved with
+`pg_to_switch.py --record`. PowerGenome and the PUDL database are not used, so this
+only runs the conversion, e.g.
+
+    python pg_to_switch.py settings results --record snapshots
+    python replay.py snapshots results_replay
+"""
+
+import time
+from pathlib import Path
+from typing import List
+
+import typer
+
+from instrumentation import case, pop_stages, print_summary, stage, write_run_manifest
+from output_functions import OUTPUT_FORMATS
+from snapshots import load_snapshot, snapshot_cases
+from switch_files import GENERATOR_FRAMES, fuel_files, generator_files
+
+
+def replay_case(
+    snapshot_folder: Path, case_folder: Path, output_format: str = "csv"
+) -> List[str]:
+    """Create the generator and fuel files of a case from its snapshot
+
+    Parameters
+    ----------
+    snapshot_folder : Path
+        The snapshot folder of the case
+    case_folder : Path
+        Folder where the files are saved
+    output_format : str, optional
+        Write the tables as "csv", "parquet" or "both"
+
+    Returns
+    -------
+    List[str]
+        The groups of tables ("generators", "fuels") that were created. A group is
+        skipped when its frames are not in the snapshot.
+    """
+    with stage("load_snapshot") as record:
+        frames, info = load_snapshot(snapshot_folder)
+        record["rows"] = sum(len(df) for df in frames.values())
+    settings = info["settings"]
+    case_folder.mkdir(parents=True, exist_ok=True)
+
+    built = []
+    if all(name in frames for name in GENERATOR_FRAMES):
+        generator_files(frames, info["settings_list"], case_folder, output_format)
+        built.append("generators")
+    if "fuel_prices" in frames:
+        with stage("fuel_tables"):
+            fuel_files(
+                fuel_prices=frames["fuel_prices"],
+                planning_years=info["case_years"],
+                regions=settings["model_regions"],
+                fuel_region_map=settings["aeo_fuel_region_map"],
+                fuel_emission_factors=settings["fuel_emission_factors"],
+                out_folder=case_folder,
+                output_format=output_format,
+            )
+        built.append("fuels")
+    return built
+
+
+def main(
+    snapshot_folder: str,
+    results_folder: str,
+    case_id: List[str] = typer.Option(
+        None, "--case-id", help="Only replay these cases (all recorded cases if unset)"
+    ),
+    output_format: str = typer.Option(
+        "csv",
+        "--output-format",
+        help="Write the tables as csv, parquet or both",
+    ),
+):
+    """Create Switch generator and fuel files from recorded PowerGenome/PUDL frames
+
+    Parameters
+    ----------
+    snapshot_folder : str
+        The folder passed to `pg_to_switch.py --record`
+    results_folder : str
+        The folder where results will be saved, with a subfolder for each case
+    case_id : List[str]
+        Cases to replay. By default every case in the snapshot folder is replayed.
+    output_format : str
+        "csv", "parquet" or "both"
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise typer.BadParameter(
+            f"must be one of {', '.join(OUTPUT_FORMATS)}", param_hint="--output-format"
+        )
+    cwd = Path.cwd()
+    snapshot_folder = cwd / snapshot_folder
+    out_folder = cwd / results_folder
+    out_folder.mkdir(exist_ok=True)
+
+    case_ids = case_id or snapshot_cases(snapshot_folder)
+    results = []
+    try:
+        for case_id in case_ids:
+            start = time.perf_counter()
+            result = {
+                "case_id": case_id,
+                "status": "failed",
+                "seconds": None,
+                "built": [],
+            }
+            results.append(result)
+            with case(case_id):
+                built = replay_case(
+                    snapshot_folder / case_id, out_folder / case_id, output_format
+                )
+            result.update(status="ok", seconds=time.perf_counter() - start, built=built)
+            print(
+                f"case {case_id} ok in {result['seconds']:.1f}s "
+                f"(built {', '.join(built) or 'nothing'})"
+            )
+    finally:
+        stages = pop_stages()
+        write_run_manifest(
+            out_folder,
+            results,
+            stages,
+            replay=str(snapshot_folder),
+            output_format=output_format,
+        )
+        print_summary(stages)
+
+
+if __name__ == "__main__":
+    typer.run(main)
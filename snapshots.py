@@ -0,0 +1,105 @@
+"""
+Snapshots of the PowerGenome and PUDL frames that the SWITCH files of a case are
+created from.
+
+`pg_to_switch.py --record FOLDER` saves, for every case, the frames listed in
+switch_files.GENERATOR_FRAMES and fuel_prices to FOLDER/<case_id>, one Parquet file
+per frame (pickle for frames that Parquet can't store, e.g. object columns that mix
+types), along with the case settings. replay.py creates the SWITCH files from these
+snapshots without PowerGenome or the PUDL database.
+"""
+
+import os
+import pickle
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+SNAPSHOT_INFO_FN = "settings.pkl"
+SNAPSHOT_SUFFIXES = (".parquet", ".pkl")
+
+
+def _replace(path, write_func):
+    # write to a temporary file first so an interrupted run never leaves a partial file
+    tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_frame(folder, name, df):
+    """
+    Save a dataframe as folder/name.parquet, or folder/name.pkl if it can't be stored
+    as Parquet. Any older copy with the other suffix is removed.
+    """
+    folder = Path(folder)
+    try:
+        _replace(folder / f"{name}.parquet", lambda p: df.to_parquet(p))
+        stale = folder / f"{name}.pkl"
+    except (ImportError, NotImplementedError, TypeError, ValueError):
+        _replace(folder / f"{name}.pkl", lambda p: df.to_pickle(p))
+        stale = folder / f"{name}.parquet"
+    stale.unlink(missing_ok=True)
+
+
+def read_frame(folder, name):
+    """
+    Load a dataframe saved with write_frame.
+    """
+    folder = Path(folder)
+    path = folder / f"{name}.parquet"
+    if path.exists():
+        return pd.read_parquet(path)
+    return pd.read_pickle(folder / f"{name}.pkl")
+
+
+def save_snapshot(folder, frames, info=None):
+    """
+    Save frames (and optionally the case settings) to the snapshot folder of a case.
+    Frames that are already in the folder are replaced, others are kept.
+    Inputs:
+        * folder: snapshot folder of one case
+        * frames: dictionary of {frame name: dataframe}
+        * info: dictionary with the "settings", "settings_list" and "case_years" of
+          the case (not changed if None)
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, df in frames.items():
+        write_frame(folder, name, df)
+    if info is not None:
+
+        def dump(path):
+            with open(path, "wb") as f:
+                pickle.dump(info, f)
+
+        _replace(folder / SNAPSHOT_INFO_FN, dump)
+
+
+def load_snapshot(folder):
+    """
+    Load the frames and case settings saved with save_snapshot.
+    Output:
+        tuple of ({frame name: dataframe}, case settings dictionary)
+    """
+    folder = Path(folder)
+    with open(folder / SNAPSHOT_INFO_FN, "rb") as f:
+        info = pickle.load(f)
+    frames = {
+        p.stem: read_frame(folder, p.stem)
+        for p in sorted(folder.iterdir())
+        if p.suffix in SNAPSHOT_SUFFIXES and p.name != SNAPSHOT_INFO_FN
+    }
+    return frames, info
+
+
+def snapshot_cases(folder):
+    """
+    Case ids with a snapshot in the record folder.
+    """
+    return sorted(
+        p.name for p in Path(folder).iterdir() if (p / SNAPSHOT_INFO_FN).exists()
+    )
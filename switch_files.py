@@ -0,0 +1,394 @@
+"""
+Create the SWITCH generator and fuel files from the frames that PowerGenome builds.
+
+Nothing here imports PowerGenome, so the same files can be created from frames
+recorded in an earlier run (see snapshots.py and replay.py).
+"""
+
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from conversion_functions import (
+    switch_fuel_cost_table,
+    switch_fuels,
+    plant_pudl_id,
+    gen_build_predetermined,
+    gen_build_costs_table,
+    generation_projects_info,
+)
+from output_functions import write_table
+from instrumentation import stage
+
+
+def fuel_files(
+    fuel_prices: pd.DataFrame,
+    planning_years: List[int],
+    regions: List[str],
+    fuel_region_map: Dict[str, List[str]],
+    fuel_emission_factors: Dict[str, float],
+    out_folder: Path,
+    output_format: str = "csv",
+):
+
+    fuel_cost = switch_fuel_cost_table(
+        fuel_region_map,
+        fuel_prices,
+        regions,
+        scenario="reference",
+        year_list=planning_years,
+    )
+
+    fuels_table = switch_fuels(fuel_prices, fuel_emission_factors)
+    fuels_table.loc[len(fuels_table.index)] = [
+        "Fuel",
+        0,
+        0,
+    ]  # adding in a dummy fuel for regional_fuel_market
+
+    write_table(fuel_cost, out_folder, "fuel_cost", output_format)
+    write_table(fuels_table, out_folder, "fuels", output_format)
+
+
+def gen_projects_info_file(
+    complete_gens: pd.DataFrame,
+    settings: dict,
+    out_folder: Path,
+    output_format: str = "csv",
+):
+
+    if settings.get("cogen_tech"):
+        cogen_tech = settings["cogen_tech"]
+    else:
+        cogen_tech = {
+            "Onshore Wind Turbine": False,
+            "Biomass": False,
+            "Conventional Hydroelectric": False,
+            "Conventional Steam Coal": False,
+            "Natural Gas Fired Combined Cycle": False,
+            "Natural Gas Fired Combustion Turbine": False,
+            "Natural Gas Steam Turbine": False,
+            "Nuclear": False,
+            "Solar Photovoltaic": False,
+            "Hydroelectric Pumped Storage": False,
+            "Offshore Wind Turbine": False,
+            "Small Hydroelectric": False,
+            "NaturalGas_CCCCSAvgCF_Conservative": False,
+            "NaturalGas_CCAvgCF_Moderate": False,
+            "NaturalGas_CTAvgCF_Moderate": False,
+            "Battery_*_Moderate": False,
+            "NaturalGas_CCS100_Moderate": False,
+            "heat_load_shifting": False,
+        }
+    if settings.get("baseload_tech"):
+        baseload_tech = settings.get("baseload_tech")
+    else:
+        baseload_tech = {
+            "Onshore Wind Turbine": False,
+            "Biomass": False,
+            "Conventional Hydroelectric": False,
+            "Conventional Steam Coal": True,
+            "Natural Gas Fired Combined Cycle": False,
+            "Natural Gas Fired Combustion Turbine": False,
+            "Natural Gas Steam Turbine": False,
+            "Nuclear": True,
+            "Solar Photovoltaic": False,
+            "Hydroelectric Pumped Storage": False,
+            "Offshore Wind Turbine": False,
+            "Small Hydroelectric": False,
+            "NaturalGas_CCCCSAvgCF_Conservative": False,
+            "NaturalGas_CCAvgCF_Moderate": False,
+            "NaturalGas_CTAvgCF_Moderate": False,
+            "Battery_*_Moderate": False,
+            "NaturalGas_CCS100_Moderate": False,
+            "heat_load_shifting": False,
+        }
+    if settings.get("energy_tech"):
+        energy_tech = settings["energy_tech"]
+    else:
+        energy_tech = {
+            "Onshore Wind Turbine": "Wind",
+            "Biomass": "Bio Solid",
+            "Conventional Hydroelectric": "Water",
+            "Conventional Steam Coal": "Coal",
+            "Natural Gas Fired Combined Cycle": "Naturalgas",
+            "Natural Gas Fired Combustion Turbine": "Naturalgas",
+            "Natural Gas Steam Turbine": "Naturalgas",
+            "Nuclear": "Uranium",
+            "Solar Photovoltaic": "Solar",
+            "Hydroelectric Pumped Storage": "Water",
+            "Offshore Wind Turbine": "Wind",
+            "Small Hydroelectric": "Water",
+            "NaturalGas_CCCCSAvgCF_Conservative": "Naturalgas",
+            "NaturalGas_CCAvgCF_Moderate": "Naturalgas",
+            "NaturalGas_CTAvgCF_Moderate": "Naturalgas",
+            "Battery_*_Moderate": "Electricity",
+            "NaturalGas_CCS100_Moderate": "Naturalgas",
+            "heat_load_shifting": False,
+        }
+    if settings.get("forced_outage_tech"):
+        forced_outage_tech = settings["forced_outage_tech"]
+    else:
+        forced_outage_tech = {
+            "Onshore Wind Turbine": 0.0,
+            "Biomass": 0.04,
+            "Conventional Hydroelectric": 0.05,
+            "Conventional Steam Coal": 0.04,
+            "Natural Gas Fired Combined Cycle": 0.4,
+            "Natural Gas Fired Combustion Turbine": 0.4,
+            "Natural Gas Steam Turbine": 0.4,
+            "Nuclear": 0.04,
+            "Solar Photovoltaic": 0.0,
+            "Hydroelectric Pumped Storage": 0.05,
+            "Offshore Wind Turbine": 0.05,
+            "Small Hydroelectric": 0.05,
+            "NaturalGas_CCCCSAvgCF_Conservative": 0.4,
+            "NaturalGas_CCAvgCF_Moderate": 0.4,
+            "NaturalGas_CTAvgCF_Moderate": 0.4,
+            "Battery_*_Moderate": 0.02,
+            "NaturalGas_CCS100_Moderate": 0.4,
+            "heat_load_shifting": False,
+        }
+    if settings.get("sched_outage_tech"):
+        sched_outage_tech = settings["sched_outage_tech"]
+    else:
+        sched_outage_tech = {
+            "Onshore Wind Turbine": 0.0,
+            "Biomass": 0.06,
+            "Conventional Hydroelectric": 0.05,
+            "Conventional Steam Coal": 0.06,
+            "Natural Gas Fired Combined Cycle": 0.6,
+            "Natural Gas Fired Combustion Turbine": 0.6,
+            "Natural Gas Steam Turbine": 0.6,
+            "Nuclear": 0.06,
+            "Solar Photovoltaic": 0.0,
+            "Hydroelectric Pumped Storage": 0.05,
+            "Offshore Wind Turbine": 0.01,
+            "Small Hydroelectric": 0.05,
+            "NaturalGas_CCCCSAvgCF_Conservative": 0.6,
+            "NaturalGas_CCAvgCF_Moderate": 0.6,
+            "NaturalGas_CTAvgCF_Moderate": 0.6,
+            "Battery_*_Moderate": 0.01,
+            "NaturalGas_CCS100_Moderate": 0.6,
+            "heat_load_shifting": False,
+        }
+
+    gen_project_info = generation_projects_info(
+        complete_gens,
+        settings.get("transmission_investment_cost")["spur"]["capex_mw_mile"],
+        settings.get("retirement_ages"),
+        cogen_tech,
+        baseload_tech,
+        energy_tech,
+        sched_outage_tech,
+        forced_outage_tech,
+    )
+
+    # Do I need to set full load heat rate to "." for non-fuel energy generators?
+    write_table(gen_project_info, out_folder, "generation_projects_info", output_format)
+
+
+# frames that generator_files creates the generator tables from
+GENERATOR_FRAMES = [
+    "all_gen",
+    "units_model",
+    "operating_860m",
+    "proposed_gens",
+    "generators_eia860",
+    "generators_entity_eia",
+    "new_generators",
+    "complete_gens",
+]
+
+
+def existing_generators(all_gen: pd.DataFrame) -> pd.DataFrame:
+    """Existing generators (those with an EIA plant id) from create_all_generators
+
+    `plant_id_eia` of `all_gen` is converted to a nullable integer in place.
+    """
+    all_gen["plant_id_eia"] = all_gen["plant_id_eia"].astype("Int64")
+    return all_gen.loc[
+        all_gen["plant_id_eia"].notna(), :
+    ]  # gc.create_region_technology_clusters()
+
+
+def complete_generators(
+    all_gen: pd.DataFrame, new_generators: pd.DataFrame
+) -> pd.DataFrame:
+    """Create a complete list of existing and new-build options"""
+    return pd.concat([existing_generators(all_gen), new_generators]).drop_duplicates(
+        subset=["Resource"]
+    )
+
+
+def generator_files(
+    frames: Dict[str, pd.DataFrame],
+    settings_list: List[dict],
+    out_folder: Path,
+    output_format: str = "csv",
+):
+    """Write the generation_projects_info, gen_build_predetermined and gen_build_costs
+    tables of a case
+
+    Parameters
+    ----------
+    frames : Dict[str, pd.DataFrame]
+        The frames listed in `GENERATOR_FRAMES` (see `gen_build_files`)
+    settings_list : List[dict]
+        Settings for each planning year of the case, in order
+    out_folder : Path
+        The case folder
+    output_format : str, optional
+        Write the tables as "csv", "parquet" or "both"
+    """
+    out_folder.mkdir(parents=True, exist_ok=True)
+    gen_build_files(frames, settings_list, out_folder, output_format)
+    with stage("generation_projects_info"):
+        gen_projects_info_file(
+            frames["complete_gens"], settings_list[-1], out_folder, output_format
+        )
+
+
+def gen_build_files(
+    frames: Dict[str, pd.DataFrame],
+    settings_list: List[dict],
+    out_folder: Path,
+    output_format: str = "csv",
+):
+    """Write the gen_build_predetermined and gen_build_costs tables of a case
+
+    Parameters
+    ----------
+    frames : Dict[str, pd.DataFrame]
+        The frames listed in `GENERATOR_FRAMES`: "all_gen", "units_model",
+        "operating_860m" and "proposed_gens" from `create_all_generators`, the
+        "generators_eia860" and "generators_entity_eia" PUDL tables, the
+        "new_generators" of every planning year (with a "build_year" column) and
+        "complete_gens" (existing and new generators with `add_misc_gen_values`),
+        which is only used by `generator_files`
+    settings_list : List[dict]
+        Settings for each planning year of the case, in order
+    out_folder : Path
+        The case folder
+    output_format : str, optional
+        Write the tables as "csv", "parquet" or "both"
+    """
+    out_folder.mkdir(parents=True, exist_ok=True)
+    settings = settings_list[0]
+    all_gen = frames["all_gen"]
+    existing_gen = existing_generators(all_gen)
+
+    # create copies of PUDL tables and filter to relevant columns
+    pudl_gen = frames["generators_eia860"].copy()
+    pudl_gen = pudl_gen[
+        [
+            "plant_id_eia",
+            "generator_id",
+            "operational_status",
+            "retirement_date",
+            "planned_retirement_date",
+            "current_planned_operating_date",
+        ]
+    ]  #'utility_id_eia',
+
+    pudl_gen_entity = frames["generators_entity_eia"].copy()
+    pudl_gen_entity = pudl_gen_entity[
+        ["plant_id_eia", "generator_id", "operating_date"]
+    ]
+
+    eia_Gen = frames["operating_860m"]
+    eia_Gen = eia_Gen[
+        [
+            "utility_id_eia",
+            "utility_name",
+            "plant_id_eia",
+            "plant_name",
+            "generator_id",
+            "Operating Year",
+            "Planned Retirement Year",
+        ]
+    ]
+    eia_Gen = eia_Gen.loc[eia_Gen["plant_id_eia"].notna(), :]
+
+    eia_Gen_prop = frames["proposed_gens"].reset_index()
+    eia_Gen_prop = eia_Gen_prop[
+        [
+            # "utility_id_eia",
+            # "utility_name",
+            "plant_id_eia",
+            # "plant_name",
+            "generator_id",
+            "planned_operating_year",
+        ]
+    ]
+    eia_Gen_prop = eia_Gen_prop.loc[eia_Gen_prop["plant_id_eia"].notna(), :]
+
+    # create copies of potential_build_yr (powergenome)
+    pg_build = frames["units_model"].copy()
+    pg_build = pg_build[
+        [
+            "plant_id_eia",
+            "generator_id",
+            "unit_id_pudl",
+            "planned_operating_year",
+            "planned_retirement_date",
+            "operating_date",
+            "Operating Year",
+            "retirement_year",
+        ]
+    ]
+
+    retirement_ages = settings.get("retirement_ages")
+
+    # gen_build_predetermined matches the tables on (plant_id_eia, generator_id) and
+    # (plant_id_eia, unit_id_pudl). The plant+pudl id of all_gen is kept in
+    # gen_build_with_id.
+    all_gen = plant_pudl_id(all_gen)
+
+    with stage("gen_build_predetermined") as record:
+        gen_buildpre, gen_build_with_id = gen_build_predetermined(
+            all_gen,
+            pudl_gen,
+            pudl_gen_entity,
+            pg_build,
+            {},  # manual_build_yr,
+            eia_Gen,
+            eia_Gen_prop,
+            {},  # plant_gen_manual,
+            {},  # plant_gen_manual_proposed,
+            {},  # plant_gen_manual_retired,
+            retirement_ages,
+        )
+        record["rows"] = len(gen_build_with_id)
+
+    retired = gen_build_with_id.loc[
+        gen_build_with_id["retirement_year"] < settings["model_year"], :
+    ]
+    retired_ids = retired["GENERATION_PROJECT"].to_list()
+
+    newgens = frames["new_generators"]
+
+    build_yr_list = gen_build_with_id["build_year"].to_list()
+    # using gen_build_with_id because it has plants that were removed for the final gen_build_pred. (ie. build year=2020)
+    gen_project = gen_build_with_id["GENERATION_PROJECT"].to_list()
+    build_yr_plantid_dict = dict(zip(gen_project, build_yr_list))
+
+    with stage("gen_build_costs") as record:
+        gen_build_costs = gen_build_costs_table(
+            existing_gen, newgens, build_yr_plantid_dict, all_gen
+        )
+        record["rows"] = len(gen_build_costs)
+
+    gen_build_costs.drop(
+        gen_build_costs[gen_build_costs["GENERATION_PROJECT"].isin(retired_ids)].index,
+        inplace=True,
+    )
+    # drop retired plants
+    gen_buildpre.drop(
+        gen_buildpre[gen_buildpre["GENERATION_PROJECT"].isin(retired_ids)].index,
+        inplace=True,
+    )
+
+    write_table(gen_buildpre, out_folder, "gen_build_predetermined", output_format)
+    write_table(gen_build_costs, out_folder, "gen_build_costs", output_format)
@@ -0,0 +1,182 @@
+"""
+Incremental rebuilds: build_manifest and the input hashes of pg_to_switch.run_case.
+"""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+sa = pytest.importorskip("sqlalchemy")
+
+import pg_to_switch
+from build_manifest import (
+    FUEL_TABLES,
+    GENERATOR_TABLES,
+    is_up_to_date,
+    load_manifest,
+    record_build,
+    save_manifest,
+    table_files,
+)
+
+CASE_ID = "p1"
+YEARS = [2030, 2040]
+
+
+def make_db(path):
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (a INTEGER)")
+    return engine
+
+
+def change_db(engine):
+    # a new table adds a page, so the size in the fingerprint changes
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE u (a INTEGER)")
+
+
+@pytest.fixture
+def run(tmp_path):
+    settings = {
+        "input_folder": tmp_path,
+        "model_regions": ["a", "b"],
+        "aeo_fuel_region_map": {"x": ["a", "b"]},
+        "fuel_emission_factors": {"coal": 0.1},
+    }
+    (tmp_path / "atb_modifiers.csv").write_text("technology,capex\n")
+    scenario_settings = {
+        year: {
+            CASE_ID: {
+                **settings,
+                "model_year": year,
+                "regional_load_fn": "l.csv",
+                "atb_modifiers_fn": "atb_modifiers.csv",
+            }
+        }
+        for year in YEARS
+    }
+    return {
+        "settings": settings,
+        "scenario_definitions": pd.DataFrame(
+            {"case_id": [CASE_ID] * len(YEARS), "year": YEARS, "demand": ["mid"] * 2}
+        ),
+        "scenario_settings": scenario_settings,
+        "pudl_engine": make_db(tmp_path / "pudl.sqlite"),
+        "pudl_out": None,
+        "pg_engine": make_db(tmp_path / "pg.sqlite"),
+    }
+
+
+@pytest.fixture
+def built_tables(monkeypatch):
+    """Replace the table stages with a stub that writes empty files and records the
+    tables each run_case call builds"""
+    calls = []
+
+    def fake_run_pipeline(stages, tables, inputs, jobs=1, name="pipeline"):
+        calls.append(sorted(tables))
+        for fn in table_files(tables, inputs["output_format"]):
+            (inputs["case_folder"] / fn).write_text("")
+        return {}
+
+    monkeypatch.setattr(pg_to_switch, "run_pipeline", fake_run_pipeline)
+    return calls
+
+
+def run_case(run, out_folder):
+    return pg_to_switch.run_case(CASE_ID, run, out_folder)
+
+
+def test_record_build_round_trip(tmp_path):
+    files = table_files(FUEL_TABLES, "both")
+    for fn in files:
+        (tmp_path / fn).write_text("")
+    manifest = load_manifest(tmp_path)
+    assert not is_up_to_date(manifest, tmp_path, "fuels", "h1", files)
+
+    record_build(manifest, "fuels", "h1", files)
+    save_manifest(tmp_path, manifest)
+    manifest = load_manifest(tmp_path)
+    assert is_up_to_date(manifest, tmp_path, "fuels", "h1", files)
+    assert not is_up_to_date(manifest, tmp_path, "fuels", "h2", files)
+    # a format that writes more files than were built
+    assert not is_up_to_date(
+        manifest, tmp_path, "fuels", "h1", files + ["fuels.feather"]
+    )
+
+    (tmp_path / files[0]).unlink()
+    assert not is_up_to_date(manifest, tmp_path, "fuels", "h1", files)
+
+
+def test_unreadable_manifest_is_empty(tmp_path):
+    (tmp_path / "build_manifest.json").write_text("{not json")
+    assert load_manifest(tmp_path) == {"groups": {}}
+
+
+def test_unchanged_inputs_are_skipped(run, tmp_path, built_tables):
+    out = tmp_path / "out"
+    assert run_case(run, out) == ["generators", "fuels"]
+    assert built_tables == [sorted(GENERATOR_TABLES + FUEL_TABLES)]
+    assert run_case(run, out) == []
+    assert len(built_tables) == 1
+
+
+def test_missing_file_is_rebuilt(run, tmp_path, built_tables):
+    out = tmp_path / "out"
+    run_case(run, out)
+    (out / CASE_ID / "fuels.csv").unlink()
+    assert run_case(run, out) == ["fuels"]
+    assert built_tables[-1] == sorted(FUEL_TABLES)
+
+
+def set_generator_setting(run):
+    for year in YEARS:
+        run["scenario_settings"][year][CASE_ID]["atb_cost_case"] = "Advanced"
+
+
+def set_case_setting(run):
+    # fuel tables use all case settings, generators only the generator settings
+    run["settings"]["model_regions"] = ["a", "b", "c"]
+
+
+def set_demand_setting(run):
+    for year in YEARS:
+        run["scenario_settings"][year][CASE_ID]["regional_load_fn"] = "l2.csv"
+
+
+def set_scenario_row(run):
+    run["scenario_definitions"].loc[0, "demand"] = "high"
+
+
+def set_pudl_db(run):
+    change_db(run["pudl_engine"])
+
+
+def set_pg_db(run):
+    change_db(run["pg_engine"])
+
+
+def set_input_file(run):
+    path = run["settings"]["input_folder"] / "atb_modifiers.csv"
+    path.write_text("technology,capex\nUtilityPV,1.1\n")
+
+
+@pytest.mark.parametrize(
+    "change, rebuilt",
+    [
+        (set_generator_setting, ["generators", "fuels"]),
+        (set_case_setting, ["fuels"]),
+        (set_demand_setting, ["fuels"]),
+        (set_scenario_row, ["generators", "fuels"]),
+        (set_pudl_db, ["generators", "fuels"]),
+        (set_pg_db, ["generators", "fuels"]),
+        (set_input_file, ["generators"]),
+    ],
+)
+def test_changed_input_is_rebuilt(run, tmp_path, built_tables, change, rebuilt):
+    out = tmp_path / "out"
+    run_case(run, out)
+    change(run)
+    assert run_case(run, out) == rebuilt
+    # and the next run with the same inputs skips them again
+    assert run_case(run, out) == []
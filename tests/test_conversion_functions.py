@@ -0,0 +1,183 @@
+"""
+Matching of plant and generator ids in conversion_functions.gen_build_predetermined.
+"""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+
+import conversion_functions as cf
+
+NAN = np.nan
+RETIREMENT_AGES = {"Coal": 30, "Gas": 50, "Solar": 25}
+YEAR_COLUMNS = [
+    "operating_date",
+    "planned_retirement_date",
+    "Operating Year",
+    "planned_operating_year",
+    "retirement_year",
+]
+
+
+def make_pg_build(rows):
+    df = pd.DataFrame(
+        rows, columns=["plant_id_eia", "generator_id", "unit_id_pudl", "Operating Year"]
+    )
+    for c in YEAR_COLUMNS:
+        if c not in df:
+            df[c] = NAN
+    return df
+
+
+def make_all_gen(rows):
+    df = pd.DataFrame(
+        rows, columns=["index", "plant_id_eia", "unit_id_pudl", "technology"]
+    )
+    df["Cap_Size"] = 10.0
+    df["capex_mwh"] = NAN
+    df["region"] = "a"
+    return cf.plant_pudl_id(df)
+
+
+def years_frame(rows, column):
+    return pd.DataFrame(rows, columns=["plant_id_eia", "generator_id", column])
+
+
+def pudl_gen_frame(rows=()):
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "plant_id_eia",
+            "generator_id",
+            "current_planned_operating_date",
+            "planned_retirement_date",
+            "retirement_date",
+        ],
+    )
+
+
+def build_predetermined(
+    pg_build,
+    all_gen,
+    pudl_gen=None,
+    pudl_gen_entity=None,
+    eia_Gen=None,
+    plant_gen_manual=None,
+    plant_gen_manual_retired=None,
+):
+    gen_buildpre, gen_build_with_id = cf.gen_build_predetermined(
+        all_gen,
+        pudl_gen if pudl_gen is not None else pudl_gen_frame(),
+        pudl_gen_entity
+        if pudl_gen_entity is not None
+        else years_frame([], "operating_date"),
+        pg_build,
+        {},
+        eia_Gen if eia_Gen is not None else years_frame([], "Operating Year"),
+        years_frame([], "planned_operating_year"),
+        plant_gen_manual or {},
+        {},
+        plant_gen_manual_retired or {},
+        RETIREMENT_AGES,
+    )
+    return gen_buildpre, gen_build_with_id.set_index("GENERATION_PROJECT")
+
+
+def test_float_ids_match_string_ids():
+    # pg_build has string generator ids and integer units, the PUDL tables and
+    # all_gen have the same ids read as floats
+    pg_build = make_pg_build([(100, "1", 1, NAN), (200, "2", 2, NAN)])
+    all_gen = make_all_gen([(0, 100.0, 1.0, "Coal"), (1, 200.0, 2.0, "Gas")])
+    pudl_gen_entity = years_frame(
+        [
+            (100.0, 1.0, pd.Timestamp("1990-06-01")),
+            (200.0, "2", pd.Timestamp("2001-03-01")),
+        ],
+        "operating_date",
+    )
+    pudl_gen = pudl_gen_frame([(200.0, 2.0, NAN, pd.Timestamp("2035-12-31"), NAN)])
+
+    gen_buildpre, with_id = build_predetermined(
+        pg_build, all_gen, pudl_gen=pudl_gen, pudl_gen_entity=pudl_gen_entity
+    )
+
+    assert gen_buildpre["build_year"].tolist() == [1990, 2001]
+    # calculated from the retirement age, or the earlier planned retirement
+    assert with_id["retirement_year"].tolist() == [2020, 2035]
+
+
+def test_legacy_manual_keys():
+    # the manual dictionaries use "plant_generator" keys made from float plant ids
+    pg_build = make_pg_build([(57943, "6", 1, NAN), (57944, "GT1", 1, NAN)])
+    all_gen = make_all_gen([(0, 57943, 1, "Solar"), (1, 57944, 1, "Gas")])
+
+    gen_buildpre, with_id = build_predetermined(
+        pg_build,
+        all_gen,
+        plant_gen_manual={"57943.0_6": 2012, "57944_GT1": 1999},
+        plant_gen_manual_retired={"57944.0_GT1": 2030},
+    )
+
+    assert gen_buildpre["build_year"].tolist() == [2012, 1999]
+    assert with_id["retirement_year"].tolist() == [2037, 2030]
+
+
+def test_missing_ids_do_not_match():
+    # rows without a plant id must not pick up the years of other rows without one
+    pg_build = make_pg_build([(100, "1", 1, 1985), (NAN, "1", NAN, 1970)])
+    all_gen = make_all_gen([(0, 100, 1, "Coal"), (NAN, NAN, NAN, "Solar")])
+    eia_Gen = years_frame([(NAN, "1", 2015), (100, NAN, 2016)], "Operating Year")
+    pudl_gen_entity = years_frame([(NAN, 1.0, "2014")], "operating_date")
+
+    gen_buildpre, with_id = build_predetermined(
+        pg_build, all_gen, pudl_gen_entity=pudl_gen_entity, eia_Gen=eia_Gen
+    )
+
+    # new builds (no "index") are left out of the table
+    assert gen_buildpre["GENERATION_PROJECT"].tolist() == [1]
+    assert gen_buildpre["build_year"].tolist() == [1985]
+    assert with_id.loc[1, "retirement_year"] == 2015
+
+
+def test_build_year_2020_is_dropped():
+    pg_build = make_pg_build([(100, "1", 1, 2020), (200, "1", 1, 2010)])
+    all_gen = make_all_gen([(0, 100, 1, "Solar"), (1, 200, 1, "Solar")])
+
+    gen_buildpre, with_id = build_predetermined(pg_build, all_gen)
+
+    assert gen_buildpre["GENERATION_PROJECT"].tolist() == [2]
+    assert with_id["build_year"].tolist() == [2020, 2010]
+
+
+def test_hydro_timeseries_months():
+    from benchmarks.synthetic_data import make_case
+
+    data = make_case(
+        num_regions=3, num_plants=60, weather_yrs=2, period_list=("2030", "2040")
+    )
+    existing_gen = data["existing_gen"]
+    hydro_variability = data["hydro_variability"]
+
+    hydro = cf.hydro_timeseries(existing_gen, hydro_variability, data["period_list"])
+
+    hydro_gen = existing_gen.loc[existing_gen["technology"].str.contains("Hydro")]
+    assert not hydro_gen.empty
+    assert len(hydro) == len(hydro_gen) * 12 * 2
+    # month of each hour from the calendar, repeated for every weather year
+    hours = np.arange(len(hydro_variability)) % 8760
+    months = (pd.Timestamp("2021-01-01") + pd.to_timedelta(hours, unit="h")).month
+    for i, gen in hydro_gen.iterrows():
+        cap = hydro_variability[gen["region"]].to_numpy() * gen["Cap_Size"]
+        by_month = pd.Series(cap).groupby(months)
+        expected = hydro.loc[
+            (hydro["hydro_project"] == i + 1)
+            & hydro["timeseries"].str.startswith("2040_")
+        ]
+        assert expected["timeseries"].tolist() == [f"2040_M{m}" for m in range(1, 13)]
+        np.testing.assert_allclose(
+            expected["hydro_min_flow_mw_raw"], by_month.min().to_numpy()
+        )
+        np.testing.assert_allclose(
+            expected["hydro_avg_flow_mw_raw"], by_month.mean().to_numpy()
+        )
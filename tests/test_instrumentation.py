@@ -0,0 +1,112 @@
+"""
+Stage records of instrumentation when stages run on several threads.
+"""
+
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from instrumentation import count_stage, inherit_stages, open_stages, pop_stages, stage
+
+
+@pytest.fixture(autouse=True)
+def clear_stages():
+    pop_stages()
+    yield
+    pop_stages()
+
+
+def burn_cpu(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def records(name):
+    return [r for r in pop_stages() if r["stage"] == name]
+
+
+def test_cpu_time_is_per_thread():
+    started = threading.Event()
+    done = threading.Event()
+
+    def waiting():
+        with stage("waiting"):
+            started.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=waiting)
+    thread.start()
+    started.wait(5)
+    with stage("busy"):
+        burn_cpu(0.3)
+    done.set()
+    thread.join()
+
+    stages = {r["stage"]: r for r in pop_stages()}
+    assert stages["busy"]["cpu_s"] >= 0.3
+    assert stages["waiting"]["cpu_s"] < 0.1
+    assert stages["busy"]["concurrent"] and stages["waiting"]["concurrent"]
+
+
+def test_inherited_stages_add_cpu_to_parent():
+    with stage("parent"):
+        parents = open_stages()
+
+        def work():
+            with inherit_stages(parents), stage("child"):
+                burn_cpu(0.2)
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    stages = {r["stage"]: r for r in pop_stages()}
+    assert stages["child"]["cpu_s"] >= 0.2
+    assert stages["parent"]["cpu_s"] >= stages["child"]["cpu_s"]
+    # a stage inside its parent on another thread does not overlap it
+    assert not stages["child"]["concurrent"]
+    assert not stages["parent"]["concurrent"]
+
+
+def test_traced_peak_is_empty_for_overlapping_stages():
+    tracemalloc.start()
+    try:
+        with stage("alone"):
+            data = bytearray(2 * 1024**2)
+        del data
+
+        started = threading.Event()
+        done = threading.Event()
+
+        def other():
+            with stage("other"):
+                started.set()
+                done.wait(5)
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        started.wait(5)
+        with stage("overlapping"):
+            data = bytearray(1024**2)
+        done.set()
+        thread.join()
+    finally:
+        tracemalloc.stop()
+
+    stages = {r["stage"]: r for r in pop_stages()}
+    assert stages["alone"]["traced_peak_mb"] >= 2
+    assert stages["overlapping"]["traced_peak_mb"] is None
+    assert stages["other"]["traced_peak_mb"] is None
+
+
+def test_counted_stages_are_summed():
+    for _ in range(100):
+        count_stage("sql t", 0.01, 0.005, 2)
+    (record,) = records("sql t")
+    assert record["calls"] == 100
+    assert record["rows"] == 200
+    assert record["wall_s"] == pytest.approx(1.0)
+    assert records("sql t") == []
@@ -0,0 +1,114 @@
+"""
+pipeline.run_pipeline with stub stages: serial and concurrent runs write the same
+tables and respect stage locks.
+"""
+
+import threading
+import time
+
+import pytest
+
+from instrumentation import pop_stages
+from pipeline import pipeline_stage, required_stages, run_pipeline
+
+STAGES = {}
+# stages holding the "shared" lock at the moment
+_holding = []
+_holding_lock = threading.Lock()
+
+
+def hold_shared(name):
+    with _holding_lock:
+        assert not _holding, f"{name} runs while {_holding} holds the lock"
+        _holding.append(name)
+    time.sleep(0.02)
+    with _holding_lock:
+        _holding.remove(name)
+
+
+@pipeline_stage(STAGES)
+def base(n):
+    time.sleep(0.02)
+    return list(range(n))
+
+
+@pipeline_stage(STAGES, lock="shared")
+def squares(base):
+    hold_shared("squares")
+    return [x * x for x in base]
+
+
+@pipeline_stage(STAGES, lock="shared")
+def cubes(base):
+    hold_shared("cubes")
+    return [x**3 for x in base]
+
+
+@pipeline_stage(STAGES)
+def labels(n):
+    time.sleep(0.02)
+    return [f"id{i}" for i in range(n)]
+
+
+@pipeline_stage(STAGES, tables=["squares"])
+def squares_table(squares, labels, out_folder):
+    lines = [f"{i},{x}" for i, x in zip(labels, squares)]
+    (out_folder / "squares.csv").write_text("\n".join(lines))
+
+
+@pipeline_stage(STAGES, tables=["cubes"])
+def cubes_table(cubes, labels, out_folder):
+    lines = [f"{i},{x}" for i, x in zip(labels, cubes)]
+    (out_folder / "cubes.csv").write_text("\n".join(lines))
+
+
+@pipeline_stage(STAGES, tables=["labels"])
+def labels_table(labels, out_folder):
+    (out_folder / "labels.csv").write_text("\n".join(labels))
+
+
+def run(tmp_path, jobs, tables=None):
+    out_folder = tmp_path / f"jobs{jobs}"
+    out_folder.mkdir()
+    pop_stages()
+    values = run_pipeline(STAGES, tables, {"n": 50, "out_folder": out_folder}, jobs)
+    return out_folder, values, pop_stages()
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_concurrent_run_writes_the_same_tables(tmp_path, jobs):
+    serial, _, _ = run(tmp_path, 1)
+    concurrent, _, stages = run(tmp_path, jobs)
+
+    files = sorted(p.name for p in serial.iterdir())
+    assert files == ["cubes.csv", "labels.csv", "squares.csv"]
+    assert sorted(p.name for p in concurrent.iterdir()) == files
+    for fn in files:
+        assert (concurrent / fn).read_bytes() == (serial / fn).read_bytes()
+
+    (pipeline,) = [r for r in stages if r["stage"] == "pipeline"]
+    assert pipeline["jobs"] == jobs
+    assert pipeline["stages"] == len(STAGES)
+    # base and labels sleep side by side
+    assert any(r["concurrent"] for r in stages if r["stage"] in ("base", "labels"))
+
+
+def test_only_required_stages_run(tmp_path):
+    assert required_stages(STAGES, ["labels"], ["n", "out_folder"]) == [
+        "labels",
+        "labels_table",
+    ]
+    out_folder, values, _ = run(tmp_path, 4, ["labels"])
+    assert sorted(p.name for p in out_folder.iterdir()) == ["labels.csv"]
+    assert "squares" not in values
+
+
+def test_stage_error_is_raised(tmp_path):
+    stages = {}
+
+    @pipeline_stage(stages, tables=["t"])
+    def fails(n):
+        raise ValueError("stage failed")
+
+    with pytest.raises(ValueError, match="stage failed"):
+        run_pipeline(stages, None, {"n": 1}, jobs=2)